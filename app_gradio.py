@@ -17,7 +17,15 @@ import gradio as gr
 import joblib
 import pandas as pd
 
-from src.rag.qa import answer_question
+from src.models.explainer_model import PRECISION as EXPLAINER_PRECISION
+from src.models.explainer_model import (
+    PREFIX_CACHE,
+    PromptPrefix,
+    fallback_text,
+    generate,
+    load_explainer,
+)
+from src.rag.qa import stream_answer
 
 # --------------------------------------------------------------------------
 # ZeroGPU support. The `spaces` package only exists on Hugging Face hardware;
@@ -34,7 +42,6 @@ except Exception:  # not on Spaces
 
 
 MODEL_PATH = Path("models/credit_risk_model.pkl")
-EXPLAINER_ID = "rohankatyayani/tinyllama-credit-explainer"
 
 # --------------------------------------------------------------------------
 # Startup: make sure a trained model exists.
@@ -48,59 +55,81 @@ print(f"[startup] Loaded model from {MODEL_PATH}", flush=True)
 
 # --------------------------------------------------------------------------
 # Explainer: loaded lazily, kept on CPU, moved to GPU inside the GPU call.
+# FINRISK_EXPLAINER_PRECISION=int8 (see src/models/explainer_model.py) stays on CPU.
 # --------------------------------------------------------------------------
 _tok = None
 _llm = None
+_prefix = None
 
 
 def _load_explainer():
     global _tok, _llm
     if _llm is None:
-        import torch
-        from transformers import AutoModelForCausalLM, AutoTokenizer
-
-        print("[explainer] loading weights ...", flush=True)
-        _tok = AutoTokenizer.from_pretrained(EXPLAINER_ID)
-        if _tok.pad_token is None:
-            _tok.pad_token = _tok.eos_token
-        _llm = AutoModelForCausalLM.from_pretrained(
-            EXPLAINER_ID, dtype=torch.float32, low_cpu_mem_usage=True
-        )
-        _llm.eval()
+        print(f"[explainer] loading weights ({EXPLAINER_PRECISION}) ...", flush=True)
+        _tok, _llm = load_explainer()
     return _tok, _llm
 
 
-@GPU
-def generate_explanation(features: dict, prediction: int, max_new_tokens: int = 120) -> str:
-    """Generate a bank-tone explanation for a decision. 1 = good/approved."""
+def _on_device():
+    """Tokenizer, model on its device, and the shared-prefix KV cache (CPU only)."""
     import torch
 
+    global _prefix
     tok, llm = _load_explainer()
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    llm.to(device)
-
-    decision = "approved" if prediction == 1 else "denied"
-    feat_str = ", ".join(f"{k}={v}" for k, v in features.items())
-    prompt = (
-        "Explain the credit risk decision for the following applicant profile.\n"
-        f"Input: {feat_str}\nDecision: {decision}.\nExplanation:"
-    )
-    inputs = tok(prompt, return_tensors="pt", truncation=True, max_length=512).to(device)
-    with torch.inference_mode():
-        out = llm.generate(
-            **inputs,
-            max_new_tokens=max_new_tokens,
-            do_sample=False,
-            repetition_penalty=1.2,
-            pad_token_id=tok.eos_token_id,
-        )
-    new_tokens = out[0][inputs["input_ids"].shape[-1] :]
-    text = tok.decode(new_tokens, skip_special_tokens=True).strip()
+    if EXPLAINER_PRECISION != "int8":  # dynamic-quantized kernels are CPU only
+        llm.to("cuda" if torch.cuda.is_available() else "cpu")
+    # On GPU the prefix prefill is negligible and ZeroGPU may hand us a fresh
+    # device each call, so the cached prefix is only worth keeping on CPU.
+    if not PREFIX_CACHE or llm.device.type != "cpu":
+        return tok, llm, None
+    if _prefix is None:
+        _prefix = PromptPrefix(tok, llm)
+    return tok, llm, _prefix
+
+
+@GPU
+def generate_explanation(features: dict, prediction: int, max_new_tokens: int = 120) -> str:
+    """Generate a bank-tone explanation for a decision. 1 = good/approved."""
+    tok, llm, prefix = _on_device()
+    text = generate(tok, llm, features, prediction, max_new_tokens, prefix=prefix).text
     if not text or len(text) < 10:
-        text = f"Application {decision} based on the provided financial profile."
+        text = fallback_text(prediction)
     return text
 
 
+@GPU
+def stream_explanation(features: dict, prediction: int, max_new_tokens: int = 120):
+    """Same as generate_explanation, but yields the text so far as tokens arrive."""
+    import threading
+
+    from transformers import TextIteratorStreamer
+
+    tok, llm, prefix = _on_device()
+    streamer = TextIteratorStreamer(tok, skip_prompt=True, skip_special_tokens=True)
+    failed = []
+
+    def run():
+        try:
+            generate(
+                tok, llm, features, prediction, max_new_tokens, streamer=streamer, prefix=prefix
+            )
+        except Exception as e:
+            # Without its end-of-stream signal the streamer would block the loop below forever.
+            print(f"[explainer] generation failed: {type(e).__name__}: {e}", flush=True)
+            failed.append(e)
+            streamer.end()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    text = ""
+    for piece in streamer:
+        text += piece
+        yield text
+    thread.join()
+    text = text.strip()
+    yield text if text and len(text) >= 10 and not failed else fallback_text(prediction)
+
+
 # --------------------------------------------------------------------------
 # German Credit field mappings: human label -> dataset code.
 # --------------------------------------------------------------------------
@@ -324,29 +353,41 @@ def do_explain(decision_label, *vals):
 
 
 def do_combined(*vals):
+    # Generator: the score renders immediately, the explanation as it streams in.
     feats = to_payload(*vals)
     pred, proba = score(feats)
-    text = generate_explanation(feats, pred)
-    md = (
-        f"### {CLASS_LABELS[pred]}\n"
-        f"**Confidence:** {max(proba):.1%}\n\n"
-        f"**Explanation**\n\n{text}"
-    )
-    return md, {"prediction": pred, "probabilities": proba, "explanation": text}
+    header = f"### {CLASS_LABELS[pred]}\n**Confidence:** {max(proba):.1%}\n\n**Explanation**\n\n"
+    result = {"prediction": pred, "probabilities": proba}
+    yield header + "_Generating…_", result
+    text = ""
+    for text in stream_explanation(feats, pred):
+        yield header + text, result
+    yield header + text, {**result, "explanation": text}
 
 
 def do_policy(question, k):
+    # Generator: sources render after retrieval, the answer as Groq streams it.
     if not question or len(question.strip()) < 3:
-        return "Please enter a question.", [], {}
+        yield "Please enter a question.", [], {}
+        return
+    data, rows, text = {}, [], ""
     try:
-        data = answer_question(question.strip(), int(k))
+        for event in stream_answer(question.strip(), int(k)):
+            if event["event"] == "sources":
+                data.update(sources=event["sources"], model=event["model"])
+                rows = [
+                    [s["rank"], s["source"], s["chunk_id"], round(s["score"], 3)]
+                    for s in event["sources"]
+                ]
+                yield "### Answer\n\n_Generating…_", rows, data
+            elif event["event"] == "token":
+                text += event["text"]
+                yield f"### Answer\n\n{text}", rows, data
+            elif event["event"] == "done":
+                data.update({key: v for key, v in event.items() if key != "event"})
+                yield f"### Answer\n\n{event['answer']}", rows, data
     except Exception as e:
-        return f"**Request failed:** {e}", [], {}
-    rows = [
-        [s["rank"], s["source"], s["chunk_id"], round(s["score"], 3)]
-        for s in data.get("sources", [])
-    ]
-    return f"### Answer\n\n{data.get('answer', '')}", rows, data
+        yield f"**Request failed:** {e}", rows, data
 
 
 EXAMPLES = [
@@ -411,7 +452,7 @@ with gr.Blocks(title="FinRisk Copilot", theme=gr.themes.Soft()) as demo:
         a_btn = gr.Button("Ask", variant="primary")
         a_out = gr.Markdown()
         a_src = gr.Dataframe(
-            headers=["#", "Document", "Chunk", "Similarity"], label="Sources", wrap=True
+            headers=["#", "Document", "Chunk", "Score"], label="Sources", wrap=True
         )
         a_json = gr.JSON(label="Raw response")
         a_btn.click(do_policy, inputs=[q, k], outputs=[a_out, a_src, a_json])
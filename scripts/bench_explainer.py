@@ -0,0 +1,181 @@
+"""
+scripts/bench_explainer.py
+
+Compare explainer precisions (fp32 / bf16 / int8) on CPU: decode throughput,
+peak resident memory, and how closely each reproduces the fp32 text
+(ROUGE-L F1 over whitespace tokens, 1.0 = identical).
+
+Also measures time-to-first-token with and without the shared-prefix KV
+cache (PromptPrefix), and checks the cached run decodes the same text.
+
+Every precision runs in its own subprocess so peak RSS is measured in
+isolation. An int8 checkpoint that doesn't exist yet is quantized in a
+separate warm-up process first, so the numbers reflect a normal start.
+
+Examples:
+    python -m scripts.bench_explainer
+    python -m scripts.bench_explainer --precisions fp32 int8 --samples 4 --json logs/bench.json
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+import pandas as pd
+
+DATA_PATH = "data/interim/german_credit.csv"
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def rouge_l(reference: str, candidate: str) -> float:
+    ref, cand = reference.lower().split(), candidate.lower().split()
+    if not ref or not cand:
+        return float(ref == cand)
+    prev = [0] * (len(cand) + 1)
+    for r in ref:
+        cur = [0]
+        for j, c in enumerate(cand):
+            cur.append(prev[j] + 1 if r == c else max(prev[j + 1], cur[j]))
+        prev = cur
+    lcs = prev[-1]
+    if lcs == 0:
+        return 0.0
+    precision, recall = lcs / len(cand), lcs / len(ref)
+    return 2 * precision * recall / (precision + recall)
+
+
+def _samples(n: int) -> list:
+    df = pd.read_csv(DATA_PATH).head(n)
+    labels = df.pop("credit_risk").astype(int).tolist()
+    return list(zip(df.to_dict(orient="records"), labels))
+
+
+def run_one(precision: str, n_samples: int, max_new_tokens: int) -> dict:
+    """Load one precision and explain every sample (runs inside the child process)."""
+    from src.models.explainer_model import PromptPrefix, build_prompt, generate, load_explainer
+
+    started = time.perf_counter()
+    tok, model = load_explainer(precision=precision)
+    load_s = time.perf_counter() - started
+
+    samples = _samples(n_samples)
+    generate(tok, model, *samples[0], max_new_tokens=8)  # warm-up, not timed
+    texts, new_tokens, gen_s = [], 0, 0.0
+    for features, label in samples:
+        t0 = time.perf_counter()
+        text, n, _ = generate(tok, model, features, label, max_new_tokens)
+        gen_s += time.perf_counter() - t0
+        texts.append(text)
+        new_tokens += n
+
+    # Time to first token = a one-token generate(): tokenize + prefill + one step.
+    prefix = PromptPrefix(tok, model)
+    ttft, ttft_prefix, same_with_prefix = [], [], 0
+    for (features, label), text in zip(samples, texts):
+        t0 = time.perf_counter()
+        generate(tok, model, features, label, max_new_tokens=1)
+        ttft.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        generate(tok, model, features, label, max_new_tokens=1, prefix=prefix)
+        ttft_prefix.append(time.perf_counter() - t0)
+        same_with_prefix += (
+            generate(tok, model, features, label, max_new_tokens, prefix=prefix).text == text
+        )
+    prompt_tokens = [len(tok(build_prompt(f, p))["input_ids"]) for f, p in samples]
+    return {
+        "precision": precision,
+        "load_s": load_s,
+        "new_tokens": new_tokens,
+        "tokens_per_s": new_tokens / gen_s if gen_s else 0.0,
+        "peak_rss_mb": _peak_rss_mb(),
+        "ttft_ms": 1000 * sum(ttft) / len(ttft),
+        "ttft_prefix_ms": 1000 * sum(ttft_prefix) / len(ttft_prefix),
+        "prefix_tokens": len(prefix.ids),
+        "mean_prompt_tokens": sum(prompt_tokens) / len(prompt_tokens),
+        "same_with_prefix": same_with_prefix,
+        "texts": texts,
+    }
+
+
+def _child(precision: str, args, prepare: bool = False) -> dict:
+    cmd = [sys.executable, "-m", "scripts.bench_explainer", "--child", precision]
+    cmd += ["--samples", str(args.samples), "--max-new-tokens", str(args.max_new_tokens)]
+    if prepare:
+        cmd.append("--prepare")
+    out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark explainer precisions on CPU.")
+    parser.add_argument(
+        "--precisions", nargs="+", default=["fp32", "bf16", "int8"], help="fp32 is the reference"
+    )
+    parser.add_argument("--samples", type=int, default=8, help="Applicants from the dataset")
+    parser.add_argument("--max-new-tokens", type=int, default=120)
+    parser.add_argument("--json", help="Also write the full results (with texts) here")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--prepare", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        if args.prepare:
+            from src.models.explainer_model import load_explainer
+
+            load_explainer(precision=args.child)
+            print(json.dumps({"prepared": args.child}))
+        else:
+            print(json.dumps(run_one(args.child, args.samples, args.max_new_tokens)))
+        return
+
+    precisions = ["fp32"] + [p for p in args.precisions if p != "fp32"]
+    results = []
+    for precision in precisions:
+        if precision == "int8":
+            _child(precision, args, prepare=True)
+        print(f"⏱️  {precision} ...", flush=True)
+        results.append(_child(precision, args))
+
+    reference = results[0]["texts"]
+    for r in results:
+        scores = [rouge_l(ref, text) for ref, text in zip(reference, r["texts"])]
+        r["rouge_l_vs_fp32"] = sum(scores) / len(scores)
+        r["identical_to_fp32"] = sum(ref == text for ref, text in zip(reference, r["texts"]))
+
+    print()
+    print("| precision | tokens/s | peak RSS (MB) | load (s) | ROUGE-L vs fp32 | identical |")
+    print("|---|---|---|---|---|---|")
+    for r in results:
+        print(
+            f"| {r['precision']} | {r['tokens_per_s']:.1f} | {r['peak_rss_mb']:.0f} "
+            f"| {r['load_s']:.1f} | {r['rouge_l_vs_fp32']:.3f} "
+            f"| {r['identical_to_fp32']}/{len(reference)} |"
+        )
+
+    r = results[0]
+    print(
+        f"\nPrefix KV cache covers {r['prefix_tokens']} of ~{r['mean_prompt_tokens']:.0f} prompt tokens"
+    )
+    print("| precision | TTFT (ms) | TTFT with prefix cache (ms) | same text with cache |")
+    print("|---|---|---|---|")
+    for r in results:
+        print(
+            f"| {r['precision']} | {r['ttft_ms']:.0f} | {r['ttft_prefix_ms']:.0f} "
+            f"| {r['same_with_prefix']}/{len(reference)} |"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+scripts/bench_rag_index.py
+
+Recall@k vs latency for the RAG index types (src/rag/vector_index.py),
+measured against exact flat search on the same vectors.
+
+Queries are held out of the indexed set, so no query finds itself. By
+default the vectors are the committed policy corpus, reconstructed from
+data/rag/index/index.faiss. That corpus is too small for approximate indexes
+to matter, so --synthetic N generates a clustered corpus of N unit vectors
+of the same dimension to see how the types scale.
+
+Examples:
+    python -m scripts.bench_rag_index
+    python -m scripts.bench_rag_index --synthetic 200000 --k 4 --json logs/bench_rag.json
+"""
+
+import argparse
+import json
+import time
+
+import faiss
+import numpy as np
+
+from src.rag.vector_index import (
+    apply_search_params,
+    make_index,
+    recall_at_k,
+    search_latency_ms,
+)
+
+INDEX_PATH = "data/rag/index/index.faiss"
+
+# Query-time parameter sweeps per index type; values above the index's
+# limits (e.g. nprobe > nlist) are skipped.
+SWEEPS = {
+    "flat": [{}],
+    "hnsw": [{"efSearch": ef} for ef in (16, 32, 64, 128, 256)],
+    "ivf_flat": [{"nprobe": p} for p in (1, 4, 8, 16, 32, 64)],
+    "ivf_pq": [{"nprobe": p, "k_factor": f} for f in (1, 4, 16) for p in (8, 32)],
+}
+
+
+def corpus_vectors() -> np.ndarray:
+    index = faiss.read_index(INDEX_PATH)
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def synthetic_vectors(n: int, dim: int = 384, clusters: int = 1000, seed: int = 0) -> np.ndarray:
+    """Unit vectors around random topic centres, roughly like sentence embeddings."""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dim)).astype("float32")
+    noise = rng.normal(size=(n, dim)).astype("float32")
+    vectors = centres[rng.integers(0, clusters, n)] + 0.2 * noise
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def run(vectors: np.ndarray, n_queries: int, k: int, types: list) -> list:
+    rows = np.random.default_rng(1).permutation(len(vectors))
+    queries, base = vectors[np.sort(rows[:n_queries])], vectors[np.sort(rows[n_queries:])]
+    exact, _ = make_index(base, "flat")
+    truth = exact.search(queries, k)[1]
+
+    results = []
+    for index_type in types:
+        started = time.perf_counter()
+        try:
+            index, meta = make_index(base, index_type)
+        except ValueError as e:
+            print(f"⚠️  {index_type}: {e}")
+            continue
+        build_s = time.perf_counter() - started
+        size_mb = faiss.serialize_index(index).nbytes / 1e6
+        for params in SWEEPS[index_type]:
+            if params.get("nprobe", 0) > meta["build"].get("nlist", 0):
+                continue
+            apply_search_params(index, params)
+            search_latency_ms(index, queries[:10], k)  # warm-up
+            latency_ms, found = search_latency_ms(index, queries, k)
+            results.append(
+                {
+                    "index_type": index_type,
+                    "build": meta["build"],
+                    "search": params,
+                    "build_s": build_s,
+                    "size_mb": size_mb,
+                    "latency_ms": latency_ms,
+                    f"recall@{k}": recall_at_k(truth, found, k),
+                }
+            )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark RAG index types against flat search.")
+    parser.add_argument(
+        "--synthetic", type=int, help="Use N synthetic vectors instead of the corpus"
+    )
+    parser.add_argument("--queries", type=int, default=200, help="Held-out query vectors")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--types", nargs="+", default=list(SWEEPS), choices=list(SWEEPS))
+    parser.add_argument("--json", help="Also write the results here")
+    args = parser.parse_args()
+
+    vectors = synthetic_vectors(args.synthetic) if args.synthetic else corpus_vectors()
+    n_queries = min(args.queries, len(vectors) // 5)
+    print(f"⏱️  {len(vectors) - n_queries} vectors, {n_queries} queries, k={args.k}\n")
+    results = run(vectors, n_queries, args.k, args.types)
+
+    print(
+        f"| index | build params | search params | build (s) | size (MB) | ms/query | recall@{args.k} |"
+    )
+    print("|---|---|---|---|---|---|---|")
+    for r in results:
+        build = ", ".join(f"{name}={v}" for name, v in r["build"].items()) or "-"
+        search = ", ".join(f"{name}={v}" for name, v in r["search"].items()) or "-"
+        print(
+            f"| {r['index_type']} | {build} | {search} | {r['build_s']:.1f} | {r['size_mb']:.1f} "
+            f"| {r['latency_ms']:.3f} | {r[f'recall@{args.k}']:.3f} |"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
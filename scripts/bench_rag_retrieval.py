@@ -0,0 +1,157 @@
+"""
+scripts/bench_rag_retrieval.py
+
+Retrieval quality and latency of dense, BM25 and hybrid (reciprocal rank
+fusion) retrieval over the committed policy index, on the labeled questions
+in data/rag/eval/questions.jsonl.
+
+Each line there is {"question": ..., "relevant": [chunk ids]}. The labels
+were found by phrase search over the chunks and then read by hand, so they
+lean towards passages that share words with the question; treat small
+differences between methods with caution.
+
+Quality is recall@k (share of a question's relevant chunks in the top k)
+and MRR (1 / rank of the first relevant chunk, 0 if none in the top k).
+Latency is per question and excludes embedding the question, which is the
+same for dense and hybrid and is reported on its own line. Dense and hybrid
+need sentence-transformers; without it only BM25 runs.
+
+Examples:
+    python -m scripts.bench_rag_retrieval
+    python -m scripts.bench_rag_retrieval --k 4 --candidates 20 --json logs/bench_retrieval.json
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from src.rag.chunk_store import ChunkStore
+from src.rag.lexical_index import BM25Index, reciprocal_rank_fusion
+
+EVAL_PATH = "data/rag/eval/questions.jsonl"
+INDEX_PATH = "data/rag/index/index.faiss"
+INDEX_META_PATH = "data/rag/index/index_meta.json"
+CHUNK_STORE_PATH = "data/rag/index/chunks"
+BM25_PATH = "data/rag/index/bm25"
+
+
+def load_questions(path: str = EVAL_PATH) -> list[dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def score(ranked: list, relevant: set, k: int) -> tuple[float, float]:
+    """(recall@k, reciprocal rank) of one ranked list of chunk ids."""
+    top = ranked[:k]
+    recall = len(relevant.intersection(top)) / len(relevant)
+    first = next((rank for rank, cid in enumerate(top, start=1) if cid in relevant), None)
+    return recall, 1.0 / first if first else 0.0
+
+
+def _timed(fn, repeats: int):
+    """fn()'s result and its median wall time in ms over `repeats` calls."""
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - started) * 1000)
+    return result, float(np.median(times))
+
+
+def embed(questions: list[str]):
+    """Question vectors and ms/question, or (None, None) without sentence-transformers."""
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        print("⚠️  sentence-transformers is not installed; skipping dense and hybrid\n")
+        return None, None
+    from src.rag.ingest import EMBED_MODEL_ID
+
+    model = SentenceTransformer(EMBED_MODEL_ID)
+    model.encode(questions[:1], normalize_embeddings=True)  # warm-up
+    started = time.perf_counter()
+    vectors = model.encode(questions, normalize_embeddings=True).astype("float32")
+    return vectors, (time.perf_counter() - started) * 1000 / len(questions)
+
+
+def run(questions: list[dict], k: int, candidates: int, repeats: int) -> dict:
+    store, bm25 = ChunkStore(CHUNK_STORE_PATH), BM25Index(BM25_PATH)
+    qvecs, embed_ms = embed([q["question"] for q in questions])
+    index = None
+    if qvecs is not None:
+        from src.rag.vector_index import load_index
+
+        index, _ = load_index(INDEX_PATH, INDEX_META_PATH)
+
+    def chunk_ids(faiss_ids) -> list[str]:
+        return [store.by_id(int(i))["id"] for i in faiss_ids if i != -1]
+
+    methods = {"bm25": lambda i, q: bm25.search(q, k)[1]}
+    if index is not None:
+        methods["dense"] = lambda i, q: index.search(qvecs[i : i + 1], k)[1][0]
+
+        def hybrid(i, q):
+            dense = index.search(qvecs[i : i + 1], max(k, candidates))[1][0]
+            lexical = bm25.search(q, max(k, candidates))[1]
+            ranked = [dense[dense != -1].tolist(), lexical.tolist()]
+            return [faiss_id for faiss_id, _ in reciprocal_rank_fusion(ranked, k)]
+
+        methods["hybrid"] = hybrid
+
+    results = {"n_questions": len(questions), "k": k, "candidates": candidates}
+    results["embed_ms"] = embed_ms
+    for name, search in methods.items():
+        recalls, rrs, latencies = [], [], []
+        for i, q in enumerate(questions):
+            found, ms = _timed(lambda: search(i, q["question"]), repeats)
+            recall, rr = score(chunk_ids(found), set(q["relevant"]), k)
+            recalls.append(recall)
+            rrs.append(rr)
+            latencies.append(ms)
+        results[name] = {
+            f"recall@{k}": float(np.mean(recalls)),
+            "mrr": float(np.mean(rrs)),
+            "ms_p50": float(np.percentile(latencies, 50)),
+            "ms_p95": float(np.percentile(latencies, 95)),
+        }
+    bm25.close()
+    store.close()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark dense, BM25 and hybrid retrieval.")
+    parser.add_argument("--questions", default=EVAL_PATH, help="Labeled questions (JSONL)")
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument(
+        "--candidates", type=int, default=20, help="Per-list depth before fusion (hybrid)"
+    )
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per question")
+    parser.add_argument("--json", help="Also write the results here")
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    print(f"⏱️  {len(questions)} labeled questions, k={args.k}, candidates={args.candidates}\n")
+    results = run(questions, args.k, args.candidates, args.repeats)
+
+    print(f"| retrieval | recall@{args.k} | MRR | p50 ms/query | p95 ms/query |")
+    print("|---|---|---|---|---|")
+    for name in ("dense", "bm25", "hybrid"):
+        if name in results:
+            r = results[name]
+            print(
+                f"| {name} | {r[f'recall@{args.k}']:.3f} | {r['mrr']:.3f} "
+                f"| {r['ms_p50']:.3f} | {r['ms_p95']:.3f} |"
+            )
+    if results["embed_ms"] is not None:
+        print(f"\nEmbedding the question (dense and hybrid): {results['embed_ms']:.1f} ms/query")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+scripts/export_model.py
+
+Export the trained credit pipeline to a standalone, dependency-light artifact:
+LightGBM's native model text plus a JSON encoding table (one-hot categories
+and scaler statistics). The FastAPI service prefers this artifact over the
+pickle, so its workers never import sklearn or pandas just to score.
+
+The artifact records the SHA-256 of the pickle it came from, or with
+--registry the MLflow registry version; the service ignores it (with a
+warning) once the pickle or the registry stage it would serve has moved on.
+
+Examples:
+    python -m scripts.export_model
+    python -m scripts.export_model --pickle models/credit_risk_model.pkl --out models/credit_risk_model
+    python -m scripts.export_model --registry   # the Production version from mlflow.db
+
+Run it after training or promoting (CI and the demo Dockerfile do this automatically).
+"""
+
+import argparse
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from src.models.fast_scorer import FastScorer, export_compiled, file_sha256
+
+DEFAULT_PICKLE = "models/credit_risk_model.pkl"
+DEFAULT_STEM = "models/credit_risk_model"
+DATA_PATH = "data/interim/german_credit.csv"
+MLFLOW_URI = "sqlite:///mlflow.db"
+REGISTERED_NAME = "credit_risk_model"
+LOAD_STAGE = "Production"
+
+
+def load_from_registry(stage: str = LOAD_STAGE):
+    """(pipeline, version) of the registered model in `stage`, as the service would load it."""
+    import mlflow
+    from mlflow.tracking import MlflowClient
+
+    mlflow.set_tracking_uri(MLFLOW_URI)
+    versions = MlflowClient().get_latest_versions(REGISTERED_NAME, stages=[stage])
+    if not versions:
+        raise SystemExit(f"❌ No {REGISTERED_NAME} version in stage {stage}")
+    version = versions[0].version
+    pipeline = mlflow.sklearn.load_model(f"models:/{REGISTERED_NAME}/{version}")
+    return pipeline, str(version)
+
+
+def check_parity(pipeline, stem: str, data_path: str = DATA_PATH) -> None:
+    """Refuse to ship an artifact that doesn't reproduce the pipeline's probabilities."""
+    try:
+        X = pd.read_csv(data_path).drop(columns=["credit_risk"], errors="ignore")
+    except FileNotFoundError:
+        print(f"⚠️  {data_path} not found — skipping parity check")
+        return
+    expected = pipeline.predict_proba(X)
+    actual = FastScorer.load(stem).predict_proba(X.to_dict(orient="records"))
+    max_diff = float(np.abs(actual - expected).max())
+    if max_diff != 0.0:
+        raise SystemExit(f"❌ Exported artifact differs from the pipeline (max |Δp| = {max_diff})")
+    print(f"✅ Parity check passed on {len(X)} rows")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export the credit model to a compiled artifact.")
+    parser.add_argument("--pickle", default=DEFAULT_PICKLE, help="Trained pipeline .pkl")
+    parser.add_argument("--out", default=DEFAULT_STEM, help="Output path stem (no suffix)")
+    parser.add_argument(
+        "--registry",
+        action="store_true",
+        help=f"Export the {LOAD_STAGE} version from the MLflow registry instead of the pickle",
+    )
+    parser.add_argument(
+        "--skip-parity", action="store_true", help="Don't verify against the pickle"
+    )
+    args = parser.parse_args()
+
+    if args.registry:
+        pipeline, version = load_from_registry()
+        source = {"registry_version": version}
+        print(f"📦 Exporting {REGISTERED_NAME} v{version} ({LOAD_STAGE})")
+    else:
+        pipeline = joblib.load(args.pickle)
+        source = {"pickle_sha256": file_sha256(args.pickle)}
+    for path in export_compiled(pipeline, args.out, source):
+        print(f"💾 Wrote {path}")
+    if not args.skip_parity:
+        check_parity(pipeline, args.out)
+
+
+if __name__ == "__main__":
+    main()
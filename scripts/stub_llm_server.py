@@ -0,0 +1,92 @@
+"""
+scripts/stub_llm_server.py
+
+A deterministic OpenAI-compatible /v1/chat/completions server for load-testing
+the RAG path without Groq or a GPU. Answers come from
+src.rag.generation.stub_answer (they cite every passage in the prompt), with an
+optional per-token delay to stand in for generation time. Streaming requests
+get server-sent events in the OpenAI chunk format, ending with a usage chunk
+and [DONE].
+
+Examples:
+    python -m scripts.stub_llm_server --port 8080 --delay-ms 20
+    FINRISK_RAG_BACKEND=local FINRISK_RAG_LOCAL_URL=http://localhost:8080/v1 \\
+        uvicorn src.service.app:app
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import time
+
+import uvicorn
+from fastapi import Body, FastAPI
+from fastapi.responses import StreamingResponse
+
+from src.rag.generation import stub_answer, stub_usage
+
+app = FastAPI(title="Stub LLM")
+DELAY_S = 0.0
+
+
+def _chunk(model: str, delta: dict, finish_reason=None, usage=None) -> str:
+    chunk = {
+        "id": "stub",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if delta else [],
+    }
+    if usage is not None:
+        chunk["usage"] = usage
+    return f"data: {json.dumps(chunk)}\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(body: dict = Body(...)):
+    messages, model = body["messages"], body.get("model", "stub")
+    answer = stub_answer(messages)
+    usage = stub_usage(messages, answer)._asdict()
+    words = re.findall(r"\S+\s*", answer)
+
+    if not body.get("stream"):
+        await asyncio.sleep(DELAY_S * len(words))
+        return {
+            "id": "stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": answer},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": usage,
+        }
+
+    async def events():
+        for word in words:
+            await asyncio.sleep(DELAY_S)
+            yield _chunk(model, {"content": word})
+        yield _chunk(model, {}, usage=usage)
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def main() -> None:
+    global DELAY_S
+    parser = argparse.ArgumentParser(description="Deterministic OpenAI-compatible stub LLM.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--delay-ms", type=float, default=0.0, help="Simulated latency per token")
+    args = parser.parse_args()
+    DELAY_S = args.delay_ms / 1000
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+"""
+src/models/explainer_model.py
+
+Loading, prompting and generation for the TinyLlama explainer, shared by the resident workers
+(src/models/explainer_worker.py), the in-process Gradio app and the benchmark
+so they all run the same weights at the same precision with the same prompt.
+
+torch and transformers are imported inside the functions: lora_infer reads
+the config and model tag from here without pulling either in.
+
+Config (environment):
+    FINRISK_EXPLAINER_MODEL      Hugging Face model ID (default the fine-tuned TinyLlama)
+    FINRISK_EXPLAINER_REVISION   model revision / branch / commit (default main)
+    FINRISK_EXPLAINER_PRECISION  fp32 (default), bf16 or int8 — see load_explainer()
+    FINRISK_EXPLAINER_CACHE_DIR  where pre-quantized checkpoints live (default models/explainer)
+    FINRISK_EXPLAINER_MAX_BATCH  most prompts per batched generate() call (default 16)
+    FINRISK_EXPLAINER_BATCH_MEMORY_MB  working-memory budget for one batch (default 1024)
+    FINRISK_EXPLAINER_PREFIX_CACHE  1 (default) to reuse the instruction's key/values, 0 to not
+    FINRISK_EXPLAINER_PROMPT_LOOKUP  draft tokens per step for prompt-lookup decoding (default 0 = off)
+    FINRISK_EXPLAINER_DRAFT_MODEL  optional small model with the same tokenizer, for assisted decoding
+"""
+
+import copy
+import logging
+import os
+import re
+import time
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+_PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+MODEL_ID = os.getenv("FINRISK_EXPLAINER_MODEL", "rohankatyayani/tinyllama-credit-explainer")
+MODEL_REVISION = os.getenv("FINRISK_EXPLAINER_REVISION", "main")
+PRECISION = os.getenv("FINRISK_EXPLAINER_PRECISION", "fp32")
+CHECKPOINT_DIR = Path(
+    os.getenv("FINRISK_EXPLAINER_CACHE_DIR", str(_PROJECT_ROOT / "models" / "explainer"))
+)
+PRECISIONS = ("fp32", "bf16", "int8")
+MAX_BATCH = int(os.getenv("FINRISK_EXPLAINER_MAX_BATCH", "16"))
+BATCH_MEMORY_MB = float(os.getenv("FINRISK_EXPLAINER_BATCH_MEMORY_MB", "1024"))
+PREFIX_CACHE = os.getenv("FINRISK_EXPLAINER_PREFIX_CACHE", "1") == "1"
+PROMPT_LOOKUP_TOKENS = int(os.getenv("FINRISK_EXPLAINER_PROMPT_LOOKUP", "0"))
+DRAFT_MODEL_ID = os.getenv("FINRISK_EXPLAINER_DRAFT_MODEL", "")
+# Past the deadline, how many more tokens may be spent looking for a sentence end.
+DEADLINE_GRACE_TOKENS = 24
+_SENTENCE_END = (".", "!", "?")
+
+# Every prompt starts with this, byte for byte (see build_prompt).
+PROMPT_PREFIX = "Explain the credit risk decision for the following applicant profile.\nInput:"
+
+
+def model_tag(
+    model_id: str = MODEL_ID, revision: str = MODEL_REVISION, precision: str = PRECISION
+) -> str:
+    """Identifies the weights that produced an explanation. Precision changes the text."""
+    tag = f"{model_id}@{revision}"
+    return tag if precision == "fp32" else f"{tag}+{precision}"
+
+
+def build_prompt(features: dict, prediction: int) -> str:
+    decision = "approved" if prediction == 1 else "denied"
+    feat_str = ", ".join(f"{k}={v}" for k, v in features.items())
+    return f"{PROMPT_PREFIX} {feat_str}\nDecision: {decision}.\nExplanation:"
+
+
+def fallback_text(prediction: int) -> str:
+    decision = "approved" if prediction == 1 else "denied"
+    return f"Application {decision} based on the provided financial profile."
+
+
+class Generation(NamedTuple):
+    text: str
+    new_tokens: int
+    hit_deadline: bool = False
+
+
+def quantized_checkpoint_path(
+    model_id: str = MODEL_ID, revision: str = MODEL_REVISION, precision: str = "int8"
+) -> Path:
+    # A pickled module is only loadable by the torch/transformers that wrote it,
+    # so the versions are part of the name and an upgrade simply re-quantizes.
+    import torch
+    import transformers
+
+    stem = re.sub(r"[^A-Za-z0-9._-]+", "_", f"{model_id}@{revision}")
+    return CHECKPOINT_DIR / (
+        f"{stem}.{precision}.torch-{torch.__version__}.transformers-{transformers.__version__}.pt"
+    )
+
+
+def load_explainer(
+    model_id: str = MODEL_ID, revision: str = MODEL_REVISION, precision: str = PRECISION
+):
+    """
+    Tokenizer and eval-mode model at `precision`:
+        fp32  float32 weights, the reference output
+        bf16  bfloat16 weights: half the memory; fast only on CPUs with native bf16
+        int8  dynamic int8 quantization of every nn.Linear (int8 weights,
+              activations quantized per call); CPU only, roughly a quarter the
+              memory of fp32
+    The int8 model is quantized once and saved under CHECKPOINT_DIR, so later
+    starts load it directly instead of loading fp32 and quantizing again.
+    """
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown explainer precision {precision!r}; expected one of {PRECISIONS}")
+
+    tok = AutoTokenizer.from_pretrained(model_id, revision=revision)
+    if tok.pad_token is None:
+        tok.pad_token = tok.eos_token
+
+    if precision == "int8":
+        model = _load_int8(model_id, revision)
+    else:
+        model = AutoModelForCausalLM.from_pretrained(
+            model_id,
+            revision=revision,
+            dtype=torch.bfloat16 if precision == "bf16" else torch.float32,
+            low_cpu_mem_usage=True,
+        )
+    model.eval()
+    return tok, model
+
+
+def load_draft():
+    """
+    The assistant model for speculative decoding, or None if not configured.
+    It must share the explainer's tokenizer; it always runs in float32.
+    """
+    if not DRAFT_MODEL_ID:
+        return None
+    import torch
+    from transformers import AutoModelForCausalLM
+
+    draft = AutoModelForCausalLM.from_pretrained(
+        DRAFT_MODEL_ID, dtype=torch.float32, low_cpu_mem_usage=True
+    )
+    draft.eval()
+    return draft
+
+
+def _load_int8(model_id: str, revision: str):
+    import torch
+    from transformers import AutoModelForCausalLM
+
+    path = quantized_checkpoint_path(model_id, revision, "int8")
+    if path.exists():
+        logger.info(f"Loading pre-quantized explainer from {path}")
+        # Our own file holding a whole quantized nn.Module, so not weights-only.
+        return torch.load(path, weights_only=False)
+
+    logger.info(f"Quantizing {model_id}@{revision} to int8 (one-off, cached at {path})")
+    model = AutoModelForCausalLM.from_pretrained(
+        model_id, revision=revision, dtype=torch.float32, low_cpu_mem_usage=True
+    )
+    model.eval()
+    model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    torch.save(model, tmp)
+    os.replace(tmp, path)  # concurrent workers never see a half-written file
+    return model
+
+
+class PromptPrefix:
+    """
+    Key/values for PROMPT_PREFIX, computed once per loaded model. Each request
+    starts generate() from a copy, so prefill only runs over the applicant's
+    own tokens. Greedy output is unchanged: the cached entries are the ones
+    a full prefill would have produced for the same leading tokens.
+    """
+
+    def __init__(self, tok, model):
+        import torch
+        from transformers import DynamicCache
+
+        self.ids = tok(PROMPT_PREFIX)["input_ids"]
+        self.device = model.device
+        self.cache = DynamicCache()
+        with torch.inference_mode():
+            model(
+                input_ids=torch.tensor([self.ids], device=self.device),
+                past_key_values=self.cache,
+                use_cache=True,
+            )
+
+    def covers(self, input_ids) -> bool:
+        # Tokenization is not always prefix-stable, so check the actual ids.
+        n = len(self.ids)
+        return input_ids.shape[-1] > n and input_ids[0, :n].tolist() == self.ids
+
+    def fork(self):
+        return copy.deepcopy(self.cache)
+
+
+class _SentenceDeadline:
+    """
+    Stopping criterion. Before `deadline` (a time.time() value) it never fires,
+    so generation is exactly greedy. After it, generation stops at the first
+    token that ends a sentence, or DEADLINE_GRACE_TOKENS later at the latest.
+    """
+
+    def __init__(self, tok, deadline: float):
+        self.tok = tok
+        self.deadline = deadline
+        self.overdue = 0
+        self.hit = False
+
+    def __call__(self, input_ids, scores, **kwargs):
+        import torch
+
+        done = False
+        if time.time() >= self.deadline:
+            self.hit = True
+            self.overdue += 1
+            last = self.tok.decode(input_ids[0, -1:], skip_special_tokens=True).rstrip()
+            done = last.endswith(_SENTENCE_END) or self.overdue > DEADLINE_GRACE_TOKENS
+        return torch.full((input_ids.shape[0],), done, dtype=torch.bool, device=input_ids.device)
+
+
+def trim_to_sentence(text: str) -> str:
+    """Drop a trailing partial sentence, unless that would leave nothing."""
+    cut = max(text.rfind(end) for end in _SENTENCE_END)
+    return text[: cut + 1] if cut > 0 else text
+
+
+def generate(
+    tok,
+    model,
+    features: dict,
+    prediction: int,
+    max_new_tokens: int = 120,
+    streamer=None,
+    prefix: Optional[PromptPrefix] = None,
+    deadline: Optional[float] = None,
+    draft=None,
+) -> Generation:
+    """
+    Greedy explanation for one decision.
+
+    With `prefix`, prefill starts after the shared instruction. With a
+    `deadline` (time.time() value), generation that runs past it stops at the
+    next sentence end and the text is trimmed to whole sentences. With
+    FINRISK_EXPLAINER_PROMPT_LOOKUP or a `draft` model, candidate tokens are
+    proposed (n-grams copied from the prompt, or the draft's guesses) and
+    verified by the explainer in one pass. Verification keeps exactly the
+    greedy choice, so the text is the same as plain greedy decoding, only faster.
+    """
+    import torch
+    from transformers import StoppingCriteriaList
+
+    inputs = tok(
+        build_prompt(features, prediction), return_tensors="pt", truncation=True, max_length=512
+    ).to(model.device)
+    if prefix is not None and prefix.covers(inputs["input_ids"]):
+        inputs["past_key_values"] = prefix.fork()
+    extra = {}
+    if draft is not None:
+        extra["assistant_model"] = draft
+    elif PROMPT_LOOKUP_TOKENS > 0:
+        extra["prompt_lookup_num_tokens"] = PROMPT_LOOKUP_TOKENS
+    stop = _SentenceDeadline(tok, deadline) if deadline is not None else None
+    if stop is not None:
+        extra["stopping_criteria"] = StoppingCriteriaList([stop])
+    with torch.inference_mode():
+        out = model.generate(
+            **inputs,
+            max_new_tokens=max_new_tokens,
+            do_sample=False,
+            repetition_penalty=1.2,
+            pad_token_id=tok.eos_token_id,
+            streamer=streamer,
+            **extra,
+        )
+    new_tokens = out[0][inputs["input_ids"].shape[-1] :]
+    text = tok.decode(new_tokens, skip_special_tokens=True).strip()
+    hit = stop is not None and stop.hit
+    return Generation(trim_to_sentence(text) if hit else text, len(new_tokens), hit)
+
+
+def sequence_bytes(model, prompt_len: int, max_new_tokens: int) -> int:
+    """
+    Rough peak working memory of one sequence in a batch: its KV cache at full
+    length, the prefill attention scores, and a couple of vocab-sized logit rows.
+    """
+    cfg = model.config
+    elem = 2 if str(model.dtype) == "torch.bfloat16" else 4
+    n_heads = cfg.num_attention_heads
+    n_kv_heads = getattr(cfg, "num_key_value_heads", None) or n_heads
+    head_dim = getattr(cfg, "head_dim", None) or cfg.hidden_size // n_heads
+    kv_per_token = 2 * cfg.num_hidden_layers * n_kv_heads * head_dim * elem
+    return (
+        (prompt_len + max_new_tokens) * kv_per_token
+        + n_heads * prompt_len * prompt_len * elem
+        + 2 * cfg.vocab_size * 4
+    )
+
+
+def plan_batches(prompt_lengths: list, max_batch: int, budget_bytes: float, seq_cost) -> list:
+    """
+    Group prompt indices into batches. Similar lengths go together (less left
+    padding), and a batch grows only while `size * seq_cost(longest prompt)`
+    stays within the budget. A single over-budget prompt still gets a batch.
+    """
+    batches, current, longest = [], [], 0
+    for i in sorted(range(len(prompt_lengths)), key=lambda i: prompt_lengths[i]):
+        length = max(longest, prompt_lengths[i])
+        if current and (
+            len(current) >= max_batch or (len(current) + 1) * seq_cost(length) > budget_bytes
+        ):
+            batches.append(current)
+            current, length = [], prompt_lengths[i]
+        current.append(i)
+        longest = length
+    if current:
+        batches.append(current)
+    return batches
+
+
+def generate_batch(
+    tok,
+    model,
+    items: list,
+    max_new_tokens: int = 120,
+    max_batch: int = MAX_BATCH,
+    budget_mb: float = BATCH_MEMORY_MB,
+) -> list:
+    """
+    Greedy explanations for many (features, prediction) pairs, several per
+    generate() call. Prompts are left-padded so every row's next token sits in
+    the last column. Returns one Generation per item, in input order.
+    """
+    import torch
+
+    encoded = [
+        tok(build_prompt(f, p), truncation=True, max_length=512)["input_ids"] for f, p in items
+    ]
+    plan = plan_batches(
+        [len(ids) for ids in encoded],
+        max_batch,
+        budget_mb * 1024 * 1024,
+        lambda n: sequence_bytes(model, n, max_new_tokens),
+    )
+    # Pad with <unk>, not </s>: repetition_penalty scores every input id, and
+    # penalising the pad would make padded rows reluctant to stop.
+    pad_id = tok.unk_token_id if tok.unk_token_id is not None else tok.eos_token_id
+    results = [None] * len(items)
+    for batch in plan:
+        width = max(len(encoded[i]) for i in batch)
+        input_ids = torch.full((len(batch), width), pad_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(batch), width), dtype=torch.long)
+        for row, i in enumerate(batch):
+            n = len(encoded[i])
+            input_ids[row, width - n :] = torch.tensor(encoded[i])
+            attention_mask[row, width - n :] = 1
+        with torch.inference_mode():
+            out = model.generate(
+                input_ids=input_ids.to(model.device),
+                attention_mask=attention_mask.to(model.device),
+                max_new_tokens=max_new_tokens,
+                do_sample=False,
+                repetition_penalty=1.2,
+                pad_token_id=pad_id,
+            )
+        for row, i in zip(out[:, width:], batch):
+            text = tok.decode(row, skip_special_tokens=True).strip()
+            results[i] = Generation(text, int((row != pad_id).sum()))
+    return results
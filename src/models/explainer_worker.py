@@ -0,0 +1,121 @@
+"""
+src/models/explainer_worker.py
+
+Resident explainer process. Loads TinyLlama once (at the precision configured
+in src/models/explainer_model.py), then serves explanation
+requests as JSON lines on stdin and answers as JSON lines on stdout until
+stdin closes.
+
+Started and supervised by `src/models/lora_infer.ExplainerPool`. For debugging
+it can be run by hand from the project root:
+
+    echo '{"id": 1, "features": {"age": 30}, "prediction": 1}' | \
+        python -m src.models.explainer_worker
+
+An optional "deadline_at" (Unix time) makes generation wrap up at the next
+sentence end once it has passed; such replies carry "truncated": true.
+
+A request with a "batch" list of {features, prediction} items instead gets
+one "explanations" list, generated several prompts per forward pass.
+"""
+
+import json
+import sys
+
+from transformers import TextStreamer
+
+from src.models.explainer_model import (
+    MODEL_ID,
+    PRECISION,
+    PREFIX_CACHE,
+    PromptPrefix,
+    fallback_text,
+    generate,
+    generate_batch,
+    load_draft,
+    load_explainer,
+    model_tag,
+)
+
+MODEL_TAG = model_tag()
+
+# The protocol owns the real stdout. Anything else that prints (transformers
+# warnings, progress bars) is pushed to stderr so it can't corrupt a reply.
+_protocol_out = sys.stdout
+sys.stdout = sys.stderr
+
+
+def _emit(message: dict) -> None:
+    _protocol_out.write(json.dumps(message) + "\n")
+    _protocol_out.flush()
+
+
+class _PipeStreamer(TextStreamer):
+    """Forward decoded text to the caller as `token` messages while generate() runs."""
+
+    def __init__(self, tok, req_id):
+        super().__init__(tok, skip_prompt=True, skip_special_tokens=True)
+        self.req_id = req_id
+
+    def on_finalized_text(self, text: str, stream_end: bool = False):
+        if text:
+            _emit({"id": self.req_id, "token": text})
+
+
+def _or_fallback(explanation: str, pred: int) -> str:
+    return explanation if explanation and len(explanation) >= 10 else fallback_text(pred)
+
+
+def explain(tok, model, feats: dict, pred: int, max_t: int = 120, **options):
+    """One explanation; `options` go to generate() (streamer, prefix, deadline, draft)."""
+    gen = generate(tok, model, feats, pred, max_t, **options)
+    return gen._replace(text=_or_fallback(gen.text, pred))
+
+
+def explain_batch(tok, model, items: list, max_t: int = 120) -> list:
+    preds = [item["prediction"] for item in items]
+    outputs = generate_batch(
+        tok, model, [(item["features"], p) for item, p in zip(items, preds)], max_t
+    )
+    return [_or_fallback(gen.text, p) for gen, p in zip(outputs, preds)]
+
+
+def main():
+    tok, model = load_explainer()
+    prefix = PromptPrefix(tok, model) if PREFIX_CACHE else None
+    draft = load_draft()
+    _emit({"ready": True, "model_id": MODEL_ID, "precision": PRECISION, "model": MODEL_TAG})
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        req_id = None
+        try:
+            req = json.loads(line)
+            req_id = req.get("id")
+            if "batch" in req:
+                texts = explain_batch(tok, model, req["batch"], req.get("max_new_tokens", 120))
+                _emit({"id": req_id, "explanations": texts, "model": MODEL_TAG})
+                continue
+            gen = explain(
+                tok,
+                model,
+                req["features"],
+                req["prediction"],
+                req.get("max_new_tokens", 120),
+                streamer=_PipeStreamer(tok, req_id) if req.get("stream") else None,
+                prefix=prefix,
+                deadline=req.get("deadline_at"),
+                draft=draft,
+            )
+            reply = {"id": req_id, "explanation": gen.text, "model": MODEL_TAG}
+            if gen.hit_deadline:
+                reply["truncated"] = True
+            _emit(reply)
+        except Exception as e:  # keep serving; the caller decides what to do
+            _emit({"id": req_id, "error": f"{type(e).__name__}: {e}"})
+
+
+if __name__ == "__main__":
+    main()
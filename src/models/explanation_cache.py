@@ -0,0 +1,158 @@
+"""
+src/models/explanation_cache.py
+
+Content-addressed cache for explainer output.
+
+Generation is greedy, so the same prompt and max_new_tokens on the same model
+revision always produce the same text. Entries are keyed by a SHA-256 over the
+rendered prompt (explainer_model.build_prompt), max_new_tokens and the model
+tag: inputs that render differently — feature order, 35 vs 35.0 — may get
+different text, so they get different entries. Batched generation left-pads
+the prompts, which can shift greedy choices slightly, so batched output is
+keyed apart from single-request output and one is never served for the
+other. Entries are held in an in-memory
+LRU and optionally written through to SQLite so they survive
+restarts and are shared by every process pointed at the same file.
+
+Rows written under a different model tag are dropped when the cache opens or
+when a worker reports a different model, so switching the explainer model or
+revision never serves stale explanations.
+"""
+
+import collections
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from src.models.explainer_model import build_prompt
+
+
+def cache_key(
+    features: dict, prediction: int, max_new_tokens: int, model_tag: str, batched: bool = False
+) -> str:
+    payload = {
+        "prompt": build_prompt(features, prediction),
+        "max_new_tokens": int(max_new_tokens),
+        "model": model_tag,
+    }
+    if batched:  # single-request keys stay as they were, so persisted entries still hit
+        payload["batched"] = True
+    blob = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ExplanationCache:
+    """
+    LRU of `capacity` explanations for one model tag, with optional SQLite
+    write-through at `db_path`. A capacity of 0 keeps only the disk tier.
+    """
+
+    def __init__(self, model_tag: str, capacity: int = 1024, db_path: Optional[str] = None):
+        self.model_tag = model_tag
+        self.capacity = max(0, capacity)
+        self.db_path = db_path
+        self._lru: collections.OrderedDict = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path:
+            self._open_db(db_path)
+
+    def _open_db(self, db_path: str):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS explanations ("
+            "key TEXT PRIMARY KEY, model TEXT NOT NULL, explanation TEXT NOT NULL, "
+            "created REAL NOT NULL)"
+        )
+        self._db.execute("DELETE FROM explanations WHERE model != ?", (self.model_tag,))
+
+    def key(
+        self, features: dict, prediction: int, max_new_tokens: int, batched: bool = False
+    ) -> str:
+        return cache_key(features, prediction, max_new_tokens, self.model_tag, batched)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            text = self._lru.get(key)
+            if text is not None:
+                self._lru.move_to_end(key)
+                self._hits += 1
+                return text
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT explanation FROM explanations WHERE key = ? AND model = ?",
+                    (key, self.model_tag),
+                ).fetchone()
+                if row is not None:
+                    self._hits += 1
+                    self._disk_hits += 1
+                    self._remember(key, row[0])
+                    return row[0]
+            self._misses += 1
+            return None
+
+    def put(self, key: str, text: str):
+        with self._lock:
+            self._remember(key, text)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO explanations VALUES (?, ?, ?, ?)",
+                    (key, self.model_tag, text, time.time()),
+                )
+
+    def _remember(self, key: str, text: str):
+        if self.capacity == 0:
+            return
+        self._lru[key] = text
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.capacity:
+            self._lru.popitem(last=False)
+
+    def set_model(self, model_tag: str):
+        """Switch to a new model tag, dropping everything cached for the old one."""
+        with self._lock:
+            if model_tag == self.model_tag:
+                return
+            self.model_tag = model_tag
+            self._lru.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM explanations WHERE model != ?", (model_tag,))
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM explanations")
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            disk_entries = None
+            if self._db is not None:
+                disk_entries = self._db.execute("SELECT COUNT(*) FROM explanations").fetchone()[0]
+            return {
+                "model": self.model_tag,
+                "capacity": self.capacity,
+                "entries": len(self._lru),
+                "disk_path": self.db_path,
+                "disk_entries": disk_entries,
+                "hits": self._hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "hit_rate": (self._hits / lookups) if lookups else 0.0,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,188 @@
+"""
+src/models/fast_scorer.py
+
+Pandas-free scoring path for the LightGBM credit pipeline.
+
+The sklearn Pipeline spends most of a single-row call building a DataFrame and
+dispatching through the ColumnTransformer. FeatureEncoder reads the fitted
+OneHotEncoder categories and StandardScaler statistics out of the pipeline
+(see src/training/train_model.build_preprocessor) and writes a request
+straight into a NumPy row, in the same column order and with the same float64
+arithmetic, so the booster sees bit-identical input.
+
+The encoder and booster can also be exported to a standalone artifact (LightGBM
+model text + a JSON encoding table, see export_compiled / FastScorer.load).
+Loading it evaluates the trees with src/models/tree_predictor.py, so serving
+processes only need numpy — not lightgbm, sklearn, pandas or the pickled
+Pipeline. The encoding table records where the trees came from ("source": the
+exported pickle's SHA-256, or the registry version), so the service can tell
+an artifact that is older than the model it would otherwise serve.
+"""
+
+import hashlib
+import json
+import threading
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+ARTIFACT_FORMAT_VERSION = 1
+BOOSTER_SUFFIX = ".lgb.txt"
+ENCODING_SUFFIX = ".encoding.json"
+
+
+def file_sha256(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class FeatureEncoder:
+    """One-hot + standardize a feature dict into the ColumnTransformer's output layout."""
+
+    def __init__(self, categorical: list, numeric_cols: list, mean, scale):
+        # categorical: [(column, [category, ...]), ...] in transformer order.
+        self.categorical = [(col, list(cats)) for col, cats in categorical]
+        self.numeric_cols = list(numeric_cols)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+
+        self._onehot_index = []  # per categorical column: {category: output position}
+        pos = 0
+        for _, cats in self.categorical:
+            self._onehot_index.append({c: pos + j for j, c in enumerate(cats)})
+            pos += len(cats)
+        self._num_offset = pos
+        self.n_features = pos + len(self.numeric_cols)
+
+    @classmethod
+    def from_pipeline(cls, pipeline) -> "FeatureEncoder":
+        """Read the fitted preprocessor. Raises ValueError for layouts this encoder can't mirror."""
+        pre = pipeline.named_steps["preprocessor"]
+        fitted = [(name, t, cols) for name, t, cols in pre.transformers_ if name != "remainder"]
+        if [name for name, _, _ in fitted] != ["cat", "num"]:
+            raise ValueError(f"Unexpected transformers: {[name for name, _, _ in fitted]}")
+        (_, ohe, cat_cols), (_, scaler, num_cols) = fitted
+
+        if ohe.drop_idx_ is not None or getattr(ohe, "_infrequent_enabled", False):
+            raise ValueError("OneHotEncoder with drop/infrequent categories is not supported")
+        if ohe.handle_unknown != "ignore":
+            raise ValueError("OneHotEncoder must use handle_unknown='ignore'")
+
+        n_num = len(num_cols)
+        mean = scaler.mean_ if scaler.with_mean else np.zeros(n_num)
+        scale = scaler.scale_ if scaler.with_std else np.ones(n_num)
+        categorical = [(col, cats.tolist()) for col, cats in zip(cat_cols, ohe.categories_)]
+        return cls(categorical, num_cols, mean, scale)
+
+    def to_dict(self) -> dict:
+        return {
+            "categorical": [[col, cats] for col, cats in self.categorical],
+            "numeric_cols": self.numeric_cols,
+            "mean": self.mean.tolist(),  # JSON floats round-trip exactly
+            "scale": self.scale.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "FeatureEncoder":
+        return cls(d["categorical"], d["numeric_cols"], d["mean"], d["scale"])
+
+    def encode_into(self, row: dict, out: np.ndarray) -> np.ndarray:
+        """Fill a preallocated 1-D buffer of length n_features. Unknown categories stay all-zero."""
+        out[: self._num_offset] = 0.0
+        for (col, _), index in zip(self.categorical, self._onehot_index):
+            pos = index.get(row[col])
+            if pos is not None:
+                out[pos] = 1.0
+        num = out[self._num_offset :]
+        for j, col in enumerate(self.numeric_cols):
+            num[j] = row[col]
+        num -= self.mean
+        num /= self.scale
+        return out
+
+    def encode(self, rows: list) -> np.ndarray:
+        X = np.empty((len(rows), self.n_features), dtype=np.float64)
+        for i, row in enumerate(rows):
+            self.encode_into(row, X[i])
+        return X
+
+
+class FastScorer:
+    """FeatureEncoder + the fitted LightGBM booster, returning predict_proba-shaped output."""
+
+    def __init__(self, encoder: FeatureEncoder, booster, classes):
+        if len(classes) != 2:
+            raise ValueError(f"Only binary models are supported, got classes {list(classes)}")
+        self.encoder = encoder
+        self.booster = booster
+        self.classes_ = np.asarray(classes)
+        self.source: dict = {}  # provenance of an exported artifact, see export_compiled
+        self._local = threading.local()
+
+    @classmethod
+    def from_pipeline(cls, pipeline) -> "FastScorer":
+        model = pipeline.named_steps["model"]
+        return cls(FeatureEncoder.from_pipeline(pipeline), model.booster_, model.classes_)
+
+    @classmethod
+    def load(cls, stem) -> "FastScorer":
+        """Load an artifact written by export_compiled. Needs numpy only."""
+        from src.models.tree_predictor import TreeEnsemble
+
+        stem = Path(stem)
+        with open(f"{stem}{ENCODING_SUFFIX}") as f:
+            meta = json.load(f)
+        if meta.get("format_version") != ARTIFACT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported artifact format: {meta.get('format_version')}")
+        booster = TreeEnsemble.from_file(f"{stem}{BOOSTER_SUFFIX}")
+        scorer = cls(FeatureEncoder.from_dict(meta["encoder"]), booster, meta["classes"])
+        scorer.source = meta.get("source") or {}
+        return scorer
+
+    def _row_buffer(self) -> np.ndarray:
+        # One preallocated row per thread; requests run concurrently in the threadpool.
+        buf = getattr(self._local, "buf", None)
+        if buf is None:
+            buf = self._local.buf = np.empty((1, self.encoder.n_features), dtype=np.float64)
+        return buf
+
+    def _proba(self, X: np.ndarray) -> np.ndarray:
+        p = self.booster.predict(X)  # P(class 1), as LGBMClassifier.predict_proba computes it
+        return np.vstack((1.0 - p, p)).T
+
+    def predict_proba(self, rows: list) -> np.ndarray:
+        if len(rows) == 1:
+            buf = self._row_buffer()
+            self.encoder.encode_into(rows[0], buf[0])
+            return self._proba(buf)
+        return self._proba(self.encoder.encode(rows))
+
+
+def export_compiled(pipeline, stem, source: Optional[dict] = None) -> list:
+    """
+    Write the fitted preprocessing + trees as `<stem>.lgb.txt` (LightGBM's native
+    model text) and `<stem>.encoding.json`. Returns the written paths.
+
+    `source` says which model was exported: {"pickle_sha256": ...} or
+    {"registry_version": ...}; it is stored in the encoding table as-is.
+    """
+    scorer = FastScorer.from_pipeline(pipeline)
+    stem = Path(stem)
+    stem.parent.mkdir(parents=True, exist_ok=True)
+    booster_path = Path(f"{stem}{BOOSTER_SUFFIX}")
+    encoding_path = Path(f"{stem}{ENCODING_SUFFIX}")
+
+    scorer.booster.save_model(str(booster_path))
+    meta = {
+        "format_version": ARTIFACT_FORMAT_VERSION,
+        "classes": scorer.classes_.tolist(),
+        "encoder": scorer.encoder.to_dict(),
+        "source": source or {},
+    }
+    with open(encoding_path, "w") as f:
+        json.dump(meta, f, indent=2)
+    return [booster_path, encoding_path]
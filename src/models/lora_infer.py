@@ -1,52 +1,389 @@
+"""
+src/models/lora_infer.py
+
+Client side of the TinyLlama explainer.
+
+PyTorch deadlocks when the model is loaded inside a forked uvicorn worker on
+macOS, so inference never runs in the service process. Instead a small pool of
+resident worker processes (src/models/explainer_worker.py) each load the model
+once and answer JSON-line requests over their stdin/stdout pipes. The pool
+restarts a worker after a crash or a timeout, so one stuck generation can't
+wedge the service.
+
+Generation is greedy, so finished explanations are cached by a hash of their
+inputs and the model revision (src/models/explanation_cache.py) and repeats
+never reach a worker.
+
+Config (environment):
+    FINRISK_EXPLAINER_WORKERS   number of resident workers (default 1)
+    FINRISK_EXPLAINER_TIMEOUT   per-request timeout in seconds (default 120)
+    FINRISK_EXPLAIN_CACHE_SIZE  in-memory cached explanations, 0 = none (default 1024)
+    FINRISK_EXPLAIN_CACHE_DB    optional SQLite file that persists the cache
+"""
+
+import atexit
+import collections
+import itertools
 import json
 import logging
+import os
+import queue
 import subprocess
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from src.models.explainer_model import MAX_BATCH as EXPLAINER_MAX_BATCH
+from src.models.explainer_model import fallback_text, model_tag
+from src.models.explanation_cache import ExplanationCache
 
 logger = logging.getLogger(__name__)
 
-_INFER_SCRIPT = """
-import sys, json, torch
-from transformers import AutoTokenizer, AutoModelForCausalLM
-data  = json.loads(sys.argv[1])
-feats, pred, max_t = data["features"], data["prediction"], data.get("max_new_tokens", 120)
-MODEL_ID = "rohankatyayani/tinyllama-credit-explainer"
-tok = AutoTokenizer.from_pretrained(MODEL_ID)
-if tok.pad_token is None:
-    tok.pad_token = tok.eos_token
-model = AutoModelForCausalLM.from_pretrained(MODEL_ID, dtype=torch.float32, low_cpu_mem_usage=True)
-model.eval()
-decision = "approved" if pred == 1 else "denied"
-feat_str = ", ".join(f"{k}={v}" for k, v in feats.items())
-prompt = f"Explain the credit risk decision for the following applicant profile.\\nInput: {feat_str}\\nDecision: {decision}.\\nExplanation:"
-inputs = tok(prompt, return_tensors="pt", truncation=True, max_length=512)
-with torch.inference_mode():
-    out = model.generate(**inputs, max_new_tokens=max_t, do_sample=False, repetition_penalty=1.2, pad_token_id=tok.eos_token_id)
-new_tokens = out[0][inputs["input_ids"].shape[-1]:]
-explanation = tok.decode(new_tokens, skip_special_tokens=True).strip()
-if not explanation or len(explanation) < 10:
-    explanation = f"Application {decision} based on the provided financial profile."
-print(json.dumps({"explanation": explanation}))
-"""
+EXPLAINER_WORKERS = int(os.getenv("FINRISK_EXPLAINER_WORKERS", "1"))
+EXPLAINER_TIMEOUT = float(os.getenv("FINRISK_EXPLAINER_TIMEOUT", "120"))
+EXPLAIN_CACHE_SIZE = int(os.getenv("FINRISK_EXPLAIN_CACHE_SIZE", "1024"))
+EXPLAIN_CACHE_DB = os.getenv("FINRISK_EXPLAIN_CACHE_DB", "")
 
+_PROJECT_ROOT = Path(__file__).resolve().parents[2]
+_WORKER_CMD = [sys.executable, "-m", "src.models.explainer_worker"]
 
-def generate_explanation(features: dict, prediction: int, max_new_tokens: int = 120) -> str:
-    payload = json.dumps(
-        {"features": features, "prediction": prediction, "max_new_tokens": max_new_tokens}
-    )
-    try:
-        result = subprocess.run(
-            [sys.executable, "-c", _INFER_SCRIPT, payload],
-            capture_output=True,
+
+class ExplainerTimeout(TimeoutError):
+    """No reply from the explainer within the request timeout."""
+
+
+class WorkerCrashed(RuntimeError):
+    """The worker process exited or its pipe broke mid-request."""
+
+
+class ExplanationAbandoned(RuntimeError):
+    """
+    Raised by an `on_token` callback whose caller went away. The request is
+    dropped; the worker finishes the generation it started and the pool skips
+    its remaining replies, as it does for a timed-out request.
+    """
+
+
+class _Worker:
+    """One resident explainer subprocess plus the threads that drain its pipes."""
+
+    def __init__(self, slot: int):
+        self.slot = slot
+        self.proc: Optional[subprocess.Popen] = None
+        self.ready = False
+        self.starts = 0
+        self.served = 0
+        self._replies: queue.Queue = queue.Queue()
+        self._stderr_tail: collections.deque = collections.deque(maxlen=20)
+        self._ids = itertools.count(1)
+
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
+    def start(self):
+        # Fresh reply queue per process, so late output from a killed worker
+        # can never be mistaken for an answer from its replacement.
+        self._replies = queue.Queue()
+        self.ready = False
+        self.proc = subprocess.Popen(
+            _WORKER_CMD,
+            cwd=_PROJECT_ROOT,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
             text=True,
-            timeout=120,
+            bufsize=1,
+        )
+        self.starts += 1
+        threading.Thread(
+            target=self._read_stdout, args=(self.proc, self._replies), daemon=True
+        ).start()
+        threading.Thread(target=self._read_stderr, args=(self.proc,), daemon=True).start()
+        logger.info(f"Explainer worker {self.slot} started (pid={self.proc.pid})")
+
+    def stop(self):
+        if self.proc is None:
+            return
+        if self.proc.poll() is None:
+            self.proc.kill()
+        try:
+            self.proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            logger.warning(f"Explainer worker {self.slot} did not exit after kill")
+        self.proc = None
+        self.ready = False
+
+    @staticmethod
+    def _read_stdout(proc: subprocess.Popen, replies: queue.Queue):
+        for line in proc.stdout:
+            if not line.startswith("{"):
+                continue
+            try:
+                replies.put(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+        replies.put(None)  # EOF: the process is gone
+
+    def _read_stderr(self, proc: subprocess.Popen):
+        for line in proc.stderr:
+            self._stderr_tail.append(line.rstrip())
+
+    def stderr_tail(self) -> str:
+        return "\n".join(self._stderr_tail)[-200:]
+
+    def request(self, message: dict, timeout: float, on_token=None) -> dict:
+        if not self.alive():
+            self.start()
+        deadline = time.monotonic() + timeout
+        req_id = next(self._ids)
+        try:
+            self.proc.stdin.write(json.dumps({**message, "id": req_id}) + "\n")
+            self.proc.stdin.flush()
+        except OSError as e:
+            raise WorkerCrashed(f"Explainer worker {self.slot} pipe closed: {e}") from e
+
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise queue.Empty
+                reply = self._replies.get(timeout=remaining)
+            except queue.Empty:
+                raise ExplainerTimeout(
+                    f"Explainer worker {self.slot} gave no reply within {timeout:.0f}s"
+                ) from None
+            if reply is None:
+                raise WorkerCrashed(f"Explainer worker {self.slot} exited: {self.stderr_tail()}")
+            if reply.get("ready"):
+                self.ready = True
+                continue
+            if reply.get("id") != req_id:
+                continue  # stale reply to a request that already timed out
+            if "token" in reply:
+                if on_token is not None:
+                    on_token(reply["token"])
+                continue
+            if "error" in reply:
+                raise RuntimeError(reply["error"])
+            self.served += 1
+            return reply
+
+
+class ExplainerPool:
+    """Fixed-size pool of resident explainer workers, checked out one request at a time."""
+
+    def __init__(self, size: int = EXPLAINER_WORKERS, timeout: float = EXPLAINER_TIMEOUT):
+        self.size = max(1, size)
+        self.timeout = timeout
+        self._workers = [_Worker(i) for i in range(self.size)]
+        self._idle: queue.Queue = queue.Queue()
+        for w in self._workers:
+            self._idle.put(w)
+
+    def warm(self):
+        """Start every worker now instead of on first use. Does not wait for the model load."""
+        for w in self._workers:
+            if not w.alive():
+                w.start()
+
+    def request(self, message: dict, timeout: Optional[float] = None, on_token=None) -> dict:
+        """
+        Send one request to the next free worker. Waiting for a worker counts
+        against the timeout. With `on_token`, the worker streams decoded text
+        and the callback is invoked for each piece before the final reply.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        try:
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise ExplainerTimeout(f"All {self.size} explainer workers busy for {timeout:.0f}s")
+        try:
+            return worker.request(message, max(deadline - time.monotonic(), 0.0), on_token)
+        except (ExplainerTimeout, WorkerCrashed) as e:
+            # A timed-out worker may still be grinding on the old request, and a
+            # crashed one is gone. Either way the next caller gets a fresh process.
+            logger.warning(f"Restarting explainer worker {worker.slot}: {e}")
+            worker.stop()
+            raise
+        finally:
+            self._idle.put(worker)
+
+    def health(self) -> dict:
+        return {
+            "size": self.size,
+            "timeout_s": self.timeout,
+            "workers": [
+                {
+                    "slot": w.slot,
+                    "alive": w.alive(),
+                    "ready": w.alive() and w.ready,
+                    "served": w.served,
+                    "restarts": max(w.starts - 1, 0),
+                }
+                for w in self._workers
+            ],
+        }
+
+    def shutdown(self):
+        for w in self._workers:
+            w.stop()
+
+
+_pool: Optional[ExplainerPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ExplainerPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ExplainerPool()
+                atexit.register(_pool.shutdown)
+    return _pool
+
+
+def pool_health() -> dict:
+    """Worker status without spawning anything if the pool was never used."""
+    if _pool is None:
+        return {"size": EXPLAINER_WORKERS, "timeout_s": EXPLAINER_TIMEOUT, "workers": []}
+    return _pool.health()
+
+
+def shutdown_pool():
+    if _pool is not None:
+        _pool.shutdown()
+
+
+_cache: Optional[ExplanationCache] = None
+
+
+def get_cache() -> Optional[ExplanationCache]:
+    """The process-wide explanation cache, or None when caching is disabled."""
+    global _cache
+    if _cache is None and (EXPLAIN_CACHE_SIZE > 0 or EXPLAIN_CACHE_DB):
+        with _pool_lock:
+            if _cache is None:
+                _cache = ExplanationCache(
+                    model_tag(),
+                    capacity=EXPLAIN_CACHE_SIZE,
+                    db_path=EXPLAIN_CACHE_DB or None,
+                )
+    return _cache
+
+
+def cache_stats() -> dict:
+    cache = get_cache()
+    return cache.stats() if cache is not None else {"enabled": False}
+
+
+def cached_explanation(features: dict, prediction: int, max_new_tokens: int = 120):
+    """The cached explanation for these inputs, or None. Never touches a worker."""
+    cache = get_cache()
+    if cache is None:
+        return None
+    return cache.get(cache.key(features, prediction, max_new_tokens))
+
+
+def generate_explanation(
+    features: dict,
+    prediction: int,
+    max_new_tokens: int = 120,
+    on_token=None,
+    deadline_at: Optional[float] = None,
+) -> str:
+    """
+    Explanation for one decision. `on_token(text)` receives pieces as they are
+    generated; the return value is still the full, cleaned-up explanation.
+    With `deadline_at` (Unix time, set when the request arrived, so time spent
+    queued counts against it), generation still running then wraps up at the
+    next sentence end. Such shortened text is not cached.
+    """
+    cache = get_cache()
+    if cache is not None:
+        key = cache.key(features, prediction, max_new_tokens)
+        cached = cache.get(key)
+        if cached is not None:
+            if on_token is not None:
+                on_token(cached)
+            return cached
+
+    message = {"features": features, "prediction": prediction, "max_new_tokens": max_new_tokens}
+    if on_token is not None:
+        message["stream"] = True
+    if deadline_at is not None:
+        # Wall clock, not monotonic: the worker is another process.
+        message["deadline_at"] = deadline_at
+    try:
+        reply = get_pool().request(message, on_token=on_token)
+    except ExplainerTimeout:
+        # The fallback sentence is never cached: a later call may well get a real answer.
+        return fallback_text(prediction)
+
+    # Text cut short by the deadline is not cached: a later call may have time for all of it.
+    if cache is not None and not reply.get("truncated"):
+        _store(
+            cache, reply.get("model"), features, prediction, max_new_tokens, reply["explanation"]
         )
-        if result.returncode != 0:
-            raise RuntimeError(f"Subprocess failed: {result.stderr[-200:]}")
-        output_line = [line for line in result.stdout.strip().splitlines() if line.startswith("{")]
-        if not output_line:
-            raise RuntimeError("No JSON output from subprocess")
-        return json.loads(output_line[-1])["explanation"]
-    except subprocess.TimeoutExpired:
-        decision_word = "approved" if prediction == 1 else "denied"
-        return f"Application {decision_word} based on the provided financial profile."
+    return reply["explanation"]
+
+
+def _store(
+    cache,
+    reply_tag,
+    features: dict,
+    prediction: int,
+    max_new_tokens: int,
+    text: str,
+    batched: bool = False,
+):
+    if reply_tag and reply_tag != cache.model_tag:
+        logger.info(f"Explainer model changed to {reply_tag}; clearing explanation cache")
+        cache.set_model(reply_tag)
+    cache.put(cache.key(features, prediction, max_new_tokens, batched), text)
+
+
+def generate_explanations(items: list, max_new_tokens: int = 120) -> list:
+    """
+    Explanations for many (features, prediction) pairs, in input order.
+    Cache misses go to the workers in chunks of FINRISK_EXPLAINER_MAX_BATCH,
+    each chunk one batched request (several prompts per forward pass), with
+    chunks spread over all workers. A chunk that times out gets fallback
+    sentences; the timeout applies per chunk. Batched output is cached apart
+    from generate_explanation's, since left-padding may change the text.
+    """
+    cache = get_cache()
+    results = [None] * len(items)
+    misses = []
+    for i, (features, prediction) in enumerate(items):
+        if cache is not None:
+            results[i] = cache.get(cache.key(features, prediction, max_new_tokens, batched=True))
+        if results[i] is None:
+            misses.append(i)
+    if not misses:
+        return results
+
+    pool = get_pool()
+    chunks = [
+        misses[j : j + EXPLAINER_MAX_BATCH] for j in range(0, len(misses), EXPLAINER_MAX_BATCH)
+    ]
+
+    def run(chunk: list):
+        batch = [{"features": items[i][0], "prediction": items[i][1]} for i in chunk]
+        try:
+            reply = pool.request({"batch": batch, "max_new_tokens": max_new_tokens})
+        except ExplainerTimeout:
+            return chunk, [fallback_text(items[i][1]) for i in chunk], None
+        return chunk, reply["explanations"], reply.get("model")
+
+    with ThreadPoolExecutor(max_workers=min(pool.size, len(chunks))) as ex:
+        for chunk, texts, reply_tag in ex.map(run, chunks):
+            for i, text in zip(chunk, texts):
+                results[i] = text
+                if cache is not None and reply_tag is not None:
+                    _store(cache, reply_tag, *items[i], max_new_tokens, text, batched=True)
+    return results
@@ -0,0 +1,149 @@
+"""
+src/models/tree_predictor.py
+
+Evaluate a LightGBM binary model from its native model text with nothing but
+NumPy. Importing lightgbm pulls in sklearn and pandas, which is exactly the
+startup cost and per-worker memory the compiled artifact is meant to avoid.
+
+Every tree is flattened into shared node arrays (internal nodes followed by
+self-looping leaves), so one prediction is a fixed number of vectorized steps
+over all trees at once. Split semantics, tree-sum order and the sigmoid follow
+LightGBM's C++ predictor, so probabilities match Booster.predict bit for bit.
+"""
+
+import math
+
+import numpy as np
+
+_K_ZERO_THRESHOLD = 1e-35  # LightGBM's kZeroThreshold
+_MISSING_NONE, _MISSING_ZERO, _MISSING_NAN = 0, 1, 2
+
+
+def _parse_model_text(text: str):
+    header, trees, current = {}, [], None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("Tree="):
+            current = {}
+            trees.append(current)
+        elif line == "end of trees":
+            break
+        elif "=" in line:
+            key, value = line.split("=", 1)
+            (current if current is not None else header)[key] = value
+    return header, trees
+
+
+def _floats(s: str) -> list:
+    return [float(v) for v in s.split()]
+
+
+def _ints(s: str) -> list:
+    return [int(v) for v in s.split()]
+
+
+class TreeEnsemble:
+    """Flat-array LightGBM binary classifier. predict(X) returns P(class 1)."""
+
+    def __init__(self, header: dict, trees: list):
+        objective = header.get("objective", "").split()
+        if not objective or objective[0] != "binary" or int(header.get("num_class", 1)) != 1:
+            raise ValueError(f"Only binary objectives are supported, got {header.get('objective')}")
+        self.sigmoid = 1.0
+        for part in objective[1:]:
+            if part.startswith("sigmoid:"):
+                self.sigmoid = float(part.split(":", 1)[1])
+
+        feature, threshold, decision, left, right, value, roots = [], [], [], [], [], [], []
+        max_depth = 0
+        for t in trees:
+            if int(t.get("num_cat", 0)) or t.get("is_linear", "0") != "0":
+                raise ValueError("Categorical splits and linear trees are not supported")
+            n_leaves = int(t["num_leaves"])
+            base = len(feature)
+            n_internal = n_leaves - 1
+            leaf_base = base + n_internal
+            roots.append(base if n_internal else leaf_base)
+
+            def node_id(child: int) -> int:
+                return base + child if child >= 0 else leaf_base + ~child
+
+            if n_internal:
+                feature += _ints(t["split_feature"])
+                threshold += _floats(t["threshold"])
+                decision += _ints(t["decision_type"])
+                lc, rc = _ints(t["left_child"]), _ints(t["right_child"])
+                left += [node_id(c) for c in lc]
+                right += [node_id(c) for c in rc]
+                max_depth = max(max_depth, self._depth(lc, rc))
+            # Leaves loop onto themselves, so extra traversal steps are no-ops.
+            leaf_ids = list(range(leaf_base, leaf_base + n_leaves))
+            feature += [0] * n_leaves
+            threshold += [0.0] * n_leaves
+            decision += [0] * n_leaves
+            left += leaf_ids
+            right += leaf_ids
+            value += [0.0] * n_internal + _floats(t["leaf_value"])
+
+        decision = np.asarray(decision, dtype=np.int64)
+        self.feature = np.asarray(feature, dtype=np.int64)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.default_left = (decision & 2).astype(bool)
+        self.missing_type = (decision >> 2) & 3
+        self._uses_missing = bool((self.missing_type != _MISSING_NONE).any())
+        self.left = np.asarray(left, dtype=np.int64)
+        self.right = np.asarray(right, dtype=np.int64)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.roots = np.asarray(roots, dtype=np.int64)
+        self.max_depth = max_depth
+        self.num_trees = len(trees)
+
+    @staticmethod
+    def _depth(left_child: list, right_child: list) -> int:
+        depth, stack = 0, [(0, 1)]
+        while stack:
+            node, d = stack.pop()
+            depth = max(depth, d)
+            for child in (left_child[node], right_child[node]):
+                if child >= 0:
+                    stack.append((child, d + 1))
+        return depth
+
+    @classmethod
+    def from_string(cls, text: str) -> "TreeEnsemble":
+        return cls(*_parse_model_text(text))
+
+    @classmethod
+    def from_file(cls, path) -> "TreeEnsemble":
+        with open(path) as f:
+            return cls.from_string(f.read())
+
+    def raw_score(self, X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float64)
+        node = np.broadcast_to(self.roots, (X.shape[0], self.num_trees)).copy()
+        # No zero/NaN-as-missing splits and no NaNs: every split is a plain `<=`.
+        plain = not self._uses_missing and not np.isnan(X).any()
+        for _ in range(self.max_depth):
+            fval = np.take_along_axis(X, self.feature[node], axis=1)
+            if plain:
+                node = np.where(fval <= self.threshold[node], self.left[node], self.right[node])
+                continue
+            missing = self.missing_type[node]
+            is_nan = np.isnan(fval)
+            fval = np.where(is_nan & (missing != _MISSING_NAN), 0.0, fval)
+            use_default = ((missing == _MISSING_ZERO) & (np.abs(fval) <= _K_ZERO_THRESHOLD)) | (
+                (missing == _MISSING_NAN) & is_nan
+            )
+            go_left = np.where(use_default, self.default_left[node], fval <= self.threshold[node])
+            node = np.where(go_left, self.left[node], self.right[node])
+        # cumsum accumulates strictly left to right, the same order LightGBM adds trees.
+        return np.cumsum(self.value[node], axis=1)[:, -1]
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        # math.exp is the same libm exp LightGBM's C++ sigmoid calls.
+        raw = self.raw_score(X)
+        return np.fromiter(
+            (1.0 / (1.0 + math.exp(-self.sigmoid * r)) for r in raw),
+            dtype=np.float64,
+            count=len(raw),
+        )
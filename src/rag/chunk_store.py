@@ -0,0 +1,163 @@
+"""
+src/rag/chunk_store.py
+
+Columnar, memory-mapped store for the RAG chunk metadata.
+
+chunks.json has to be parsed in full by every process that answers
+questions: ~0.5 MB of JSON for 561 chunks, growing linearly with the corpus.
+The store keeps each field (id, source, text) as one UTF-8 blob plus an int64
+offsets array, so row i of a column is blob[offsets[i]:offsets[i + 1]]. Both
+files are opened with mmap: opening is constant-time, a lookup decodes only
+the rows retrieval returns, and all API workers share the same pages through
+the OS page cache.
+
+Layout (a directory, data/rag/index/chunks/ by default):
+    meta.json             {"format_version": 1, "count": n, "columns": [...],
+                           "has_ids": bool, "version": index version or null}
+    <column>.bin          concatenated UTF-8 values
+    <column>.offsets.npy  int64 byte offsets, n + 1 entries
+    ids.npy               optional: ascending FAISS id of each row
+
+Without ids.npy the FAISS id of a chunk is its row number. Incremental
+ingest gives each PDF its own id range and leaves gaps when files are
+removed, so it writes the ids and the query path resolves hits with `by_id`.
+
+Convert an existing chunks.json:
+    python -m src.rag.chunk_store
+"""
+
+import json
+import mmap
+import shutil
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+
+FORMAT_VERSION = 1
+COLUMNS = ("id", "source", "text")
+STORE_PATH = Path("data/rag/index/chunks")
+
+
+def write_store(
+    chunks: list[dict],
+    path: Union[str, Path] = STORE_PATH,
+    ids: Optional[np.ndarray] = None,
+    version: Optional[int] = None,
+) -> Path:
+    """Write `chunks` (dicts with id/source/text) as a store directory, replacing any old one.
+
+    `ids` are the rows' FAISS ids, ascending; `version` ties the store to the
+    index build it belongs to.
+    """
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    for column in COLUMNS:
+        offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+        with open(tmp / f"{column}.bin", "wb") as f:
+            for i, chunk in enumerate(chunks):
+                offsets[i + 1] = offsets[i] + f.write(chunk[column].encode("utf-8"))
+        np.save(tmp / f"{column}.offsets.npy", offsets)
+    if ids is not None:
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) != len(chunks) or np.any(np.diff(ids) <= 0):
+            raise ValueError("ids must be strictly ascending, one per chunk")
+        np.save(tmp / "ids.npy", ids)
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "count": len(chunks),
+        "columns": list(COLUMNS),
+        "has_ids": ids is not None,
+        "version": version,
+    }
+    (tmp / "meta.json").write_text(json.dumps(meta, indent=2) + "\n")
+    return swap_directory(tmp, path)
+
+
+def swap_directory(tmp: Path, path: Path) -> Path:
+    """Replace directory `path` with the fully written `tmp`."""
+    # Readers that already mapped the old files keep them (unlinked files stay
+    # valid while mapped); new readers only ever see a complete directory.
+    old = path.with_name(path.name + ".old")
+    shutil.rmtree(old, ignore_errors=True)
+    if path.exists():
+        path.rename(old)
+    tmp.rename(path)
+    shutil.rmtree(old, ignore_errors=True)
+    return path
+
+
+class _Column:
+    def __init__(self, directory: Path, name: str):
+        self.offsets = np.load(directory / f"{name}.offsets.npy", mmap_mode="r")
+        with open(directory / f"{name}.bin", "rb") as f:
+            # mmap refuses zero-length files (a corpus of empty strings).
+            self.blob = (
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.offsets[-1] else b""
+            )
+
+    def __getitem__(self, i: int) -> str:
+        return self.blob[self.offsets[i] : self.offsets[i + 1]].decode("utf-8")
+
+    def close(self):
+        if isinstance(self.blob, mmap.mmap):
+            self.blob.close()
+
+
+class ChunkStore:
+    """Read-only view of a store directory; `store[i]` is the same dict chunks.json held."""
+
+    def __init__(self, path: Union[str, Path] = STORE_PATH):
+        self.path = Path(path)
+        meta = json.loads((self.path / "meta.json").read_text())
+        if meta.get("format_version") != FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported chunk store version {meta.get('format_version')} at {self.path}"
+            )
+        self._count = int(meta["count"])
+        self.version = meta.get("version")
+        self._columns = {name: _Column(self.path, name) for name in meta["columns"]}
+        self.ids = np.load(self.path / "ids.npy", mmap_mode="r") if meta.get("has_ids") else None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, i: int) -> dict:
+        i = int(i)
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError(f"chunk {i} out of range for store of {self._count}")
+        return {name: column[i] for name, column in self._columns.items()}
+
+    def by_id(self, faiss_id: int) -> dict:
+        """The chunk a FAISS search hit refers to."""
+        if self.ids is None:
+            return self[faiss_id]
+        row = int(np.searchsorted(self.ids, faiss_id))
+        if row == self._count or self.ids[row] != faiss_id:
+            raise KeyError(f"no chunk with id {faiss_id} in {self.path}")
+        return self[row]
+
+    def __iter__(self):
+        return (self[i] for i in range(self._count))
+
+    def column(self, name: str) -> list[str]:
+        """Every value of one field, e.g. all chunk ids."""
+        column = self._columns[name]
+        return [column[i] for i in range(self._count)]
+
+    def close(self):
+        for column in self._columns.values():
+            column.close()
+
+
+if __name__ == "__main__":
+    source = STORE_PATH.with_name("chunks.json")
+    with open(source) as f:
+        chunks = json.load(f)
+    write_store(chunks, STORE_PATH)
+    print(f"✅ Wrote {len(chunks)} chunks from {source} to {STORE_PATH}/")
@@ -0,0 +1,271 @@
+"""
+src/rag/context.py
+
+Builds the context passages of the RAG prompt from the retrieved chunks.
+
+Ingest cuts each PDF into 800-character windows that overlap by 100
+characters (src/rag/ingest.py chunk_text), so when retrieval returns
+neighbouring chunks of one document the prompt repeats their shared text.
+The assembler stitches chunks that are consecutive in the same source into
+one passage, dropping the repeated overlap, and then fits the passages into
+a token budget: passages go in best-ranked first, the one that crosses the
+budget is cut at a token boundary, and any after it are left out.
+
+A merged passage keeps the rank of every chunk in it as its label, e.g.
+"[1][3] (source: ...)", so citations still match the sources list.
+
+Tokens are counted with a real tokenizer (transformers AutoTokenizer,
+FINRISK_RAG_TOKENIZER). The default is TinyLlama's Llama 2 vocabulary: public,
+small, and it splits English into somewhat more tokens than Llama 3.1's, so
+the budget errs on the short side for the Groq model. If the tokenizer can't
+be loaded (no transformers, no network and no local copy) counts fall back to
+an estimate of four characters per token, and /metrics says so.
+
+Config (environment):
+    FINRISK_RAG_CONTEXT_TOKENS  token budget for all passages together (default 1500, 0 = none)
+    FINRISK_RAG_TOKENIZER       Hugging Face tokenizer ID (default TinyLlama/TinyLlama-1.1B-Chat-v1.0)
+
+Per request, the tokens saved against sending every chunk in full are
+recorded; totals and recent percentiles are on /metrics under rag_context.
+"""
+
+import collections
+import logging
+import os
+import re
+import threading
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("FINRISK_RAG_CONTEXT_TOKENS", "1500"))
+TOKENIZER_ID = os.getenv("FINRISK_RAG_TOKENIZER", "TinyLlama/TinyLlama-1.1B-Chat-v1.0")
+# A passage cut to fewer tokens than this is left out instead.
+MIN_PASSAGE_TOKENS = 32
+# Shortest suffix/prefix match accepted as the overlap between two chunks.
+MIN_OVERLAP_CHARS = 20
+SAVINGS_WINDOW = 1000
+ELLIPSIS = " …"
+
+_CHUNK_ID = re.compile(r"^(?P<doc>.+)__chunk(?P<n>\d+)$")
+
+
+class HFTokenizer:
+    """A Hugging Face tokenizer, counting tokens without special tokens."""
+
+    def __init__(self, model_id: str = TOKENIZER_ID):
+        from transformers import AutoTokenizer
+
+        self.name = model_id
+        self._tok = AutoTokenizer.from_pretrained(model_id)
+
+    def count(self, text: str) -> int:
+        return len(self._tok.encode(text, add_special_tokens=False))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """The longest prefix of `text` that is at most `max_tokens` tokens."""
+        offsets = self._tok(text, add_special_tokens=False, return_offsets_mapping=True)[
+            "offset_mapping"
+        ]
+        return text if len(offsets) <= max_tokens else text[: offsets[max_tokens - 1][1]]
+
+
+class CharEstimate:
+    """Four characters per token, for when no tokenizer can be loaded."""
+
+    name = "estimate (4 chars/token)"
+
+    def count(self, text: str) -> int:
+        return -(-len(text) // 4)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        return text[: max_tokens * 4]
+
+
+class Passage(NamedTuple):
+    ranks: tuple  # ranks of the chunks stitched into this passage, ascending
+    source: str
+    text: str
+
+
+class AssembledContext(NamedTuple):
+    text: str
+    passages: list  # Passage, in prompt order, after trimming
+    tokens: int  # tokens in `text`
+    tokens_full: int  # tokens had every chunk been sent whole, one passage each
+    merged: int  # chunks folded into a neighbour's passage
+    trimmed: int  # passages cut to fit the budget
+    dropped: int  # passages left out for lack of budget
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_full - self.tokens
+
+
+def format_passage(passage: Passage) -> str:
+    labels = "".join(f"[{rank}]" for rank in passage.ranks)
+    return f"{labels} (source: {passage.source})\n{passage.text}\n"
+
+
+def _overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of `left` that is a prefix of `right` (0 if too short)."""
+    tail, probe = left[-len(right) :], right[:MIN_OVERLAP_CHARS]
+    start = tail.find(probe)
+    while start != -1:
+        if right.startswith(tail[start:]):
+            return len(tail) - start
+        start = tail.find(probe, start + 1)
+    return 0
+
+
+def merge_chunks(chunks: list[dict]) -> list[Passage]:
+    """
+    One passage per run of consecutive chunks (by chunk number) from the same
+    source, with the text they share kept once; ordered by best rank. Chunks
+    whose id doesn't follow ingest's "<doc>__chunkNNNN" pattern stay alone.
+    """
+    runs: list[list[dict]] = []
+    numbered: dict = {}  # (source, doc) -> [(chunk number, chunk)]
+    for c in chunks:
+        m = _CHUNK_ID.match(c["chunk_id"])
+        if m is None:
+            runs.append([c])
+        else:
+            numbered.setdefault((c["source"], m["doc"]), []).append((int(m["n"]), c))
+
+    for members in numbered.values():
+        members.sort(key=lambda member: member[0])
+        run, last = [], None
+        for n, c in members:
+            if run and n != last + 1:
+                runs.append(run)
+                run = []
+            run.append(c)
+            last = n
+        runs.append(run)
+
+    passages = []
+    for run in runs:
+        text = run[0]["text"]
+        for c in run[1:]:
+            shared = _overlap(text, c["text"])
+            text = text + c["text"][shared:] if shared else f"{text} {c['text']}"
+        ranks = tuple(sorted(c["rank"] for c in run))
+        passages.append(Passage(ranks, run[0]["source"], text))
+    return sorted(passages, key=lambda p: p.ranks[0])
+
+
+class ContextAssembler:
+    def __init__(self, budget: int = CONTEXT_TOKEN_BUDGET, tokenizer=None):
+        self.budget = budget
+        self._tokenizer = tokenizer
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self.requests = 0
+        self.tokens_full = 0
+        self.tokens_sent = 0
+        self.merged = 0
+        self.trimmed = 0
+        self.dropped = 0
+        self._saved = collections.deque(maxlen=SAVINGS_WINDOW)
+
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None:
+            with self._load_lock:
+                if self._tokenizer is None:
+                    try:
+                        self._tokenizer = HFTokenizer()
+                    except Exception as e:
+                        logger.warning(
+                            f"Could not load tokenizer {TOKENIZER_ID} ({e}); "
+                            "estimating context tokens from characters"
+                        )
+                        self._tokenizer = CharEstimate()
+        return self._tokenizer
+
+    def assemble(self, chunks: list[dict]) -> AssembledContext:
+        tok = self.tokenizer
+        full = "\n".join(
+            format_passage(Passage((c["rank"],), c["source"], c["text"])) for c in chunks
+        )
+        passages = merge_chunks(chunks)
+
+        kept, used, trimmed = [], 0, 0
+        for passage in passages:
+            block = format_passage(passage) + "\n"
+            cost = tok.count(block)
+            if not self.budget or used + cost <= self.budget:
+                kept.append(passage)
+                used += cost
+                continue
+            header = tok.count(format_passage(passage._replace(text="")) + "\n")
+            room = self.budget - used - header - tok.count(ELLIPSIS)
+            if room >= MIN_PASSAGE_TOKENS:
+                text = tok.truncate(passage.text, room).rstrip() + ELLIPSIS
+                kept.append(passage._replace(text=text))
+                trimmed += 1
+            break
+
+        text = "\n".join(format_passage(p) for p in kept)
+        context = AssembledContext(
+            text=text,
+            passages=kept,
+            tokens=tok.count(text),
+            tokens_full=tok.count(full),
+            merged=len(chunks) - len(passages),
+            trimmed=trimmed,
+            dropped=len(passages) - len(kept),
+        )
+        with self._lock:
+            self.requests += 1
+            self.tokens_full += context.tokens_full
+            self.tokens_sent += context.tokens
+            self.merged += context.merged
+            self.trimmed += context.trimmed
+            self.dropped += context.dropped
+            self._saved.append(context.tokens_saved)
+        return context
+
+    def stats(self) -> dict:
+        with self._lock:
+            saved = np.array(self._saved) if self._saved else None
+            return {
+                "tokenizer": self._tokenizer.name if self._tokenizer is not None else None,
+                "budget_tokens": self.budget,
+                "requests": self.requests,
+                "tokens_full": self.tokens_full,
+                "tokens_sent": self.tokens_sent,
+                "tokens_saved": self.tokens_full - self.tokens_sent,
+                "saved_fraction": (
+                    1 - self.tokens_sent / self.tokens_full if self.tokens_full else 0.0
+                ),
+                "chunks_merged": self.merged,
+                "passages_trimmed": self.trimmed,
+                "passages_dropped": self.dropped,
+                "saved_per_request_p50": (
+                    float(np.percentile(saved, 50)) if saved is not None else None
+                ),
+                "saved_per_request_p90": (
+                    float(np.percentile(saved, 90)) if saved is not None else None
+                ),
+            }
+
+
+_assembler: Optional[ContextAssembler] = None
+_assembler_lock = threading.Lock()
+
+
+def get_context_assembler() -> ContextAssembler:
+    global _assembler
+    if _assembler is None:
+        with _assembler_lock:
+            if _assembler is None:
+                _assembler = ContextAssembler()
+    return _assembler
+
+
+def context_stats() -> dict:
+    return _assembler.stats() if _assembler is not None else {"requests": 0}
@@ -0,0 +1,175 @@
+"""
+src/rag/embedding_cache.py
+
+Persistent cache of chunk embeddings for ingest.
+
+Encoding is deterministic, so a chunk whose text is byte-identical to one
+seen before (an unchanged page of a re-issued PDF, a --full rebuild, a
+chunking change that leaves most windows alone) maps to the same vector.
+Entries are keyed by SHA-256 over the model id and the chunk text.
+
+Layout (a directory, data/rag/index/embedding_cache/ by default):
+    meta.json    {"format_version": 1, "model_id": ..., "dim": d, "count": n}
+    vectors.f32  n x d float32 rows, memory-mapped for reads, appended on write
+    keys.bin     n x 32-byte SHA-256 digests; row i of vectors belongs to key i
+
+meta.json is rewritten after every append, so rows past its count (from an
+interrupted run) are ignored and truncated on the next open. Opening the
+cache with a different model id compacts it to zero rows: vectors from
+another model are never comparable. `compact(live_texts)` drops rows for
+chunks that are no longer in the corpus.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Callable, Iterable, Optional, Union
+
+import numpy as np
+
+FORMAT_VERSION = 1
+KEY_BYTES = 32
+
+
+class EmbeddingCache:
+    def __init__(self, directory: Union[str, Path], model_id: str):
+        self.directory = Path(directory)
+        self.model_id = model_id
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._vectors_path = self.directory / "vectors.f32"
+        self._keys_path = self.directory / "keys.bin"
+        self._meta_path = self.directory / "meta.json"
+        self.hits = 0
+        self.misses = 0
+
+        meta = self._read_meta()
+        if meta is None or meta.get("model_id") != model_id or not self._complete(meta):
+            # New cache, another model's vectors, or a torn compaction: start over.
+            meta = {"dim": None, "count": 0}
+        self.dim: Optional[int] = meta["dim"]
+        self.count: int = meta["count"]
+        self._truncate_to(self.count)
+        keys = np.fromfile(self._keys_path, dtype=f"S{KEY_BYTES}") if self.count else []
+        self._rows = {bytes(key): row for row, key in enumerate(keys)}
+        self._write_meta()
+        self._vectors = None
+
+    def _read_meta(self) -> Optional[dict]:
+        try:
+            meta = json.loads(self._meta_path.read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+        return meta if meta.get("format_version") == FORMAT_VERSION else None
+
+    def _complete(self, meta: dict) -> bool:
+        expected = ((self._vectors_path, 4 * (meta["dim"] or 0)), (self._keys_path, KEY_BYTES))
+        return all(
+            path.exists() and path.stat().st_size >= meta["count"] * row_bytes
+            for path, row_bytes in expected
+        )
+
+    def _write_meta(self):
+        meta = {
+            "format_version": FORMAT_VERSION,
+            "model_id": self.model_id,
+            "dim": self.dim,
+            "count": self.count,
+        }
+        tmp = self._meta_path.with_name(self._meta_path.name + ".tmp")
+        tmp.write_text(json.dumps(meta, indent=2) + "\n")
+        os.replace(tmp, self._meta_path)
+
+    def _truncate_to(self, count: int):
+        row_bytes = 4 * (self.dim or 0)
+        for path, size in (
+            (self._vectors_path, count * row_bytes),
+            (self._keys_path, count * KEY_BYTES),
+        ):
+            with open(path, "ab") as f:
+                f.truncate(size)
+
+    def key(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self.model_id}\0{text}".encode("utf-8")).digest()
+
+    def _matrix(self) -> np.ndarray:
+        if self._vectors is None or len(self._vectors) != self.count:
+            self._vectors = np.memmap(
+                self._vectors_path, dtype=np.float32, mode="r", shape=(self.count, self.dim)
+            )
+        return self._vectors
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        row = self._rows.get(self.key(text))
+        return None if row is None else np.array(self._matrix()[row])
+
+    def add(self, texts: list[str], vectors: np.ndarray):
+        """Append vectors for `texts` (already-cached texts are skipped)."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"cache holds {self.dim}-dim vectors, got {vectors.shape[1]}")
+        new_rows, new_keys = [], []
+        for i, text in enumerate(texts):
+            key = self.key(text)
+            if key not in self._rows:
+                self._rows[key] = self.count + len(new_rows)
+                new_rows.append(i)
+                new_keys.append(key)
+        if not new_rows:
+            return
+        with open(self._vectors_path, "ab") as f:
+            f.write(vectors[new_rows].tobytes())
+        with open(self._keys_path, "ab") as f:
+            f.write(b"".join(new_keys))
+        self.count += len(new_rows)
+        self._write_meta()
+
+    def embed(self, texts: list[str], encode: Callable[[list[str]], np.ndarray]) -> np.ndarray:
+        """Vectors for `texts`; `encode` sees each uncached text once, cached ones not at all."""
+        rows = [self._rows.get(self.key(text)) for text in texts]
+        missing = list(dict.fromkeys(text for text, row in zip(texts, rows) if row is None))
+        self.hits += len(texts) - sum(row is None for row in rows)
+        self.misses += len(missing)
+        if missing:
+            self.add(missing, encode(missing))
+            rows = [self._rows[self.key(text)] for text in texts]
+        if not texts:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        return np.array(self._matrix()[rows])
+
+    def compact(self, live_texts: Iterable[str], min_dead_fraction: float = 0.5) -> int:
+        """Drop rows of texts not in `live_texts` once they are `min_dead_fraction` of the cache.
+
+        Returns the number of rows dropped.
+        """
+        live = {self.key(text) for text in live_texts}
+        keep = sorted(row for key, row in self._rows.items() if key in live)
+        dead = self.count - len(keep)
+        if not dead or dead < min_dead_fraction * self.count:
+            return 0
+        vectors = np.array(self._matrix()[keep])
+        keys = sorted(self._rows, key=self._rows.get)
+        keys = [keys[row] for row in keep]
+        self._vectors = None
+        for path, blob in (
+            (self._vectors_path, vectors.tobytes()),
+            (self._keys_path, b"".join(keys)),
+        ):
+            tmp = path.with_name(path.name + ".tmp")
+            tmp.write_bytes(blob)
+            os.replace(tmp, path)
+        self.count = len(keep)
+        self._rows = {key: row for row, key in enumerate(keys)}
+        self._write_meta()
+        return dead
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model_id,
+            "entries": self.count,
+            "hits": self.hits,
+            "misses": self.misses,
+            "path": str(self.directory),
+        }
@@ -0,0 +1,470 @@
+"""
+src/rag/generation.py
+
+Answer-generation backends for the RAG query path.
+
+qa.py builds chat messages and hands them to whichever backend
+FINRISK_RAG_BACKEND names:
+
+    groq   Groq's hosted Llama 3.1 8B (default; needs GROQ_API_KEY)
+    local  any OpenAI-compatible /chat/completions server — llama.cpp's
+           llama-server, vLLM or Ollama serving TinyLlama or another small
+           chat model, or scripts/stub_llm_server.py
+    stub   deterministic in-process answers that cite the passages they were
+           given; no network, no key, for tests and offline load tests
+
+Every backend has the same two calls, complete() and stream(), and the same
+RetryPolicy: a per-request timeout, and up to `max_retries` retries with
+exponential backoff on timeouts, connection errors, 429 and 5xx. A stream is
+only retried until its first token has been yielded, so a caller never sees
+text twice. A 429 (or any Retry-After) pauses every request on the backend,
+not just the one that got it, so concurrent callers such as /ask_policy_batch
+back off together instead of each burning its own retries.
+
+The local backend keeps one httpx.Client for the life of the process, so
+requests reuse pooled keep-alive connections instead of opening a socket per
+question.
+
+Config (environment):
+    FINRISK_RAG_BACKEND          groq | local | stub
+    FINRISK_RAG_MODEL            model name sent to the backend (default per backend)
+    FINRISK_RAG_LOCAL_URL        base URL of the local server (default http://localhost:8080/v1)
+    FINRISK_RAG_LOCAL_API_KEY    bearer token for the local server, if it wants one
+    FINRISK_RAG_POOL_SIZE        keep-alive connections to the local server (default 8)
+    FINRISK_RAG_TIMEOUT_S        per-request timeout (default 30)
+    FINRISK_RAG_MAX_RETRIES      retries after the first attempt (default 2)
+    FINRISK_RAG_RETRY_BACKOFF_S  first backoff, doubled per retry (default 0.5)
+    FINRISK_RAG_STUB_DELAY_MS    stub backend: simulated latency per token (default 0)
+"""
+
+import datetime
+import email.utils
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Iterator, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("groq", "local", "stub")
+BACKEND = os.getenv("FINRISK_RAG_BACKEND", "groq")
+DEFAULT_MODELS = {"groq": "llama-3.1-8b-instant", "local": "tinyllama", "stub": "stub"}
+LOCAL_URL = os.getenv("FINRISK_RAG_LOCAL_URL", "http://localhost:8080/v1")
+LOCAL_API_KEY = os.getenv("FINRISK_RAG_LOCAL_API_KEY", "")
+POOL_SIZE = int(os.getenv("FINRISK_RAG_POOL_SIZE", "8"))
+TIMEOUT_S = float(os.getenv("FINRISK_RAG_TIMEOUT_S", "30"))
+MAX_RETRIES = int(os.getenv("FINRISK_RAG_MAX_RETRIES", "2"))
+RETRY_BACKOFF_S = float(os.getenv("FINRISK_RAG_RETRY_BACKOFF_S", "0.5"))
+STUB_DELAY_MS = float(os.getenv("FINRISK_RAG_STUB_DELAY_MS", "0"))
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class Usage(NamedTuple):
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+
+
+class Completion(NamedTuple):
+    text: str
+    usage: Optional[Usage]
+
+
+class GenerationError(RuntimeError):
+    """The backend failed, or kept failing after every retry."""
+
+    def __init__(
+        self,
+        message: str,
+        retryable: bool = False,
+        retry_after: Optional[float] = None,
+        rate_limited: bool = False,
+    ):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+        self.rate_limited = rate_limited
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds from a Retry-After header: delay-seconds or an HTTP-date; None if neither."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:  # an HTTP-date is always GMT
+        when = when.replace(tzinfo=datetime.timezone.utc)
+    return max(0.0, (when - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+
+class RetryPolicy(NamedTuple):
+    timeout_s: float = TIMEOUT_S
+    max_retries: int = MAX_RETRIES
+    backoff_s: float = RETRY_BACKOFF_S
+
+    def delay(self, attempt: int, error: GenerationError) -> float:
+        """Seconds to wait before retry number `attempt` (1-based)."""
+        backoff = self.backoff_s * 2 ** (attempt - 1)
+        return max(backoff, error.retry_after or 0.0)
+
+
+class GenerationBackend:
+    """complete() and stream() with retries; subclasses implement _complete and _stream."""
+
+    name = ""
+
+    def __init__(self, model: str, policy: Optional[RetryPolicy] = None):
+        self.model = model
+        self.policy = policy or RetryPolicy()
+        self._lock = threading.Lock()
+        self._pause_until = 0.0  # monotonic time before which no request is sent
+        self.requests = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.failures = 0
+
+    def _complete(self, messages: list, temperature: float, max_tokens: int) -> Completion:
+        raise NotImplementedError
+
+    def _stream(self, messages: list, temperature: float, max_tokens: int) -> Iterator:
+        """Yields text pieces, then one Usage (or None) last."""
+        raise NotImplementedError
+
+    def _count(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def _wait_for_pause(self):
+        delay = self._pause_until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _retry_or_raise(self, attempt: int, error: GenerationError):
+        if not error.retryable or attempt > self.policy.max_retries:
+            self._count(failures=1)
+            raise error
+        delay = self.policy.delay(attempt, error)
+        logger.warning(f"{self.name} generation failed ({error}); retry {attempt} in {delay:.1f}s")
+        self._count(retries=1)
+        if error.rate_limited or error.retry_after:
+            self._count(rate_limited=int(error.rate_limited))
+            with self._lock:
+                self._pause_until = max(self._pause_until, time.monotonic() + delay)
+        else:
+            time.sleep(delay)
+
+    def complete(self, messages: list, temperature: float, max_tokens: int) -> Completion:
+        self._count(requests=1)
+        attempt = 0
+        while True:
+            self._wait_for_pause()
+            try:
+                return self._complete(messages, temperature, max_tokens)
+            except GenerationError as e:
+                attempt += 1
+                self._retry_or_raise(attempt, e)
+
+    def stream(self, messages: list, temperature: float, max_tokens: int) -> Iterator:
+        """Text pieces, then a final Usage (or None when the backend reports none)."""
+        self._count(requests=1)
+        attempt = 0
+        while True:
+            self._wait_for_pause()
+            started = False
+            pieces = self._stream(messages, temperature, max_tokens)
+            try:
+                for item in pieces:
+                    started = started or isinstance(item, str)
+                    yield item
+                return
+            except GenerationError as e:
+                if started:
+                    self._count(failures=1)
+                    raise
+                attempt += 1
+                self._retry_or_raise(attempt, e)
+            finally:
+                pieces.close()
+
+    def close(self):
+        pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": self.name,
+                "model": self.model,
+                "timeout_s": self.policy.timeout_s,
+                "max_retries": self.policy.max_retries,
+                "requests": self.requests,
+                "retries": self.retries,
+                "rate_limited": self.rate_limited,
+                "failures": self.failures,
+            }
+
+
+# -- Groq ---------------------------------------------------------------------
+class GroqBackend(GenerationBackend):
+    name = "groq"
+
+    def __init__(self, model: str, policy: Optional[RetryPolicy] = None, api_key: str = ""):
+        super().__init__(model, policy)
+        from groq import Groq
+
+        api_key = api_key or os.getenv("GROQ_API_KEY")
+        if not api_key:
+            raise RuntimeError("GROQ_API_KEY not set in environment (.env)")
+        # Retries are ours, so they follow the same policy as the other backends.
+        self._client = Groq(api_key=api_key, timeout=self.policy.timeout_s, max_retries=0)
+
+    @staticmethod
+    def _error(e: Exception) -> GenerationError:
+        import groq
+
+        if isinstance(e, groq.APIStatusError):
+            retry_after = e.response.headers.get("retry-after")
+            return GenerationError(
+                f"Groq returned {e.status_code}: {e.message}",
+                retryable=e.status_code in RETRY_STATUS,
+                retry_after=parse_retry_after(retry_after),
+                rate_limited=e.status_code == 429,
+            )
+        if isinstance(e, (groq.APITimeoutError, groq.APIConnectionError)):
+            return GenerationError(f"Groq unreachable: {e}", retryable=True)
+        return GenerationError(f"Groq request failed: {e}")
+
+    @staticmethod
+    def _usage(usage) -> Optional[Usage]:
+        if usage is None:
+            return None
+        return Usage(usage.prompt_tokens, usage.completion_tokens, usage.total_tokens)
+
+    def _complete(self, messages, temperature, max_tokens):
+        import groq
+
+        try:
+            completion = self._client.chat.completions.create(
+                model=self.model, messages=messages, temperature=temperature, max_tokens=max_tokens
+            )
+        except groq.GroqError as e:
+            raise self._error(e) from e
+        return Completion(completion.choices[0].message.content, self._usage(completion.usage))
+
+    def _stream(self, messages, temperature, max_tokens):
+        import groq
+
+        usage = None
+        try:
+            stream = self._client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True,
+            )
+        except groq.GroqError as e:
+            raise self._error(e) from e
+        try:
+            for chunk in stream:
+                text = chunk.choices[0].delta.content if chunk.choices else None
+                if text:
+                    yield text
+                # Usage comes on the last chunk, under x_groq in older API versions.
+                chunk_usage = chunk.usage or (chunk.x_groq.usage if chunk.x_groq else None)
+                usage = self._usage(chunk_usage) or usage
+        except groq.GroqError as e:
+            raise self._error(e) from e
+        finally:
+            stream.close()
+        yield usage
+
+
+# -- OpenAI-compatible HTTP server ---------------------------------------------
+class LocalBackend(GenerationBackend):
+    name = "local"
+
+    def __init__(
+        self,
+        model: str,
+        policy: Optional[RetryPolicy] = None,
+        base_url: str = LOCAL_URL,
+        api_key: str = LOCAL_API_KEY,
+        pool_size: int = POOL_SIZE,
+        transport=None,
+    ):
+        super().__init__(model, policy)
+        import httpx
+
+        self._httpx = httpx
+        self.base_url = base_url.rstrip("/")
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self._client = httpx.Client(
+            base_url=self.base_url,
+            headers=headers,
+            timeout=self.policy.timeout_s,
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+                keepalive_expiry=60.0,
+            ),
+            transport=transport,
+        )
+
+    def _body(self, messages, temperature, max_tokens, stream: bool) -> dict:
+        body = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": stream,
+        }
+        if stream:
+            body["stream_options"] = {"include_usage": True}
+        return body
+
+    def _error(self, e: Exception) -> GenerationError:
+        if isinstance(e, self._httpx.HTTPStatusError):
+            retry_after = e.response.headers.get("retry-after")
+            return GenerationError(
+                f"{self.base_url} returned {e.response.status_code}",
+                retryable=e.response.status_code in RETRY_STATUS,
+                retry_after=parse_retry_after(retry_after),
+                rate_limited=e.response.status_code == 429,
+            )
+        if isinstance(e, (self._httpx.TimeoutException, self._httpx.TransportError)):
+            return GenerationError(f"{self.base_url} unreachable: {e!r}", retryable=True)
+        return GenerationError(f"{self.base_url} request failed: {e!r}")
+
+    @staticmethod
+    def _usage(usage: Optional[dict]) -> Optional[Usage]:
+        if not usage:
+            return None
+        return Usage(usage["prompt_tokens"], usage["completion_tokens"], usage["total_tokens"])
+
+    def _complete(self, messages, temperature, max_tokens):
+        body = self._body(messages, temperature, max_tokens, stream=False)
+        try:
+            response = self._client.post("/chat/completions", json=body)
+            response.raise_for_status()
+        except self._httpx.HTTPError as e:
+            raise self._error(e) from e
+        data = response.json()
+        return Completion(data["choices"][0]["message"]["content"], self._usage(data.get("usage")))
+
+    def _stream(self, messages, temperature, max_tokens):
+        body = self._body(messages, temperature, max_tokens, stream=True)
+        usage = None
+        try:
+            with self._client.stream("POST", "/chat/completions", json=body) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    payload = line[len("data:") :].strip()
+                    if payload == "[DONE]":
+                        break
+                    chunk = json.loads(payload)
+                    choices = chunk.get("choices") or [{}]
+                    text = choices[0].get("delta", {}).get("content")
+                    if text:
+                        yield text
+                    usage = self._usage(chunk.get("usage")) or usage
+        except self._httpx.HTTPError as e:
+            raise self._error(e) from e
+        yield usage
+
+    def close(self):
+        self._client.close()
+
+
+# -- Deterministic stub -------------------------------------------------------
+# A merged passage carries several labels: "[1][3] (source: ...)" (src/rag/context.py).
+_PASSAGE = re.compile(r"^((?:\[\d+\])+) \(source: ([^)]*)\)$", re.MULTILINE)
+
+
+def stub_answer(messages: list) -> str:
+    """A fixed answer that cites every numbered passage in the last user message."""
+    passages = _PASSAGE.findall(messages[-1]["content"])
+    if not passages:
+        return "I don't have enough information in the provided policy documents to answer this."
+    ranks = [rank for labels, _ in passages for rank in re.findall(r"\d+", labels)]
+    cited = " ".join(f"[{rank}]" for rank in ranks)
+    sources = ", ".join(dict.fromkeys(source for _, source in passages))
+    return f"According to {sources}, the policy passages address this question {cited}."
+
+
+def stub_usage(messages: list, answer: str) -> Usage:
+    """Whitespace-token counts; only meant to be stable, not accurate."""
+    prompt = sum(len(m["content"].split()) for m in messages)
+    completion = len(answer.split())
+    return Usage(prompt, completion, prompt + completion)
+
+
+class StubBackend(GenerationBackend):
+    name = "stub"
+
+    def __init__(
+        self, model: str, policy: Optional[RetryPolicy] = None, delay_ms: float = STUB_DELAY_MS
+    ):
+        super().__init__(model, policy)
+        self.delay_s = delay_ms / 1000
+
+    def _complete(self, messages, temperature, max_tokens):
+        answer = stub_answer(messages)
+        time.sleep(self.delay_s * len(answer.split()))
+        return Completion(answer, stub_usage(messages, answer))
+
+    def _stream(self, messages, temperature, max_tokens):
+        answer = stub_answer(messages)
+        for word in re.findall(r"\S+\s*", answer):
+            time.sleep(self.delay_s)
+            yield word
+        yield stub_usage(messages, answer)
+
+
+_BACKEND_CLASSES = {"groq": GroqBackend, "local": LocalBackend, "stub": StubBackend}
+
+
+def make_backend(name: str = BACKEND, model: Optional[str] = None, **kwargs) -> GenerationBackend:
+    if name not in _BACKEND_CLASSES:
+        raise ValueError(f"Unknown FINRISK_RAG_BACKEND {name!r}; expected one of {BACKENDS}")
+    model = model or os.getenv("FINRISK_RAG_MODEL") or DEFAULT_MODELS[name]
+    return _BACKEND_CLASSES[name](model, **kwargs)
+
+
+_backend: Optional[GenerationBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> GenerationBackend:
+    """The process-wide backend chosen by FINRISK_RAG_BACKEND."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = make_backend()
+                logger.info(f"RAG generation backend: {_backend.name} ({_backend.model})")
+    return _backend
+
+
+def close_backend():
+    """Close pooled connections; the next get_backend() builds a fresh backend."""
+    global _backend
+    with _backend_lock:
+        if _backend is not None:
+            _backend.close()
+            _backend = None
+
+
+def generation_stats() -> dict:
+    return _backend.stats() if _backend is not None else {"backend": BACKEND, "loaded": False}
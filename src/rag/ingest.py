@@ -5,17 +5,64 @@ Build phase of RAG.
 Extracts text from PDFs in data/rag/source_pdfs/, chunks them,
 embeds the chunks with sentence-transformers, builds a FAISS index,
 and saves both the index and the chunk metadata to data/rag/index/.
+The chunks go to chunks.json (human-readable) and to the memory-mapped
+columnar store under chunks/ that the query path reads (src/rag/chunk_store.py).
+A BM25 inverted index over the same chunks goes to bm25/
+(src/rag/lexical_index.py) for hybrid retrieval; it is rebuilt from all chunks
+on every run, which takes well under a second for this corpus.
 
-Run once after adding new PDFs:
+Run after adding, replacing or deleting PDFs:
     python -m src.rag.ingest
+    python -m src.rag.ingest --index-type hnsw --ef-search 128   # full rebuild
+    python -m src.rag.ingest --full
+
+Ingestion is incremental. manifest.json records each PDF's SHA-256 and the
+range of FAISS ids its chunks were given; a run extracts and embeds only new
+or changed files and removes the vectors of changed or deleted ones from the
+IndexIDMap2. Chunks whose exact text was embedded before (by the same model)
+come from the embedding cache (src/rag/embedding_cache.py) without touching
+the encoder. With nothing changed it exits after hashing, before the
+embedding model is imported. A full rebuild happens on the first run, when
+chunking or the embedding model change, with --full, or when index options
+are passed.
+
+The index type defaults to "auto" (exact flat search for small corpora, see
+src/rag/vector_index.py); the type and its search parameters are saved to
+index_meta.json next to the index, which is where the query path reads them.
+Extraction fans out over a process pool (--workers, default one per CPU):
+one task per PDF, and PDFs over SPLIT_MIN_BYTES are split into page ranges of
+PAGES_PER_TASK. Page texts are reassembled in page order before chunking, so
+chunks and ids are identical to a serial run.
+
+Outputs are swapped in file by file with atomic renames, chunk store and
+BM25 index first and manifest last; index_meta.json, the chunk store and the
+BM25 index carry the same version, so a reader can tell a half-swapped set
+(see src/rag/qa.py).
 """
 
+import argparse
+import hashlib
 import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
+from typing import Optional
 
-import faiss
-from pypdf import PdfReader
-from sentence_transformers import SentenceTransformer
+import numpy as np
+
+from src.rag.chunk_store import ChunkStore, write_store
+from src.rag.embedding_cache import EmbeddingCache
+from src.rag.lexical_index import TOKENIZER_VERSION, write_bm25
+from src.rag.lexical_index import read_meta as read_bm25_meta
+from src.rag.vector_index import (
+    INDEX_TYPES,
+    load_index,
+    make_index,
+    recall_at_k,
+    remove_ids,
+    save_index,
+)
 
 # ---------------------------------------------------------------------------
 # Config
@@ -23,30 +70,54 @@ from sentence_transformers import SentenceTransformer
 PDF_DIR = Path("data/rag/source_pdfs")
 INDEX_DIR = Path("data/rag/index")
 INDEX_PATH = INDEX_DIR / "index.faiss"
+INDEX_META_PATH = INDEX_DIR / "index_meta.json"
 CHUNKS_PATH = INDEX_DIR / "chunks.json"
+CHUNK_STORE_PATH = INDEX_DIR / "chunks"
+BM25_PATH = INDEX_DIR / "bm25"
+MANIFEST_PATH = INDEX_DIR / "manifest.json"
+# size/mtime -> hash memo, so unchanged PDFs are not re-read; local, not committed.
+STAT_CACHE_PATH = INDEX_DIR / ".stat_cache.json"
+# Chunk text hash -> vector; also local. Empty FINRISK_EMBED_CACHE_DIR disables it.
+EMBED_CACHE_DIR = os.getenv("FINRISK_EMBED_CACHE_DIR", str(INDEX_DIR / "embedding_cache"))
+MANIFEST_VERSION = 1
 
 EMBED_MODEL_ID = "sentence-transformers/all-MiniLM-L6-v2"
 CHUNK_SIZE = 800  # characters
 CHUNK_OVERLAP = 100  # characters
 BATCH_SIZE = 32
+INGEST_WORKERS = int(os.getenv("FINRISK_INGEST_WORKERS", str(os.cpu_count() or 1)))
+SPLIT_MIN_BYTES = 512 * 1024  # smaller PDFs are one task; no need to count their pages
+PAGES_PER_TASK = 16
+RECALL_CHECK_QUERIES = 200
+RECALL_CHECK_K = 10
 
 
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
-def extract_text(pdf_path: Path) -> str:
-    """Pull all text from a PDF, with light cleanup."""
+def extract_pages(pdf_path: Path, start: int = 0, stop: Optional[int] = None) -> list[str]:
+    """Raw text of pages [start, stop) of a PDF; unreadable pages come back empty."""
+    from pypdf import PdfReader
+
     reader = PdfReader(str(pdf_path))
     pages = []
-    for page in reader.pages:
+    for page in reader.pages[start:stop]:
         try:
             text = page.extract_text() or ""
         except Exception:
             text = ""
         pages.append(text)
-    full_text = "\n".join(pages)
+    return pages
+
+
+def clean_text(pages: list[str]) -> str:
     # collapse repeated whitespace
-    return " ".join(full_text.split())
+    return " ".join("\n".join(pages).split())
+
+
+def extract_text(pdf_path: Path) -> str:
+    """Pull all text from a PDF, with light cleanup."""
+    return clean_text(extract_pages(pdf_path))
 
 
 def chunk_text(text: str, size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> list[str]:
@@ -64,41 +135,114 @@ def chunk_text(text: str, size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP)
     return chunks
 
 
-# ---------------------------------------------------------------------------
-# Main pipeline
-# ---------------------------------------------------------------------------
-def build_index():
-    INDEX_DIR.mkdir(parents=True, exist_ok=True)
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
-    pdf_files = sorted(PDF_DIR.glob("*.pdf"))
-    if not pdf_files:
-        raise FileNotFoundError(f"No PDFs found in {PDF_DIR}")
-    print(f"Found {len(pdf_files)} PDF(s) in {PDF_DIR}")
 
-    # 1. Extract + chunk
-    all_chunks: list[dict] = []
-    for pdf_path in pdf_files:
-        print(f"  Extracting: {pdf_path.name}")
-        text = extract_text(pdf_path)
-        chunks = chunk_text(text)
-        for i, chunk in enumerate(chunks):
-            all_chunks.append(
-                {
-                    "id": f"{pdf_path.stem}__chunk{i:04d}",
-                    "source": pdf_path.name,
-                    "text": chunk,
-                }
-            )
-        print(f"    -> {len(chunks)} chunks from {len(text):,} chars")
-
-    print(f"\nTotal chunks: {len(all_chunks)}")
-
-    # 2. Embed
+def hash_pdfs(pdf_files: list[Path]) -> dict:
+    """name -> SHA-256, re-reading only files whose size or mtime changed since the last run."""
+    try:
+        memo = json.loads(STAT_CACHE_PATH.read_text())
+    except (FileNotFoundError, ValueError):
+        memo = {}
+    hashes, fresh = {}, {}
+    for path in pdf_files:
+        st = path.stat()
+        stamp = [st.st_size, st.st_mtime_ns]
+        known = memo.get(path.name)
+        digest = known["sha256"] if known and known["stat"] == stamp else file_sha256(path)
+        hashes[path.name] = digest
+        fresh[path.name] = {"stat": stamp, "sha256": digest}
+    if fresh != memo:
+        STAT_CACHE_PATH.write_text(json.dumps(fresh))
+    return hashes
+
+
+def ingest_settings() -> dict:
+    """Anything that changes chunk boundaries or vectors; a change forces a full rebuild."""
+    return {"embed_model": EMBED_MODEL_ID, "chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP}
+
+
+def load_manifest() -> Optional[dict]:
+    try:
+        manifest = json.loads(MANIFEST_PATH.read_text())
+    except FileNotFoundError:
+        return None
+    return manifest if manifest.get("format_version") == MANIFEST_VERSION else None
+
+
+def page_count(pdf_path: Path) -> int:
+    from pypdf import PdfReader
+
+    return len(PdfReader(str(pdf_path)).pages)
+
+
+def plan_extraction(pdf_files: list[Path]) -> list[tuple[int, Path, int, Optional[int]]]:
+    """(file number, path, first page, stop page) tasks; big PDFs become several."""
+    tasks = []
+    for f, path in enumerate(pdf_files):
+        n_pages = page_count(path) if path.stat().st_size >= SPLIT_MIN_BYTES else 0
+        if n_pages > PAGES_PER_TASK:
+            for start in range(0, n_pages, PAGES_PER_TASK):
+                tasks.append((f, path, start, min(start + PAGES_PER_TASK, n_pages)))
+        else:
+            tasks.append((f, path, 0, None))
+    return tasks
+
+
+def chunk_pdfs(pdf_files: list[Path], workers: int = INGEST_WORKERS) -> list[list[dict]]:
+    """Chunk records for each PDF, in `pdf_files` order, identical to a serial run."""
+    started = time.perf_counter()
+    if workers > 1:
+        tasks = plan_extraction(pdf_files)
+    else:
+        tasks = [(f, path, 0, None) for f, path in enumerate(pdf_files)]
+    ranges = {f: {} for f in range(len(pdf_files))}  # file -> first page -> page texts
+    expected = {f: sum(task[0] == f for task in tasks) for f in ranges}
+    results: list = [None] * len(pdf_files)
+
+    def collect(f: int, start: int, pages: list[str]):
+        ranges[f][start] = pages
+        if len(ranges[f]) < expected[f]:
+            return
+        parts = ranges.pop(f)
+        text = clean_text([page for first in sorted(parts) for page in parts[first]])
+        path = pdf_files[f]
+        results[f] = [
+            {"id": f"{path.stem}__chunk{i:04d}", "source": path.name, "text": chunk}
+            for i, chunk in enumerate(chunk_text(text))
+        ]
+        done = len(pdf_files) - len(ranges)
+        print(
+            f"  [{done}/{len(pdf_files)}] {path.name}: {len(results[f])} chunks from "
+            f"{len(text):,} chars ({expected[f]} task(s), {time.perf_counter() - started:.1f}s)"
+        )
+
+    if workers <= 1 or len(tasks) == 1:
+        for f, path, start, stop in tasks:
+            collect(f, start, extract_pages(path, start, stop))
+    else:
+        print(f"  Extracting with {min(workers, len(tasks))} processes, {len(tasks)} tasks")
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            futures = {
+                pool.submit(extract_pages, path, start, stop): (f, start)
+                for f, path, start, stop in tasks
+            }
+            for fut in as_completed(futures):
+                collect(*futures[fut], fut.result())
+    return results
+
+
+def encode(texts: list[str]) -> np.ndarray:
+    from sentence_transformers import SentenceTransformer
+
     print(f"\nLoading embedding model: {EMBED_MODEL_ID}")
     model = SentenceTransformer(EMBED_MODEL_ID)
-    texts = [c["text"] for c in all_chunks]
-
-    print("Embedding chunks...")
+    print(f"Embedding {len(texts)} chunks...")
     vectors = model.encode(
         texts,
         batch_size=BATCH_SIZE,
@@ -107,21 +251,223 @@ def build_index():
         normalize_embeddings=True,  # so inner product == cosine similarity
     ).astype("float32")
     print(f"Embeddings shape: {vectors.shape}")
+    return vectors
+
+
+def embed(texts: list[str]) -> np.ndarray:
+    """Chunk vectors, encoding only texts the embedding cache hasn't seen under this model."""
+    if not EMBED_CACHE_DIR:
+        return encode(texts)
+    cache = EmbeddingCache(EMBED_CACHE_DIR, EMBED_MODEL_ID)
+    vectors = cache.embed(texts, encode)
+    print(f"Embedding cache: {cache.hits} of {len(texts)} chunks reused")
+    return vectors
+
+
+def compact_embedding_cache(chunks: list[dict]):
+    if not EMBED_CACHE_DIR:
+        return
+    dropped = EmbeddingCache(EMBED_CACHE_DIR, EMBED_MODEL_ID).compact(c["text"] for c in chunks)
+    if dropped:
+        print(f"Embedding cache: compacted away {dropped} vectors no longer in the corpus")
+
+
+def check_recall(index, vectors: np.ndarray, k: int = RECALL_CHECK_K) -> float:
+    """recall@k of `index` against exact search, using a sample of the corpus as queries."""
+    rows = np.random.default_rng(0).permutation(len(vectors))[:RECALL_CHECK_QUERIES]
+    queries = vectors[np.sort(rows)]
+    exact, _ = make_index(vectors, "flat")
+    k = min(k, len(vectors))
+    return recall_at_k(exact.search(queries, k)[1], index.search(queries, k)[1], k)
+
+
+# ---------------------------------------------------------------------------
+# Main pipeline
+# ---------------------------------------------------------------------------
+def _full_rebuild_reason(
+    manifest: Optional[dict], full: bool, index_options: bool
+) -> Optional[str]:
+    if full:
+        return "--full"
+    if index_options:
+        return "index options given"
+    if manifest is None:
+        return f"no manifest at {MANIFEST_PATH}"
+    if manifest["settings"] != ingest_settings():
+        return "chunking or embedding settings changed"
+    if not (INDEX_PATH.exists() and (CHUNK_STORE_PATH / "meta.json").exists()):
+        return "index files missing"
+    return None
+
+
+def _rebuild(pdf_files: list[Path], hashes: dict, workers: int, index_type: str, **index_params):
+    files, chunks = {}, []
+    for pdf_path, file_chunks in zip(pdf_files, chunk_pdfs(pdf_files, workers)):
+        files[pdf_path.name] = {
+            "sha256": hashes[pdf_path.name],
+            "first_id": len(chunks),
+            "n_chunks": len(file_chunks),
+        }
+        chunks.extend(file_chunks)
+    print(f"\nTotal chunks: {len(chunks)}")
+
+    vectors = embed([c["text"] for c in chunks])
+    # Ids start as row numbers; incremental runs append past next_id.
+    ids = np.arange(len(chunks), dtype=np.int64)
+    index, meta = make_index(vectors, index_type, ids=ids, **index_params)
+    if meta["index_type"] != "flat":
+        meta["recall_at_10"] = check_recall(index, vectors)
+        print(f"  recall@{RECALL_CHECK_K} vs exact search: {meta['recall_at_10']:.3f}")
+    return index, meta, files, chunks, ids
+
+
+def _update(
+    manifest: dict, pdf_files: list[Path], hashes: dict, changed: list, removed: list, workers: int
+):
+    index, meta = load_index(INDEX_PATH, INDEX_META_PATH)
+    files = {name: entry for name, entry in manifest["files"].items() if name in hashes}
+    stale = [manifest["files"][name] for name in changed + removed if name in manifest["files"]]
+    stale_ids = np.array(
+        [
+            i
+            for entry in stale
+            for i in range(entry["first_id"], entry["first_id"] + entry["n_chunks"])
+        ],
+        dtype=np.int64,
+    )
+    index = remove_ids(index, stale_ids, meta)
+    print(f"Removed {len(stale_ids)} vectors from {len(stale)} changed/deleted file(s)")
+
+    # Rows of untouched files come straight from the current store.
+    store = ChunkStore(CHUNK_STORE_PATH)
+    old_ids = np.asarray(store.ids if store.ids is not None else np.arange(len(store)))
+    keep = np.flatnonzero(~np.isin(old_ids, stale_ids))
+    chunks, ids = [store[int(row)] for row in keep], [old_ids[keep]]
+    store.close()
+
+    next_id = manifest["next_id"]
+    new_chunks = []
+    changed_files = [path for path in pdf_files if path.name in changed]
+    for path, file_chunks in zip(changed_files, chunk_pdfs(changed_files, workers)):
+        name = path.name
+        files[name] = {"sha256": hashes[name], "first_id": next_id, "n_chunks": len(file_chunks)}
+        next_id += len(file_chunks)
+        new_chunks.extend(file_chunks)
+    if new_chunks:
+        new_ids = np.arange(manifest["next_id"], next_id, dtype=np.int64)
+        index.add_with_ids(embed([c["text"] for c in new_chunks]), new_ids)
+        chunks.extend(new_chunks)
+        ids.append(new_ids)
+    meta["ntotal"] = int(index.ntotal)
+    return index, meta, files, chunks, np.concatenate(ids), next_id
+
+
+def _ensure_bm25(version: int):
+    """Build the BM25 index from the chunk store if it is missing, stale or from an older tokenizer."""
+    meta = read_bm25_meta(BM25_PATH)
+    if meta and meta["version"] == version and meta["tokenizer"] == TOKENIZER_VERSION:
+        return
+    store = ChunkStore(CHUNK_STORE_PATH)
+    ids = store.ids if store.ids is not None else np.arange(len(store))
+    write_bm25(store.column("text"), ids, BM25_PATH, version=version)
+    store.close()
+    print(f"Rebuilt BM25 index for v{version} ({len(ids)} chunks)")
+
+
+def build_index(
+    index_type: Optional[str] = None,
+    full: bool = False,
+    workers: int = INGEST_WORKERS,
+    **index_params,
+):
+    INDEX_DIR.mkdir(parents=True, exist_ok=True)
+
+    pdf_files = sorted(PDF_DIR.glob("*.pdf"))
+    if not pdf_files:
+        raise FileNotFoundError(f"No PDFs found in {PDF_DIR}")
+    print(f"Found {len(pdf_files)} PDF(s) in {PDF_DIR}")
+
+    hashes = hash_pdfs(pdf_files)
+    manifest = load_manifest()
+    version = (manifest["version"] + 1) if manifest else 1
+    reason = _full_rebuild_reason(manifest, full, index_type is not None or bool(index_params))
+
+    if reason is None:
+        known = manifest["files"]
+        changed = [
+            name for name, digest in hashes.items() if known.get(name, {}).get("sha256") != digest
+        ]
+        removed = [name for name in known if name not in hashes]
+        if not changed and not removed:
+            _ensure_bm25(manifest["version"])
+            print(f"✅ Index up to date ({len(hashes)} PDFs, {manifest['ntotal']} chunks)")
+            return
+        print(f"Incremental update: {len(changed)} new/changed, {len(removed)} deleted")
+        index, meta, files, chunks, ids, next_id = _update(
+            manifest, pdf_files, hashes, changed, removed, workers
+        )
+    else:
+        print(f"Full rebuild: {reason}")
+        index, meta, files, chunks, ids = _rebuild(
+            pdf_files, hashes, workers, index_type or "auto", **index_params
+        )
+        next_id = len(chunks)
+    meta.update(embed_model=EMBED_MODEL_ID, version=version)
+    print(f"FAISS {meta['index_type']} index: {index.ntotal} vectors of dim {meta['dim']}")
+    print(f"  build={meta['build']} search={meta['search']}")
+
+    # Swap in: chunk store, index + meta, chunks.json, then the manifest that
+    # marks the run complete. Each step is a temp file + rename.
+    write_store(chunks, CHUNK_STORE_PATH, ids=ids, version=version)
+    write_bm25([c["text"] for c in chunks], ids, BM25_PATH, version=version)
+    save_index(index, meta, INDEX_PATH, INDEX_META_PATH)
+    tmp = CHUNKS_PATH.with_name(CHUNKS_PATH.name + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(chunks, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, CHUNKS_PATH)
+    manifest = {
+        "format_version": MANIFEST_VERSION,
+        "version": version,
+        "settings": ingest_settings(),
+        "ntotal": int(index.ntotal),
+        "next_id": next_id,
+        "files": dict(sorted(files.items())),
+    }
+    tmp = MANIFEST_PATH.with_name(MANIFEST_PATH.name + ".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2) + "\n")
+    os.replace(tmp, MANIFEST_PATH)
+
+    compact_embedding_cache(chunks)
 
-    # 3. Build FAISS index (inner product on normalized vectors == cosine sim)
-    dim = vectors.shape[1]
-    index = faiss.IndexFlatIP(dim)
-    index.add(vectors)
-    print(f"FAISS index size: {index.ntotal} vectors of dim {dim}")
+    print(f"\n✅ Saved index v{version} to {INDEX_PATH}")
+    print(f"✅ Saved chunks  to {CHUNKS_PATH} and {CHUNK_STORE_PATH}/")
+    print(f"✅ Saved BM25 index to {BM25_PATH}/")
 
-    # 4. Save
-    faiss.write_index(index, str(INDEX_PATH))
-    with open(CHUNKS_PATH, "w") as f:
-        json.dump(all_chunks, f, ensure_ascii=False, indent=2)
 
-    print(f"\n✅ Saved index to {INDEX_PATH}")
-    print(f"✅ Saved chunks  to {CHUNKS_PATH}")
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build or update the policy FAISS index from PDFs."
+    )
+    parser.add_argument("--full", action="store_true", help="Re-extract and re-embed every PDF")
+    parser.add_argument(
+        "--workers", type=int, default=INGEST_WORKERS, help="Extraction processes (1 = serial)"
+    )
+    parser.add_argument(
+        "--index-type", choices=("auto",) + INDEX_TYPES, help="Rebuild as this type"
+    )
+    parser.add_argument("--nlist", type=int, help="IVF: number of inverted lists")
+    parser.add_argument("--nprobe", type=int, help="IVF: lists scanned per query")
+    parser.add_argument("--m", dest="M", type=int, help="HNSW: graph degree")
+    parser.add_argument("--ef-construction", dest="efConstruction", type=int)
+    parser.add_argument("--ef-search", dest="efSearch", type=int, help="HNSW: search breadth")
+    parser.add_argument("--pq-m", type=int, help="IVF-PQ: sub-quantizers")
+    parser.add_argument("--pq-nbits", type=int, help="IVF-PQ: bits per sub-quantizer code")
+    parser.add_argument("--k-factor", type=int, help="IVF-PQ: candidates re-ranked per result")
+    parser.add_argument("--no-refine", dest="refine", action="store_false", default=None)
+    args = vars(parser.parse_args())
+    full, index_type, workers = args.pop("full"), args.pop("index_type"), args.pop("workers")
+    build_index(index_type, full, workers, **{name: v for name, v in args.items() if v is not None})
 
 
 if __name__ == "__main__":
-    build_index()
+    main()
@@ -0,0 +1,195 @@
+"""
+src/rag/lexical_index.py
+
+BM25 inverted index over the RAG chunks, built by ingest next to the FAISS
+index and fused with dense retrieval in src/rag/qa.py.
+
+Dense embeddings blur exact regulatory terms ("beneficial owner", "PEP",
+"Recommendation 10", section numbers); BM25 matches them literally. Term
+weights are precomputed at ingest, so a query is only a sum of stored floats
+over the postings of its terms:
+
+    w(t, d) = idf(t) * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(d) / avglen))
+    idf(t)  = ln(1 + (N - df + 0.5) / (df + 0.5))
+
+Layout (a directory, data/rag/index/bm25/ by default), all memory-mapped:
+    meta.json              {"format_version": 1, "count": N, "n_terms": V, "k1": .., "b": ..,
+                            "avg_len": .., "tokenizer": 1, "version": index version}
+    terms.bin              sorted vocabulary, concatenated UTF-8
+    terms.offsets.npy      int64 byte offsets into terms.bin, V + 1 entries
+    postings.offsets.npy   int64, V + 1 entries; term i's postings are [off[i], off[i + 1])
+    postings.rows.npy      int32 chunk row of each posting
+    postings.weights.npy   float32 precomputed BM25 weight of each posting
+    ids.npy                int64 FAISS id of each chunk row, as in the chunk store
+
+Terms are looked up by binary search over the mapped vocabulary, so opening
+the index costs the same whatever the corpus size.
+"""
+
+import json
+import math
+import re
+import shutil
+from collections import Counter
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+
+from src.rag.chunk_store import _Column, swap_directory
+
+FORMAT_VERSION = 1
+TOKENIZER_VERSION = 1  # bump when tokenize() changes; ingest then rebuilds the index
+INDEX_PATH = Path("data/rag/index/bm25")
+K1 = 1.5
+B = 0.75
+
+# Words with dots between digits stay whole, so "5.2.1" and "R.10" are single terms.
+_TOKEN = re.compile(r"[a-z0-9]+(?:\.[0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be been being but by can could do does did for from had has have how "
+    "if in into is it its may might must no not of on or our shall should so such than that "
+    "the their them then there these they this those to under upon was we were what when "
+    "where which while who whom why will with within would".split()
+)
+
+
+def _stem(token: str) -> str:
+    """Fold the plurals that matter for policy text: owners -> owner, entities -> entity."""
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> list[str]:
+    return [_stem(t) for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def write_bm25(
+    texts: list[str],
+    ids: np.ndarray,
+    path: Union[str, Path] = INDEX_PATH,
+    version: Optional[int] = None,
+    k1: float = K1,
+    b: float = B,
+) -> Path:
+    """Build the index for chunk `texts` (FAISS ids `ids`), replacing any old one."""
+    path = Path(path)
+    docs = [Counter(tokenize(text)) for text in texts]
+    lengths = np.array([sum(doc.values()) for doc in docs], dtype=np.float32)
+    avg_len = float(lengths.mean()) if len(docs) and lengths.sum() else 1.0
+
+    postings: dict[str, list] = {}
+    for row, doc in enumerate(docs):
+        for term, tf in doc.items():
+            postings.setdefault(term, []).append((row, tf))
+    terms = sorted(postings)
+
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    rows, weights = [], []
+    for i, term in enumerate(terms):
+        entries = postings[term]
+        idf = math.log(1 + (len(docs) - len(entries) + 0.5) / (len(entries) + 0.5))
+        term_rows = np.array([row for row, _ in entries], dtype=np.int32)
+        tf = np.array([tf for _, tf in entries], dtype=np.float32)
+        norm = k1 * (1 - b + b * lengths[term_rows] / avg_len)
+        rows.append(term_rows)
+        weights.append((idf * tf * (k1 + 1) / (tf + norm)).astype(np.float32))
+        offsets[i + 1] = offsets[i] + len(entries)
+
+    tmp = path.with_name(path.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    term_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    with open(tmp / "terms.bin", "wb") as f:
+        for i, term in enumerate(terms):
+            term_offsets[i + 1] = term_offsets[i] + f.write(term.encode("utf-8"))
+    np.save(tmp / "terms.offsets.npy", term_offsets)
+    np.save(tmp / "postings.offsets.npy", offsets)
+    np.save(tmp / "postings.rows.npy", np.concatenate(rows) if rows else np.empty(0, np.int32))
+    np.save(
+        tmp / "postings.weights.npy",
+        np.concatenate(weights) if weights else np.empty(0, np.float32),
+    )
+    np.save(tmp / "ids.npy", np.asarray(ids, dtype=np.int64))
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "count": len(docs),
+        "n_terms": len(terms),
+        "n_postings": int(offsets[-1]),
+        "k1": k1,
+        "b": b,
+        "avg_len": avg_len,
+        "tokenizer": TOKENIZER_VERSION,
+        "version": version,
+    }
+    (tmp / "meta.json").write_text(json.dumps(meta, indent=2) + "\n")
+    return swap_directory(tmp, path)
+
+
+def read_meta(path: Union[str, Path] = INDEX_PATH) -> Optional[dict]:
+    try:
+        meta = json.loads((Path(path) / "meta.json").read_text())
+    except FileNotFoundError:
+        return None
+    return meta if meta.get("format_version") == FORMAT_VERSION else None
+
+
+class BM25Index:
+    """Read-only view of an index directory."""
+
+    def __init__(self, path: Union[str, Path] = INDEX_PATH):
+        self.path = Path(path)
+        meta = read_meta(self.path)
+        if meta is None or meta["tokenizer"] != TOKENIZER_VERSION:
+            raise ValueError(f"No usable BM25 index at {self.path}; re-run ingest")
+        self.version = meta.get("version")
+        self.count = meta["count"]
+        self._n_terms = meta["n_terms"]
+        self._terms = _Column(self.path, "terms")
+        self._offsets = np.load(self.path / "postings.offsets.npy", mmap_mode="r")
+        self._rows = np.load(self.path / "postings.rows.npy", mmap_mode="r")
+        self._weights = np.load(self.path / "postings.weights.npy", mmap_mode="r")
+        self.ids = np.load(self.path / "ids.npy", mmap_mode="r")
+
+    def _term_row(self, term: str) -> Optional[int]:
+        lo, hi = 0, self._n_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._terms[mid] < term:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < self._n_terms and self._terms[lo] == term else None
+
+    def search(self, query: str, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Top-k (scores, FAISS ids), best first; fewer than k if fewer chunks match."""
+        scores = np.zeros(self.count, dtype=np.float32)
+        for term in set(tokenize(query)):
+            row = self._term_row(term)
+            if row is not None:
+                start, stop = self._offsets[row], self._offsets[row + 1]
+                scores[self._rows[start:stop]] += self._weights[start:stop]
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        # Highest score first; ties by row so results are deterministic.
+        matched = matched[np.lexsort((matched, -scores[matched]))]
+        return scores[matched], np.asarray(self.ids)[matched]
+
+    def close(self):
+        self._terms.close()
+
+
+def reciprocal_rank_fusion(rankings: list, k: int, rrf_k: int = 60) -> list[tuple]:
+    """Fuse ranked id lists: score(d) = sum over lists of 1 / (rrf_k + rank of d), rank from 1.
+
+    Returns the top-k (id, fused score) pairs, best first.
+    """
+    fused: dict = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(fused.items(), key=lambda item: (-item[1], item[0]))[:k]
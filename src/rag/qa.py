@@ -3,84 +3,283 @@ src/rag/qa.py
 
 Query phase of RAG.
 Loads the prebuilt FAISS index + chunk metadata, embeds an incoming question,
-retrieves the top-K most relevant chunks, and asks Groq Llama 3.1 8B to
-answer grounded in those chunks with citations.
+retrieves the top-K most relevant chunks, and asks an LLM to answer grounded
+in those chunks with citations: Groq Llama 3.1 8B by default, or another
+backend from src/rag/generation.py (FINRISK_RAG_BACKEND).
+
+The index and the chunk store are memory-mapped rather than read into the
+heap, so start-up does not scale with corpus size and the API's worker
+processes share one copy of the vectors and text in the page cache.
+
+A re-run of ingest is picked up without a restart: every query stats
+index_meta.json and reloads when it changed. Ingest swaps files one at a time,
+so a load is accepted only if index_meta.json reports the same version before
+and after, and the chunk store carries that version too.
+
+Retrieval is hybrid by default: the dense FAISS results and a BM25 search
+over the same chunks (src/rag/lexical_index.py, built by ingest) are fused
+with reciprocal rank fusion, so exact terms like "beneficial owner" or a
+Recommendation number are found without raising k. FINRISK_RAG_RETRIEVAL=dense
+turns it off; an index built before BM25 existed is searched dense-only.
+
+Question embeddings, retrievals and answers are cached per index version
+(src/rag/query_cache.py), and paraphrased questions can reuse an earlier
+answer (src/rag/semantic_cache.py); loading a new index clears both.
+
+Neighbouring chunks of one document are stitched into a single passage and
+the passages trimmed to a token budget before the prompt is built
+(src/rag/context.py).
+
+stream_answer() is the token-streaming variant behind /ask_policy/stream: the
+sources go out before generation starts, and the last event carries token
+usage and a latency breakdown.
 """
 
 import json
 import logging
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import NamedTuple, Optional
 
 import faiss
+import numpy as np
 from dotenv import load_dotenv
-from groq import Groq
 from sentence_transformers import SentenceTransformer
 
+from src.rag.chunk_store import ChunkStore
+from src.rag.context import AssembledContext, get_context_assembler
+from src.rag.generation import get_backend
+from src.rag.lexical_index import BM25Index, reciprocal_rank_fusion
+from src.rag.lexical_index import read_meta as read_bm25_meta
+from src.rag.query_cache import get_query_cache, normalize_question, vector_key
+from src.rag.semantic_cache import get_semantic_cache
+from src.rag.vector_index import load_index
+
 logger = logging.getLogger(__name__)
 load_dotenv()
 
 INDEX_PATH = Path("data/rag/index/index.faiss")
+INDEX_META_PATH = Path("data/rag/index/index_meta.json")
 CHUNKS_PATH = Path("data/rag/index/chunks.json")
+CHUNK_STORE_PATH = Path("data/rag/index/chunks")
+BM25_PATH = Path("data/rag/index/bm25")
+# Map the stored vectors instead of copying them. IO_FLAG_MMAP only covers
+# on-disk IVF lists (and rejects in-memory ones); IO_FLAG_MMAP_IFC is what
+# maps flat/HNSW codes and IVF arrays in place.
+INDEX_IO_FLAGS = faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
 EMBED_MODEL_ID = "sentence-transformers/all-MiniLM-L6-v2"
-GROQ_MODEL = "llama-3.1-8b-instant"
 DEFAULT_K = 4
 GENERATION_TEMPERATURE = 0.1
+MAX_ANSWER_TOKENS = 512
+# Generation requests answer_questions() keeps in flight at once.
+BATCH_CONCURRENCY = int(os.getenv("FINRISK_RAG_BATCH_CONCURRENCY", "4"))
+
+# "hybrid" (dense + BM25, reciprocal rank fusion) or "dense".
+RETRIEVAL_MODE = os.getenv("FINRISK_RAG_RETRIEVAL", "hybrid")
+# Candidates taken from each list before fusion; fusion then keeps the top k.
+HYBRID_CANDIDATES = int(os.getenv("FINRISK_RAG_HYBRID_CANDIDATES", "20"))
+RRF_K = 60
+
+SWAP_RETRIES = 5
+
+
+class IndexState(NamedTuple):
+    stamp: Optional[int]  # index_meta.json mtime when loaded
+    version: Optional[int]  # ingest run; None for indexes built before manifests
+    index: faiss.Index
+    chunks: object  # ChunkStore, or the parsed chunks.json list for older indexes
+    bm25: Optional[BM25Index]  # None for indexes built before BM25, or in dense mode
+
 
 _embedder: Optional[SentenceTransformer] = None
-_index: Optional[faiss.Index] = None
-_chunks: Optional[list] = None
-_groq: Optional[Groq] = None
+_index_state: Optional[IndexState] = None
+_index_lock = threading.Lock()
+
+
+def load_chunks():
+    """The mmap chunk store when present, else chunks.json from an index built before it."""
+    if (CHUNK_STORE_PATH / "meta.json").exists():
+        chunks = ChunkStore(CHUNK_STORE_PATH)
+        logger.info(f"Mapped {len(chunks)} chunks from {CHUNK_STORE_PATH}")
+        return chunks
+    with open(CHUNKS_PATH) as f:
+        chunks = json.load(f)
+    logger.info(f"Loaded {len(chunks)} chunks from {CHUNKS_PATH}")
+    return chunks
+
+
+def load_bm25() -> Optional[BM25Index]:
+    if RETRIEVAL_MODE != "hybrid":
+        return None
+    if read_bm25_meta(BM25_PATH) is None:
+        logger.warning(f"No BM25 index at {BM25_PATH}; retrieval is dense-only until ingest runs")
+        return None
+    return BM25Index(BM25_PATH)
+
+
+def _meta_stamp() -> Optional[int]:
+    try:
+        return INDEX_META_PATH.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _meta_version() -> Optional[int]:
+    try:
+        return json.loads(INDEX_META_PATH.read_text()).get("version")
+    except FileNotFoundError:
+        return None
+
+
+def _load_index_state() -> IndexState:
+    """Index and chunks from the same ingest run, retrying while ingest is mid-swap."""
+    if not INDEX_PATH.exists():
+        raise FileNotFoundError(
+            f"FAISS index not found at {INDEX_PATH}. Run: python -m src.rag.ingest"
+        )
+    for attempt in range(SWAP_RETRIES):
+        stamp, version = _meta_stamp(), _meta_version()
+        index, meta = load_index(INDEX_PATH, INDEX_META_PATH, INDEX_IO_FLAGS)
+        chunks = load_chunks()
+        bm25 = load_bm25()
+        bm25_version = version if bm25 is None else bm25.version
+        if version == meta.get("version") == getattr(chunks, "version", None) == bm25_version:
+            logger.info(
+                f"Loaded FAISS {meta['index_type']} index v{version}: {INDEX_PATH} "
+                f"({meta['ntotal']} vectors, search={meta['search']})"
+            )
+            return IndexState(stamp, version, index, chunks, bm25)
+        time.sleep(0.1 * (attempt + 1))
+    raise RuntimeError(
+        f"Index and chunk store versions disagree in {INDEX_PATH.parent}. "
+        "Run: python -m src.rag.ingest --full"
+    )
+
+
+def current_index() -> IndexState:
+    """The loaded index, reloaded first if ingest has written a new one."""
+    global _index_state
+    state = _index_state
+    if state is None or state.stamp != _meta_stamp():
+        with _index_lock:
+            if _index_state is None or _index_state.stamp != _meta_stamp():
+                _index_state = _load_index_state()
+            state = _index_state
+    return state
 
 
 def _load_components():
-    global _embedder, _index, _chunks, _groq
+    global _embedder
     if _embedder is None:
         logger.info(f"Loading embedder: {EMBED_MODEL_ID}")
         _embedder = SentenceTransformer(EMBED_MODEL_ID)
-    if _index is None:
-        if not INDEX_PATH.exists():
-            raise FileNotFoundError(
-                f"FAISS index not found at {INDEX_PATH}. Run: python -m src.rag.ingest"
-            )
-        logger.info(f"Loading FAISS index: {INDEX_PATH}")
-        _index = faiss.read_index(str(INDEX_PATH))
-    if _chunks is None:
-        with open(CHUNKS_PATH) as f:
-            _chunks = json.load(f)
-        logger.info(f"Loaded {len(_chunks)} chunks from {CHUNKS_PATH}")
-    if _groq is None:
-        api_key = os.getenv("GROQ_API_KEY")
-        if not api_key:
-            raise RuntimeError("GROQ_API_KEY not set in environment (.env)")
-        _groq = Groq(api_key=api_key)
-    return _embedder, _index, _chunks, _groq
+    state = current_index()
+    return _embedder, state.index, state.chunks, get_backend()
 
 
-def retrieve(question: str, k: int = DEFAULT_K) -> list[dict]:
-    embedder, index, chunks, _ = _load_components()
-    qvec = embedder.encode([question], convert_to_numpy=True, normalize_embeddings=True).astype(
-        "float32"
-    )
-    scores, idxs = index.search(qvec, k)
+def _index_token(state: IndexState) -> tuple:
+    # The stamp also catches rewrites of indexes that predate versions.
+    return (state.version, state.stamp)
+
+
+def _synced_cache(state: IndexState):
+    cache = get_query_cache()
+    cache.sync(_index_token(state))
+    return cache
+
+
+def embed_questions(questions: list[str]) -> np.ndarray:
+    """(n, d) query vectors; cache misses are encoded together in one call."""
+    cache = _synced_cache(current_index())
+    keys = [normalize_question(q) for q in questions]
+    vectors = [cache.embeddings.get(key) for key in keys]
+    missing = {key: q for key, q, v in zip(keys, questions, vectors) if v is None}
+    if missing:
+        embedder, *_ = _load_components()
+        encoded = embedder.encode(
+            list(missing.values()), convert_to_numpy=True, normalize_embeddings=True
+        ).astype("float32")
+        for key, qvec in zip(missing, encoded):
+            cache.embeddings.put(key, qvec[None])
+        fresh = dict(zip(missing, encoded))
+        vectors = [fresh[key][None] if v is None else v for key, v in zip(keys, vectors)]
+    return np.concatenate(vectors)
+
+
+def embed_question(question: str):
+    return embed_questions([question])
+
+
+def _chunk(chunks, faiss_id: int) -> dict:
+    return chunks.by_id(faiss_id) if isinstance(chunks, ChunkStore) else chunks[faiss_id]
+
+
+def _hit(rank: int, score: float, chunk: dict) -> dict:
+    return {
+        "rank": rank,
+        "score": score,
+        "source": chunk["source"],
+        "chunk_id": chunk["id"],
+        "text": chunk["text"],
+    }
+
+
+def _hits(scores, idxs, chunks) -> list[dict]:
+    return [
+        _hit(rank, float(score), _chunk(chunks, idx))
+        for rank, (score, idx) in enumerate(zip(scores, idxs), start=1)
+        if idx != -1
+    ]
+
+
+def _fused_hits(question: str, scores, idxs, state: IndexState, k: int) -> list[dict]:
+    """Top-k of the dense and BM25 lists by reciprocal rank fusion.
+
+    "score" is the fused score; each list's own score is kept alongside (None
+    when the chunk was not in that list).
+    """
+    dense = {int(idx): float(score) for score, idx in zip(scores, idxs) if idx != -1}
+    bm25_scores, bm25_ids = state.bm25.search(question, len(idxs))
+    lexical = dict(zip(bm25_ids.tolist(), bm25_scores.tolist()))
     results = []
-    for rank, (score, idx) in enumerate(zip(scores[0], idxs[0]), start=1):
-        if idx == -1:
-            continue
-        c = chunks[idx]
-        results.append(
-            {
-                "rank": rank,
-                "score": float(score),
-                "source": c["source"],
-                "chunk_id": c["id"],
-                "text": c["text"],
-            }
-        )
+    for rank, (faiss_id, score) in enumerate(
+        reciprocal_rank_fusion([list(dense), list(lexical)], k, RRF_K), start=1
+    ):
+        hit = _hit(rank, score, _chunk(state.chunks, faiss_id))
+        hit.update(dense_score=dense.get(faiss_id), bm25_score=lexical.get(faiss_id))
+        results.append(hit)
     return results
 
 
+def retrieve_batch(questions: list[str], k: int = DEFAULT_K, qvecs=None) -> list[list[dict]]:
+    """retrieve() for many questions: one encode call and one index.search for the misses."""
+    state = current_index()
+    cache = _synced_cache(state)
+    if qvecs is None:
+        qvecs = embed_questions(questions)
+    hybrid = state.bm25 is not None
+    keys = [(vector_key(qvec[None]), k, state.version, hybrid) for qvec in qvecs]
+    results = [cache.retrievals.get(key) for key in keys]
+    missing = [i for i, r in enumerate(results) if r is None]
+    if missing:
+        depth = max(k, HYBRID_CANDIDATES) if hybrid else k
+        scores, idxs = state.index.search(qvecs[missing], depth)
+        for i, row_scores, row_idxs in zip(missing, scores, idxs):
+            if hybrid:
+                results[i] = _fused_hits(questions[i], row_scores, row_idxs, state, k)
+            else:
+                results[i] = _hits(row_scores, row_idxs, state.chunks)
+            cache.retrievals.put(keys[i], [dict(c) for c in results[i]])
+    return [[dict(c) for c in r] for r in results]
+
+
+def retrieve(question: str, k: int = DEFAULT_K) -> list[dict]:
+    return retrieve_batch([question], k=k)[0]
+
+
 SYSTEM_PROMPT = (
     "You are a compliance assistant for a bank. "
     "Answer the user's question STRICTLY based on the numbered context passages provided. "
@@ -91,38 +290,241 @@ SYSTEM_PROMPT = (
 )
 
 
-def _build_context(chunks: list[dict]) -> str:
-    lines = []
-    for c in chunks:
-        lines.append(f"[{c['rank']}] (source: {c['source']})\n{c['text']}\n")
-    return "\n".join(lines)
+NO_PASSAGES = "No relevant policy passages found."
+
+
+def _messages(question: str, retrieved: list[dict]) -> tuple[list[dict], AssembledContext]:
+    """The chat messages for `question`, with the retrieved chunks merged and fitted to budget."""
+    context = get_context_assembler().assemble(retrieved)
+    user_msg = f"Context passages:\n\n{context.text}\nQuestion: {question}\n\nAnswer:"
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_msg},
+    ]
+    return messages, context
+
+
+_SOURCE_KEYS = ("rank", "source", "chunk_id", "score", "dense_score", "bm25_score")
+
+
+def _source_meta(retrieved: list[dict]) -> list[dict]:
+    # dense_score / bm25_score are only there for hybrid retrieval.
+    return [{key: c[key] for key in _SOURCE_KEYS if key in c} for c in retrieved]
+
+
+def _answer_key(question: str, retrieved: list[dict], model: str) -> tuple:
+    chunk_ids = tuple(c["chunk_id"] for c in retrieved)
+    return (normalize_question(question), chunk_ids, model, GENERATION_TEMPERATURE)
+
+
+def _cached_answer(question: str, qvec, retrieved: list[dict], model: str) -> Optional[dict]:
+    """An earlier answer to this question, or to a paraphrase of it, if one still applies."""
+    answer = get_query_cache().answers.get(_answer_key(question, retrieved, model))
+    if answer is not None:
+        return {"answer": answer, "sources": _source_meta(retrieved), "model": model}
+
+    # A paraphrase of an answered question, grounded in mostly the same chunks,
+    # gets that answer back with the sources its citations refer to.
+    semantic = get_semantic_cache(len(qvec))
+    if semantic is None:
+        return None
+    semantic.sync(_index_token(current_index()))
+    chunk_ids = [c["chunk_id"] for c in retrieved]
+    match = semantic.lookup(qvec, chunk_ids, model, GENERATION_TEMPERATURE)
+    if match is None:
+        return None
+    return {
+        "answer": match["answer"],
+        "sources": match["sources"],
+        "model": model,
+        "semantic_match": {"question": match["question"], "similarity": match["similarity"]},
+    }
+
+
+def _remember_answer(question: str, qvec, retrieved: list[dict], model: str, answer: str):
+    get_query_cache().answers.put(_answer_key(question, retrieved, model), answer)
+    semantic = get_semantic_cache(len(qvec))
+    if semantic is not None:
+        chunk_ids = [c["chunk_id"] for c in retrieved]
+        semantic.add(
+            qvec,
+            question,
+            chunk_ids,
+            answer,
+            _source_meta(retrieved),
+            model,
+            GENERATION_TEMPERATURE,
+        )
 
 
 def answer_question(question: str, k: int = DEFAULT_K) -> dict:
-    *_, groq = _load_components()
-    retrieved = retrieve(question, k=k)
+    *_, backend = _load_components()
+    model = backend.model
+    qvecs = embed_question(question)
+    retrieved = retrieve_batch([question], k=k, qvecs=qvecs)[0]
     if not retrieved:
-        return {"answer": "No relevant policy passages found.", "sources": [], "model": GROQ_MODEL}
-
-    context = _build_context(retrieved)
-    user_msg = f"Context passages:\n\n{context}\nQuestion: {question}\n\nAnswer:"
-
-    completion = groq.chat.completions.create(
-        model=GROQ_MODEL,
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": user_msg},
-        ],
-        temperature=GENERATION_TEMPERATURE,
-        max_tokens=512,
-    )
-    answer = completion.choices[0].message.content.strip()
+        return {"answer": NO_PASSAGES, "sources": [], "model": model}
 
-    source_meta = [
-        {"rank": c["rank"], "source": c["source"], "chunk_id": c["chunk_id"], "score": c["score"]}
-        for c in retrieved
-    ]
-    return {"answer": answer, "sources": source_meta, "model": GROQ_MODEL}
+    qvec = qvecs[0]
+    cached = _cached_answer(question, qvec, retrieved, model)
+    if cached is not None:
+        return cached
+
+    messages, _ = _messages(question, retrieved)
+    completion = backend.complete(messages, GENERATION_TEMPERATURE, MAX_ANSWER_TOKENS)
+    answer = completion.text.strip()
+    _remember_answer(question, qvec, retrieved, model, answer)
+    return {"answer": answer, "sources": _source_meta(retrieved), "model": model}
+
+
+def answer_questions(
+    questions: list[str], k: int = DEFAULT_K, concurrency: int = BATCH_CONCURRENCY
+) -> list[dict]:
+    """
+    answer_question for a list, results in input order. All questions are
+    embedded in one encode call and searched in one index.search; those
+    without a cached answer go to the backend at most `concurrency` at a time
+    (a question repeated in the batch is generated once). A question whose
+    generation fails gets {"error": ...} instead of failing the batch.
+    """
+    *_, backend = _load_components()
+    model = backend.model
+    qvecs = embed_questions(questions)
+    retrieved = retrieve_batch(questions, k=k, qvecs=qvecs)
+
+    results: list[Optional[dict]] = [None] * len(questions)
+    pending: dict = {}  # answer key -> indexes of the questions it answers
+    for i, (question, qvec, hits) in enumerate(zip(questions, qvecs, retrieved)):
+        if not hits:
+            results[i] = {"answer": NO_PASSAGES, "sources": [], "model": model}
+            continue
+        cached = _cached_answer(question, qvec, hits, model)
+        if cached is not None:
+            results[i] = cached
+            continue
+        pending.setdefault(_answer_key(question, hits, model), []).append(i)
+
+    def generate(i: int) -> str:
+        messages, _ = _messages(questions[i], retrieved[i])
+        completion = backend.complete(messages, GENERATION_TEMPERATURE, MAX_ANSWER_TOKENS)
+        answer = completion.text.strip()
+        _remember_answer(questions[i], qvecs[i], retrieved[i], model, answer)
+        return answer
+
+    if pending:
+        workers = max(1, min(concurrency, len(pending)))
+        with ThreadPoolExecutor(workers, thread_name_prefix="finrisk-rag-batch") as pool:
+            futures = [(pool.submit(generate, idxs[0]), idxs) for idxs in pending.values()]
+            for future, idxs in futures:
+                try:
+                    answer = future.result()
+                except Exception as e:
+                    logger.warning(f"Batch question {idxs[0]} failed: {e}")
+                    for i in idxs:
+                        results[i] = {"error": str(e)}
+                    continue
+                for i in idxs:
+                    results[i] = {
+                        "answer": answer,
+                        "sources": _source_meta(retrieved[i]),
+                        "model": model,
+                    }
+    return results
+
+
+def _ms(start: float, end: float) -> float:
+    return round(1000 * (end - start), 1)
+
+
+def stream_answer(question: str, k: int = DEFAULT_K):
+    """
+    answer_question as a sequence of events, for /ask_policy/stream:
+      {"event": "sources", "sources": [...], "model": ...}  (first, before generation)
+      {"event": "token", "text": "..."}                      (zero or more)
+      {"event": "done", "answer": ..., "usage": ..., "context": ..., "latency_ms": {...}}
+    A cached answer arrives as a single token event; "done" then names the
+    cache tier in "cached" and has no usage or context. Closing the generator
+    early closes the backend's stream.
+    """
+    started = time.perf_counter()
+    *_, backend = _load_components()
+    model = backend.model
+    qvecs = embed_question(question)
+    qvec = qvecs[0]
+    embedded = time.perf_counter()
+    retrieved = retrieve_batch([question], k=k, qvecs=qvecs)[0]
+    searched = time.perf_counter()
+    latency = {"embed": _ms(started, embedded), "retrieve": _ms(embedded, searched)}
+
+    if not retrieved:
+        yield {"event": "sources", "sources": [], "model": model}
+        yield {"event": "token", "text": NO_PASSAGES}
+        latency["total"] = _ms(started, time.perf_counter())
+        yield {
+            "event": "done",
+            "answer": NO_PASSAGES,
+            "cached": None,
+            "usage": None,
+            "latency_ms": latency,
+        }
+        return
+
+    cached = _cached_answer(question, qvec, retrieved, model)
+    if cached is not None:
+        yield {"event": "sources", "sources": cached["sources"], "model": model}
+        yield {"event": "token", "text": cached["answer"]}
+        latency["total"] = _ms(started, time.perf_counter())
+        done = {
+            "event": "done",
+            "answer": cached["answer"],
+            "cached": "semantic" if "semantic_match" in cached else "exact",
+            "usage": None,
+            "latency_ms": latency,
+        }
+        if "semantic_match" in cached:
+            done["semantic_match"] = cached["semantic_match"]
+        yield done
+        return
+
+    yield {"event": "sources", "sources": _source_meta(retrieved), "model": model}
+    requested = time.perf_counter()
+    parts, usage, first_token = [], None, None
+    messages, context = _messages(question, retrieved)
+    stream = backend.stream(messages, GENERATION_TEMPERATURE, MAX_ANSWER_TOKENS)
+    try:
+        for item in stream:
+            if not isinstance(item, str):
+                usage = item
+                continue
+            if first_token is None:
+                first_token = time.perf_counter()
+            parts.append(item)
+            yield {"event": "token", "text": item}
+    finally:
+        stream.close()
+    finished = time.perf_counter()
+
+    answer = "".join(parts).strip()
+    _remember_answer(question, qvec, retrieved, model, answer)
+    latency.update(
+        first_token=_ms(requested, first_token or finished),
+        generate=_ms(requested, finished),
+        total=_ms(started, finished),
+    )
+    yield {
+        "event": "done",
+        "answer": answer,
+        "cached": None,
+        "usage": usage._asdict() if usage is not None else None,
+        "context": {
+            "tokens": context.tokens,
+            "tokens_saved": context.tokens_saved,
+            "merged": context.merged,
+            "trimmed": context.trimmed,
+            "dropped": context.dropped,
+        },
+        "latency_ms": latency,
+    }
 
 
 if __name__ == "__main__":
@@ -0,0 +1,140 @@
+"""
+src/rag/query_cache.py
+
+Tiered TTL + LRU cache for /ask_policy.
+
+Compliance staff ask the same handful of questions, and each stage of a
+repeated one gives the same result until the index changes:
+
+    embeddings   normalized question                           -> query vector
+    retrievals   (query vector hash, k, index version)          -> retrieved chunks
+    answers      (normalized question, chunk ids, model, temp.) -> answer text
+
+Each tier is its own LRU of `capacity` entries that expire `ttl_s` seconds
+after being written. The query path calls `sync(version)` with the loaded
+index's identity before every lookup; when it differs from the last one
+(ingest wrote a new index), all three tiers are cleared.
+
+Config: FINRISK_RAG_CACHE_SIZE (entries per tier, 0 disables) and
+FINRISK_RAG_CACHE_TTL_S.
+"""
+
+import collections
+import hashlib
+import os
+import re
+import threading
+import time
+from typing import Hashable, Optional
+
+import numpy as np
+
+RAG_CACHE_SIZE = int(os.getenv("FINRISK_RAG_CACHE_SIZE", "1024"))
+RAG_CACHE_TTL_S = float(os.getenv("FINRISK_RAG_CACHE_TTL_S", "3600"))
+
+_TRAILING = re.compile(r"[\s?!.]+$")
+
+
+def normalize_question(question: str) -> str:
+    """Case, runs of whitespace and trailing punctuation don't change the question."""
+    return _TRAILING.sub("", " ".join(question.lower().split()))
+
+
+def vector_key(vector: np.ndarray) -> str:
+    return hashlib.sha256(np.ascontiguousarray(vector, dtype=np.float32).tobytes()).hexdigest()
+
+
+class TTLCache:
+    def __init__(self, capacity: int, ttl_s: float):
+        self.capacity = max(0, capacity)
+        self.ttl_s = ttl_s
+        self._entries: collections.OrderedDict = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def get(self, key: Hashable):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl_s:
+                del self._entries[key]
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value):
+        if not self.capacity:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class QueryCache:
+    def __init__(self, capacity: int = RAG_CACHE_SIZE, ttl_s: float = RAG_CACHE_TTL_S):
+        self.embeddings = TTLCache(capacity, ttl_s)
+        self.retrievals = TTLCache(capacity, ttl_s)
+        self.answers = TTLCache(capacity, ttl_s)
+        self._version: Optional[Hashable] = None
+        self._lock = threading.Lock()
+        self.invalidations = 0
+
+    def sync(self, version: Hashable):
+        """Clear every tier if the index is not the one the entries came from."""
+        with self._lock:
+            if version == self._version:
+                return
+            if self._version is not None:
+                self.invalidations += 1
+            self._version = version
+            for tier in (self.embeddings, self.retrievals, self.answers):
+                tier.clear()
+
+    def stats(self) -> dict:
+        return {
+            "index_version": self._version,
+            "invalidations": self.invalidations,
+            "embeddings": self.embeddings.stats(),
+            "retrievals": self.retrievals.stats(),
+            "answers": self.answers.stats(),
+        }
+
+
+_cache: Optional[QueryCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_query_cache() -> QueryCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = QueryCache()
+    return _cache
+
+
+def query_cache_stats() -> dict:
+    return get_query_cache().stats() if _cache is not None else {"enabled": RAG_CACHE_SIZE > 0}
@@ -0,0 +1,281 @@
+"""
+src/rag/semantic_cache.py
+
+Near-duplicate answer cache for /ask_policy.
+
+The exact tiers in query_cache.py only catch a question asked the same way
+twice. Policy questions are mostly paraphrases ("what is CDD" / "explain
+customer due diligence"), so previously answered questions are also kept as
+embeddings in a small FAISS inner-product index. A new question reuses a
+stored answer when:
+
+- cosine similarity to the stored question is >= `threshold`, and
+- the chunks retrieved now overlap the chunks that answer was grounded in
+  (Jaccard >= `min_overlap`), so the reused citations still point at passages
+  the current retrieval considers relevant, and
+- the generation model and temperature are the same.
+
+The stored answer is returned with its own sources, which its [n] citations
+refer to. Entries are evicted oldest-first past `capacity`, dropped when the
+policy index version changes, and persisted (index + JSON) in a directory next
+to the policy index so a restart keeps them.
+
+Saving rewrites the whole cache, so it is not done on every add: the cache is
+written after `save_every` new answers and at shutdown (close_semantic_cache),
+outside the lock that lookups take. Temp files carry the process id, so API
+workers sharing the directory never write into each other's half-written
+files; the last worker to save wins.
+
+Config: FINRISK_RAG_SEMANTIC_CACHE_SIZE (0 disables), FINRISK_RAG_SEMANTIC_THRESHOLD,
+FINRISK_RAG_SEMANTIC_MIN_OVERLAP, FINRISK_RAG_SEMANTIC_CACHE_DIR (empty = memory only),
+FINRISK_RAG_SEMANTIC_SAVE_EVERY (new answers between saves, default 32).
+"""
+
+import collections
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Hashable, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SEMANTIC_CACHE_SIZE = int(os.getenv("FINRISK_RAG_SEMANTIC_CACHE_SIZE", "2048"))
+SEMANTIC_THRESHOLD = float(os.getenv("FINRISK_RAG_SEMANTIC_THRESHOLD", "0.9"))
+SEMANTIC_MIN_OVERLAP = float(os.getenv("FINRISK_RAG_SEMANTIC_MIN_OVERLAP", "0.5"))
+SEMANTIC_CACHE_DIR = os.getenv("FINRISK_RAG_SEMANTIC_CACHE_DIR", "data/rag/index/semantic_cache")
+SAVE_EVERY = int(os.getenv("FINRISK_RAG_SEMANTIC_SAVE_EVERY", "32"))
+CANDIDATES = 4  # near neighbours checked for chunk overlap per lookup
+SIMILARITY_WINDOW = 1000  # recent best-match similarities kept for stats
+
+
+def jaccard(a, b) -> float:
+    a, b = set(a), set(b)
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+
+class SemanticAnswerCache:
+    def __init__(
+        self,
+        dim: int,
+        capacity: int = SEMANTIC_CACHE_SIZE,
+        threshold: float = SEMANTIC_THRESHOLD,
+        min_overlap: float = SEMANTIC_MIN_OVERLAP,
+        directory: Optional[str] = SEMANTIC_CACHE_DIR,
+        save_every: int = SAVE_EVERY,
+    ):
+        import faiss
+
+        self._faiss = faiss
+        self.dim = dim
+        self.capacity = max(0, capacity)
+        self.threshold = threshold
+        self.min_overlap = min_overlap
+        self.directory = Path(directory) if directory else None
+        self.save_every = max(1, save_every)
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._unsaved = 0  # changes since the last snapshot
+        self._snapshots = 0  # snapshots taken; a writer skips one older than what's on disk
+        self._written = 0
+        self._version: Optional[Hashable] = None
+        self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+        self._entries: collections.OrderedDict = collections.OrderedDict()  # id -> entry
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.below_threshold = 0
+        self.near_rejected = 0
+        self._best = collections.deque(maxlen=SIMILARITY_WINDOW)
+        self._hit_similarities = collections.deque(maxlen=SIMILARITY_WINDOW)
+        self._load()
+
+    # -- persistence --------------------------------------------------------
+    def _load(self):
+        if self.directory is None or not (self.directory / "entries.json").exists():
+            return
+        try:
+            state = json.loads((self.directory / "entries.json").read_text())
+            index = self._faiss.read_index(str(self.directory / "questions.faiss"))
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable semantic cache in {self.directory}: {e}")
+            return
+        if index.d != self.dim or index.ntotal != len(state["entries"]):
+            return
+        self._index = index
+        self._version = state["version"] if state["version"] is None else tuple(state["version"])
+        self._entries = collections.OrderedDict((int(i), e) for i, e in state["entries"])
+        self._next_id = state["next_id"]
+
+    def _snapshot(self) -> Optional[tuple]:
+        """Serialized (index, entries) to write, taken under self._lock; None if nothing to save."""
+        if self.directory is None or not self._unsaved:
+            return None
+        changes, self._unsaved = self._unsaved, 0
+        state = {
+            "version": self._version,
+            "next_id": self._next_id,
+            "entries": list(self._entries.items()),
+        }
+        self._snapshots += 1
+        index_bytes = self._faiss.serialize_index(self._index).tobytes()
+        return self._snapshots, changes, index_bytes, json.dumps(state)
+
+    def _write(self, snapshot: Optional[tuple]):
+        if snapshot is None:
+            return
+        seq, changes, index_bytes, entries_json = snapshot
+        with self._save_lock:
+            if seq < self._written:
+                return
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                for name, data in (
+                    ("questions.faiss", index_bytes),
+                    ("entries.json", entries_json),
+                ):
+                    tmp = self.directory / f"{name}.{os.getpid()}.tmp"
+                    if isinstance(data, str):
+                        tmp.write_text(data)
+                    else:
+                        tmp.write_bytes(data)
+                    os.replace(tmp, self.directory / name)
+            except OSError as e:
+                logger.warning(f"Could not save the semantic cache to {self.directory}: {e}")
+            else:
+                self._written = seq
+                return
+        # Count the changes as unsaved again, so the next snapshot retries them.
+        with self._lock:
+            self._unsaved += changes
+
+    def flush(self):
+        """Write unsaved changes now (at shutdown)."""
+        with self._lock:
+            snapshot = self._snapshot()
+        self._write(snapshot)
+
+    # -- cache --------------------------------------------------------------
+    def sync(self, version: Hashable):
+        """Drop every entry if they were answered against a different index."""
+        with self._lock:
+            if version == self._version:
+                return
+            self._version = version
+            if self._entries:
+                self._index.reset()
+                self._entries.clear()
+                self._unsaved += 1
+
+    def lookup(
+        self, qvec: np.ndarray, chunk_ids: list, model: str, temperature: float
+    ) -> Optional[dict]:
+        """The best stored answer for a near-duplicate question, with its similarity."""
+        with self._lock:
+            if not self._entries:
+                self.misses += 1
+                return None
+            scores, ids = self._index.search(qvec.reshape(1, -1), CANDIDATES)
+            self._best.append(float(scores[0][0]))
+            near = False
+            for score, entry_id in zip(scores[0], ids[0]):
+                if entry_id == -1 or score < self.threshold:
+                    break
+                near = True
+                entry = self._entries[int(entry_id)]
+                if entry["model"] != model or entry["temperature"] != temperature:
+                    continue
+                if jaccard(entry["chunk_ids"], chunk_ids) >= self.min_overlap:
+                    self.hits += 1
+                    self._hit_similarities.append(float(score))
+                    return {**entry, "similarity": float(score)}
+            self.misses += 1
+            if near:
+                self.near_rejected += 1
+            else:
+                self.below_threshold += 1
+            return None
+
+    def add(
+        self,
+        qvec: np.ndarray,
+        question: str,
+        chunk_ids: list,
+        answer: str,
+        sources: list,
+        model: str,
+        temperature: float,
+    ):
+        if not self.capacity:
+            return
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._index.add_with_ids(
+                np.ascontiguousarray(qvec.reshape(1, -1), dtype=np.float32),
+                np.array([entry_id], dtype=np.int64),
+            )
+            self._entries[entry_id] = {
+                "question": question,
+                "chunk_ids": list(chunk_ids),
+                "answer": answer,
+                "sources": sources,
+                "model": model,
+                "temperature": temperature,
+            }
+            while len(self._entries) > self.capacity:
+                oldest, _ = self._entries.popitem(last=False)
+                self._index.remove_ids(np.array([oldest], dtype=np.int64))
+            self._unsaved += 1
+            snapshot = self._snapshot() if self._unsaved >= self.save_every else None
+        self._write(snapshot)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            best = np.array(self._best) if self._best else None
+            return {
+                "entries": len(self._entries),
+                "threshold": self.threshold,
+                "min_overlap": self.min_overlap,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "misses_below_threshold": self.below_threshold,
+                # similar question, but chunks or model/temperature differed
+                "misses_near_rejected": self.near_rejected,
+                "mean_hit_similarity": (
+                    float(np.mean(self._hit_similarities)) if self._hit_similarities else None
+                ),
+                "best_similarity_p50": float(np.percentile(best, 50)) if best is not None else None,
+                "best_similarity_p90": float(np.percentile(best, 90)) if best is not None else None,
+            }
+
+
+_cache: Optional[SemanticAnswerCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_semantic_cache(dim: int) -> Optional[SemanticAnswerCache]:
+    """The process-wide cache, or None when disabled."""
+    global _cache
+    if not SEMANTIC_CACHE_SIZE:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SemanticAnswerCache(dim)
+    return _cache
+
+
+def close_semantic_cache():
+    """Save what the process-wide cache has not written yet."""
+    if _cache is not None:
+        _cache.flush()
+
+
+def semantic_cache_stats() -> dict:
+    return _cache.stats() if _cache is not None else {"enabled": SEMANTIC_CACHE_SIZE > 0}
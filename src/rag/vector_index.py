@@ -0,0 +1,239 @@
+"""
+src/rag/vector_index.py
+
+FAISS index construction for the policy corpus: flat, HNSW, IVF-Flat, IVF-PQ.
+
+Every type uses inner product over normalised vectors (= cosine similarity),
+so scores stay comparable. The chosen type, its build parameters and its
+query-time parameters (nprobe, efSearch) are written to a JSON file next to
+the index, and `load_index` applies them, so the query path never needs to
+know which type ingest picked.
+
+Sizing heuristics (from the FAISS guidelines):
+- flat below AUTO_FLAT_MAX vectors: a brute-force scan is only a few ms there.
+- IVF: nlist ~ 4*sqrt(n), capped so every centroid gets >= MIN_POINTS_PER_CENTROID
+  training points; training uses at most MAX_POINTS_PER_CENTROID per centroid.
+- PQ: sub-vectors of PQ_DIMS_PER_SUBQUANTIZER dims, and 8-bit codebooks only
+  once there are enough points to train 256 centroids per sub-quantizer.
+  PQ distances alone rank close neighbours poorly (recall@4 ~0.1 on a
+  clustered 100k corpus, whatever nprobe is), so by default the top
+  k * k_factor PQ candidates are re-ranked against the full vectors (IndexRefineFlat). Those
+  vectors sit in the same file and are memory-mapped at query time, so only
+  the pages of re-ranked candidates are read.
+"""
+
+import json
+import math
+import os
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+import faiss
+import numpy as np
+
+FORMAT_VERSION = 1
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+
+AUTO_FLAT_MAX = 20_000
+AUTO_HNSW_MAX = 1_000_000
+MIN_POINTS_PER_CENTROID = 39
+MAX_POINTS_PER_CENTROID = 256
+PQ_DIMS_PER_SUBQUANTIZER = 8
+
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+REFINE_K_FACTOR = 16
+
+
+def choose_index_type(n: int) -> str:
+    if n <= AUTO_FLAT_MAX:
+        return "flat"
+    return "hnsw" if n <= AUTO_HNSW_MAX else "ivf_pq"
+
+
+def ivf_nlist(n: int) -> int:
+    return max(1, min(int(4 * math.sqrt(n)), n // MIN_POINTS_PER_CENTROID))
+
+
+def default_nprobe(nlist: int) -> int:
+    return min(nlist, max(8, nlist // 16))
+
+
+def pq_params(dim: int, n: int) -> tuple[int, int]:
+    """(sub-quantizers, bits per code) for `n` training vectors of `dim` dims."""
+    m = max(1, dim // PQ_DIMS_PER_SUBQUANTIZER)
+    while dim % m:
+        m -= 1
+    nbits = min(8, int(math.log2(max(1, n // MIN_POINTS_PER_CENTROID))))
+    if nbits < 4:
+        raise ValueError(f"ivf_pq needs at least {16 * MIN_POINTS_PER_CENTROID} vectors, got {n}")
+    return m, nbits
+
+
+def _training_sample(vectors: np.ndarray, nlist: int, seed: int = 0) -> np.ndarray:
+    limit = nlist * MAX_POINTS_PER_CENTROID
+    if len(vectors) <= limit:
+        return vectors
+    rows = np.random.default_rng(seed).choice(len(vectors), limit, replace=False)
+    return vectors[np.sort(rows)]
+
+
+def make_index(
+    vectors: np.ndarray, index_type: str = "auto", ids: Optional[np.ndarray] = None, **overrides
+) -> tuple[faiss.Index, dict]:
+    """Build and fill an index of `index_type` ("auto" picks by size); returns (index, meta).
+
+    With `ids` the index is wrapped in an IndexIDMap2, so search returns those
+    ids and vectors can later be removed by id. `overrides` replace heuristic
+    parameters: nlist, nprobe, M, efConstruction, efSearch, pq_m, pq_nbits,
+    refine (bool) and k_factor.
+    """
+    n, dim = vectors.shape
+    if index_type == "auto":
+        index_type = choose_index_type(n)
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}; expected one of {INDEX_TYPES}")
+
+    build, search = {}, {}
+    if index_type == "flat":
+        index = faiss.IndexFlatIP(dim)
+    elif index_type == "hnsw":
+        build = {
+            "M": overrides.get("M", HNSW_M),
+            "efConstruction": overrides.get("efConstruction", HNSW_EF_CONSTRUCTION),
+        }
+        search = {"efSearch": overrides.get("efSearch", HNSW_EF_SEARCH)}
+        index = faiss.IndexHNSWFlat(dim, build["M"], faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = build["efConstruction"]
+    else:
+        nlist = overrides.get("nlist") or ivf_nlist(n)
+        build = {"nlist": nlist}
+        search = {"nprobe": overrides.get("nprobe", default_nprobe(nlist))}
+        quantizer = faiss.IndexFlatIP(dim)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        else:
+            if "pq_m" in overrides and "pq_nbits" in overrides:
+                m, nbits = overrides["pq_m"], overrides["pq_nbits"]
+            else:
+                m, nbits = pq_params(dim, n)
+            build["pq_m"] = overrides.get("pq_m", m)
+            build["pq_nbits"] = overrides.get("pq_nbits", nbits)
+            index = faiss.IndexIVFPQ(
+                quantizer, dim, nlist, build["pq_m"], build["pq_nbits"], faiss.METRIC_INNER_PRODUCT
+            )
+        sample = _training_sample(vectors, nlist)
+        build["trained_on"] = len(sample)
+        index.train(sample)
+        if index_type == "ivf_pq" and overrides.get("refine", True):
+            build["refine"] = True
+            search["k_factor"] = overrides.get("k_factor", REFINE_K_FACTOR)
+            index = faiss.IndexRefineFlat(index)
+
+    if ids is None:
+        index.add(vectors)
+    else:
+        index = faiss.IndexIDMap2(index)
+        index.add_with_ids(vectors, np.asarray(ids, dtype=np.int64))
+    apply_search_params(index, search)
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "index_type": index_type,
+        "metric": "inner_product",
+        "dim": dim,
+        "ntotal": int(index.ntotal),
+        "id_map": ids is not None,
+        "build": build,
+        "search": search,
+    }
+    return index, meta
+
+
+def remove_ids(index: faiss.Index, ids: np.ndarray, meta: dict) -> faiss.Index:
+    """Drop `ids` from an IndexIDMap2; returns the index to keep using.
+
+    Flat and IVF indexes delete in place. HNSW graphs and refined IVF-PQ
+    cannot, so those are rebuilt from their own stored vectors (no re-embedding)
+    with the same parameters.
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    if not len(ids):
+        return index
+    try:
+        index.remove_ids(ids)
+        return index
+    except RuntimeError:
+        pass
+    index = faiss.downcast_index(index)
+    current = faiss.vector_to_array(index.id_map)
+    keep = current[~np.isin(current, ids)]
+    vectors = index.reconstruct_batch(keep)
+    params = {**meta.get("build", {}), **meta.get("search", {})}
+    rebuilt, _ = make_index(vectors, meta["index_type"], ids=keep, **params)
+    return rebuilt
+
+
+def _innermost(index: faiss.Index) -> faiss.Index:
+    """The index that holds the vectors, unwrapping IndexIDMap and friends."""
+    index = faiss.downcast_index(index)
+    while isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        index = faiss.downcast_index(index.index)
+    return index
+
+
+def apply_search_params(index: faiss.Index, search: dict):
+    inner = _innermost(index)
+    if isinstance(inner, faiss.IndexRefine):
+        if "k_factor" in search:
+            inner.k_factor = float(search["k_factor"])
+        inner = _innermost(inner.base_index)
+    if "efSearch" in search and isinstance(inner, faiss.IndexHNSW):
+        inner.hnsw.efSearch = int(search["efSearch"])
+    if "nprobe" in search and isinstance(inner, faiss.IndexIVF):
+        inner.nprobe = int(search["nprobe"])
+
+
+def save_index(index: faiss.Index, meta: dict, index_path: Path, meta_path: Path):
+    """Write the index and its metadata, each via a temp file and an atomic rename."""
+    tmp = index_path.with_name(index_path.name + ".tmp")
+    faiss.write_index(index, str(tmp))
+    os.replace(tmp, index_path)
+    tmp = meta_path.with_name(meta_path.name + ".tmp")
+    tmp.write_text(json.dumps(meta, indent=2) + "\n")
+    os.replace(tmp, meta_path)
+
+
+def load_index(
+    index_path: Union[str, Path], meta_path: Optional[Path] = None, io_flags: int = 0
+) -> tuple[faiss.Index, dict]:
+    """Read an index and apply its persisted search parameters.
+
+    An index written before metadata existed is a plain IndexFlatIP.
+    """
+    index = faiss.read_index(str(index_path), io_flags)
+    if meta_path is not None and Path(meta_path).exists():
+        meta = json.loads(Path(meta_path).read_text())
+    else:
+        meta = {"index_type": "flat", "metric": "inner_product", "search": {}}
+    meta.update(dim=index.d, ntotal=int(index.ntotal))
+    apply_search_params(index, meta.get("search", {}))
+    return index, meta
+
+
+def recall_at_k(exact_ids: np.ndarray, found_ids: np.ndarray, k: int) -> float:
+    """Mean fraction of the exact top-k that the approximate search also returned."""
+    hits = sum(
+        len(set(exact[:k]) & set(found[:k]) - {-1}) for exact, found in zip(exact_ids, found_ids)
+    )
+    return hits / (k * len(exact_ids))
+
+
+def search_latency_ms(index: faiss.Index, queries: np.ndarray, k: int) -> tuple[float, np.ndarray]:
+    """Mean per-query latency searching one query at a time, as the API does."""
+    found = np.empty((len(queries), k), dtype=np.int64)
+    started = time.perf_counter()
+    for i in range(len(queries)):
+        found[i] = index.search(queries[i : i + 1], k)[1][0]
+    return 1000 * (time.perf_counter() - started) / len(queries), found
@@ -4,19 +4,41 @@ src/service/app.py
 FinRisk Copilot — FastAPI service
 Endpoints:
   GET  /health              — liveness check
+  GET  /metrics             — runtime counters (micro-batching, ...)
   POST /predict             — LightGBM credit risk score
+  POST /predict_batch       — vectorized scoring of a JSON list of applications
+  POST /predict_batch/upload — same, from a CSV or Parquet file
   POST /explain             — TinyLlama plain-English explanation
+  POST /explain_batch       — explanations for a list of decisions, batched on the model
   POST /predict_and_explain — combined (score + explanation in one call)
+  POST /predict_and_explain/stream — same, NDJSON: score first, then explanation tokens
+  GET  /explanations/{id}   — LLM upgrade of a tier-0 (rule-based) explanation
   POST /ask_policy          — RAG over banking policy PDFs (Groq Llama 3.1)
+  POST /ask_policy/stream   — same, NDJSON: sources first, then answer tokens, then usage/latency
+  POST /ask_policy_batch    — answers for a list of questions, generated concurrently
+
+Endpoints are async. Blocking work runs on a bounded executor per workload
+class (scoring / explain / rag, see src/service/executors.py), so a burst on
+one endpoint can't starve the others; overflow gets 503 + Retry-After.
 """
 
+import asyncio
+import io
+import json
 import logging
 import os
+import sqlite3
+import threading
+import time
+from contextlib import asynccontextmanager, closing
+from typing import Optional
+
+from fastapi import Body, FastAPI, File, HTTPException, Query, Request, UploadFile
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
 
-import joblib
-import pandas as pd
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field
+from src.service.executors import Overloaded, from_env
+from src.service.explanation_jobs import ExplanationJobs
 
 os.makedirs("logs", exist_ok=True)
 logging.basicConfig(
@@ -26,19 +48,96 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Start the explainer workers at boot instead of on the first /explain call.
+EXPLAINER_WARM = os.getenv("FINRISK_EXPLAINER_WARM", "0") == "1"
+# Upper bound on rows per /predict_batch call, so one upload can't exhaust memory.
+MAX_BATCH_ROWS = int(os.getenv("FINRISK_MAX_BATCH_ROWS", "10000"))
+# Default explanation deadline; past it, generation stops at the next sentence end. 0 = none.
+EXPLAIN_DEADLINE_MS = float(os.getenv("FINRISK_EXPLAIN_DEADLINE_MS", "0"))
+# Upper bound on items per /explain_batch call; each one is an LLM generation.
+MAX_EXPLAIN_BATCH = int(os.getenv("FINRISK_MAX_EXPLAIN_BATCH", "256"))
+# Upper bound on questions per /ask_policy_batch call; each one may be an LLM call.
+MAX_POLICY_BATCH = int(os.getenv("FINRISK_MAX_POLICY_BATCH", "200"))
+# Opt-in micro-batching of concurrent /predict calls (see src/service/batching.py).
+MICROBATCH = os.getenv("FINRISK_MICROBATCH", "0") == "1"
+MICROBATCH_WINDOW_MS = float(os.getenv("FINRISK_MICROBATCH_WINDOW_MS", "2"))
+MICROBATCH_MAX_ROWS = int(os.getenv("FINRISK_MICROBATCH_MAX_ROWS", "64"))
+MICROBATCH_MAX_QUEUE = int(os.getenv("FINRISK_MICROBATCH_MAX_QUEUE", "1024"))
+
+# /predict_and_explain: "sync" always waits for the LLM; "tiered" always answers with
+# the rule-based explanation and upgrades in the background; "auto" does that only
+# when every explain thread is busy.
+EXPLAIN_MODE = os.getenv("FINRISK_EXPLAIN_MODE", "auto")
+EXPLAIN_JOB_TTL_S = float(os.getenv("FINRISK_EXPLAIN_JOB_TTL_S", "600"))
+
+# One bounded executor per workload class: (threads, waiting jobs, Retry-After seconds).
+# Explanation defaults to one thread per explainer worker — more would only queue
+# inside the pool, where the wait isn't visible or capped.
+_scoring = from_env("scoring", workers=4, queue=256, retry_after=1)
+_explain = from_env(
+    "explain",
+    workers=int(os.getenv("FINRISK_EXPLAINER_WORKERS", "1")),
+    queue=8,
+    retry_after=30,
+)
+_rag = from_env("rag", workers=4, queue=32, retry_after=5)
+_jobs = ExplanationJobs(_explain, ttl_s=EXPLAIN_JOB_TTL_S)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from src.models.lora_infer import get_pool, shutdown_pool
+    from src.rag.generation import close_backend
+    from src.rag.semantic_cache import close_semantic_cache
+
+    if EXPLAINER_WARM:
+        get_pool().warm()
+    yield
+    if _batcher is not None:
+        _batcher.close()
+    for ex in (_scoring, _explain, _rag):
+        ex.shutdown()
+    shutdown_pool()
+    close_backend()
+    close_semantic_cache()
+
+
 app = FastAPI(
     title="FinRisk Copilot",
     description="Credit risk scoring + plain-English explanations + policy QA via RAG",
     version="3.0",
+    lifespan=lifespan,
 )
 
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    logger.warning(f"Rejected {request.url.path}: {exc}")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
 # ---------------------------------------------------------------------------
-# Load LightGBM pipeline at startup
-# Strategy: try MLflow Model Registry (Production stage) first,
-# fall back to local pickle. This means production deploys can promote
-# new model versions without code changes, while still working in Docker
-# or CI environments where the registry isn't available.
+# Load LightGBM model at startup
+# Strategy: prefer the compiled artifact from scripts/export_model.py (booster
+# text + encoding table) — it needs neither sklearn nor pandas, so each uvicorn
+# worker starts faster and stays smaller. Otherwise try the MLflow Model
+# Registry (Production stage), then the local pickle. The registry path lets
+# production deploys promote new versions without code changes; set
+# FINRISK_USE_COMPILED=0 to serve it even when a compiled artifact exists.
+# The artifact is only used while it matches what the registry or pickle path
+# would serve (the export records the registry version or pickle SHA-256), so
+# a retrain or promotion without a fresh export never serves stale trees.
+# pandas/joblib are imported lazily for the same reason.
 # ---------------------------------------------------------------------------
+USE_COMPILED = os.getenv("FINRISK_USE_COMPILED", "1") == "1"
+COMPILED_STEM_CANDIDATES = [
+    "/app/models/credit_risk_model",  # Docker
+    os.path.abspath("models/credit_risk_model"),  # local
+]
 MLFLOW_URI = "sqlite:///mlflow.db"
 REGISTERED_NAME = "credit_risk_model"
 LOAD_STAGE = "Production"
@@ -48,6 +147,64 @@ LOCAL_PKL_CANDIDATES = [
 ]
 
 
+def _registry_version() -> Optional[str]:
+    """Version of the model in LOAD_STAGE, read from mlflow.db with sqlite3 (no mlflow import)."""
+    if not os.path.exists("mlflow.db"):
+        return None
+    try:
+        with closing(sqlite3.connect("file:mlflow.db?mode=ro", uri=True)) as db:
+            row = db.execute(
+                "SELECT version FROM model_versions WHERE name = ? AND current_stage = ? "
+                "ORDER BY CAST(version AS INTEGER) DESC LIMIT 1",
+                (REGISTERED_NAME, LOAD_STAGE),
+            ).fetchone()
+    except sqlite3.Error as e:
+        logger.warning(f"Could not read the model registry ({e})")
+        return None
+    return str(row[0]) if row else None
+
+
+def _compiled_is_stale(source: dict) -> Optional[str]:
+    """Why the compiled artifact doesn't match what registry/pickle would serve, or None."""
+    from src.models.fast_scorer import file_sha256
+
+    version = _registry_version()
+    if version is not None:
+        if source.get("registry_version") != version:
+            return f"registry {LOAD_STAGE} is v{version}, artifact was exported from {source}"
+        return None
+    for p in LOCAL_PKL_CANDIDATES:
+        if os.path.exists(p):
+            if source.get("pickle_sha256") != file_sha256(p):
+                return f"{p} has changed since the artifact was exported"
+            return None
+    return None  # nothing else to serve
+
+
+def _load_compiled():
+    """Preferred: exported booster + encoding table. Returns (scorer, source_str) or (None, None)."""
+    if not USE_COMPILED:
+        return None, None
+    from src.models.fast_scorer import ENCODING_SUFFIX, FastScorer
+
+    for stem in COMPILED_STEM_CANDIDATES:
+        if os.path.exists(stem + ENCODING_SUFFIX):
+            try:
+                scorer = FastScorer.load(stem)
+            except Exception as e:
+                logger.warning(f"Compiled model load failed ({e}); trying registry/pickle.")
+                continue
+            stale = _compiled_is_stale(scorer.source)
+            if stale:
+                logger.warning(
+                    f"Ignoring compiled model {stem}: {stale}. "
+                    "Re-run `python -m scripts.export_model`; trying registry/pickle."
+                )
+                return None, None
+            return scorer, stem + ENCODING_SUFFIX
+    return None, None
+
+
 def _load_from_registry():
     """Try MLflow Model Registry first. Returns (pipeline, source_str) or (None, None)."""
     if not os.path.exists("mlflow.db"):
@@ -66,23 +223,40 @@ def _load_from_registry():
 
 def _load_from_pickle():
     """Fallback: load from a local .pkl file."""
+    import joblib
+
     for p in LOCAL_PKL_CANDIDATES:
         if os.path.exists(p):
             return joblib.load(p), p
     return None, None
 
 
-# Try registry first, then pickle
-lgbm_pipeline, _model_source = _load_from_registry()
-if lgbm_pipeline is None:
-    lgbm_pipeline, _model_source = _load_from_pickle()
+# Compiled artifact first, then registry, then pickle.
+# _fast_scorer is the pandas-free path (src/models/fast_scorer.py); with a
+# pickled/registry pipeline it is derived from the fitted preprocessor, and if
+# the pipeline has a layout it can't mirror we stay on the sklearn path.
+lgbm_pipeline = None
+_fast_scorer, _model_source = _load_compiled()
+if _fast_scorer is None:
+    lgbm_pipeline, _model_source = _load_from_registry()
+    if lgbm_pipeline is None:
+        lgbm_pipeline, _model_source = _load_from_pickle()
 
-if lgbm_pipeline is not None:
+if _fast_scorer is not None or lgbm_pipeline is not None:
     model_loaded = True
-    print(f"✅ LightGBM pipeline loaded from: {_model_source}")
+    print(f"✅ LightGBM model loaded from: {_model_source}")
 else:
     model_loaded = False
-    print("❌ LightGBM model not found in registry or pickle — /predict will return 503")
+    print("❌ LightGBM model not found (compiled, registry or pickle) — /predict will return 503")
+
+if lgbm_pipeline is not None:
+    try:
+        from src.models.fast_scorer import FastScorer
+
+        _fast_scorer = FastScorer.from_pipeline(lgbm_pipeline)
+        print("⚡ Fast-path scorer enabled")
+    except Exception as e:
+        logger.warning(f"Fast-path scorer unavailable ({e}); using sklearn pipeline.")
 
 
 # ---------------------------------------------------------------------------
@@ -114,6 +288,9 @@ class PredictionRequest(BaseModel):
 class ExplainRequest(BaseModel):
     features: dict = Field(..., description="Same keys as /predict body")
     prediction: int = Field(..., ge=0, le=1, description="1=good, 0=bad credit")
+    deadline_ms: Optional[int] = Field(
+        None, ge=100, description="Latency budget; the text is cut at a sentence end past it"
+    )
 
 
 class AskPolicyRequest(BaseModel):
@@ -121,80 +298,396 @@ class AskPolicyRequest(BaseModel):
     k: int = Field(4, ge=1, le=10, description="Number of chunks to retrieve")
 
 
+class AskPolicyBatchRequest(BaseModel):
+    questions: list[str] = Field(..., min_length=1, description="Questions about banking policy")
+    k: int = Field(4, ge=1, le=10, description="Number of chunks to retrieve per question")
+
+
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
-def _run_lgbm(req: PredictionRequest):
+def _score_rows(rows: list) -> list:
+    """
+    Score already-validated row dicts; one (prediction, probabilities) tuple per row.
+    One predict_proba pass, through the fast path when available. The class is
+    taken as the argmax of the probabilities (exactly what LGBMClassifier.predict
+    does internally), so the preprocessor and booster only run once per row.
+    """
+    if _fast_scorer is not None:
+        proba = _fast_scorer.predict_proba(rows)
+        classes = _fast_scorer.classes_
+    else:
+        import pandas as pd
+
+        proba = lgbm_pipeline.predict_proba(pd.DataFrame(rows))
+        classes = lgbm_pipeline.classes_
+    preds = classes[proba.argmax(axis=1)]
+    return [(int(pred), p) for pred, p in zip(preds, proba.tolist())]
+
+
+_batcher = None
+if MICROBATCH and model_loaded:
+    from src.service.batching import MicroBatcher
+
+    _batcher = MicroBatcher(
+        _score_rows,
+        window_ms=MICROBATCH_WINDOW_MS,
+        max_rows=MICROBATCH_MAX_ROWS,
+        max_queue=MICROBATCH_MAX_QUEUE,
+    )
+    print(f"⏱️  Micro-batching on: window={MICROBATCH_WINDOW_MS}ms max_rows={MICROBATCH_MAX_ROWS}")
+
+
+async def _run_lgbm(req: PredictionRequest):
     if not model_loaded:
         raise HTTPException(status_code=503, detail="Model not loaded")
     try:
-        df = pd.DataFrame([req.model_dump()])
-        pred = int(lgbm_pipeline.predict(df)[0])
-        proba = lgbm_pipeline.predict_proba(df)[0].tolist()
-        return pred, proba
+        if _batcher is not None:
+            return await asyncio.wrap_future(_batcher.submit(req.model_dump()))
+        return (await _scoring.run(_score_rows, [req.model_dump()]))[0]
+    except Overloaded:
+        raise
     except Exception as e:
         logger.error(f"Prediction error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _run_lgbm_batch(rows: list) -> dict:
+    """
+    Validate each row on its own, then score every valid row in one vectorized
+    pass. Invalid rows get an error entry instead of failing the batch; results
+    come back in input order.
+    """
+    if not model_loaded:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    if len(rows) > MAX_BATCH_ROWS:
+        raise HTTPException(
+            status_code=413, detail=f"Batch has {len(rows)} rows; limit is {MAX_BATCH_ROWS}"
+        )
+
+    results: list[Optional[dict]] = [None] * len(rows)
+    valid_idx, valid = [], []
+    for i, row in enumerate(rows):
+        try:
+            valid.append(PredictionRequest.model_validate(row))
+            valid_idx.append(i)
+        except ValidationError as e:
+            errors = e.errors(include_url=False, include_context=False, include_input=False)
+            results[i] = {"index": i, "error": errors}
+
+    if valid:
+        try:
+            scored = _score_rows([r.model_dump() for r in valid])
+        except Exception as e:
+            logger.error(f"Batch prediction error: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+        for i, (pred, p) in zip(valid_idx, scored):
+            results[i] = {"index": i, "prediction": pred, "probabilities": p}
+
+    return {
+        "n_rows": len(rows),
+        "n_scored": len(valid),
+        "n_failed": len(rows) - len(valid),
+        "results": results,
+    }
+
+
+def _read_upload(file: UploadFile) -> list:
+    """Parse a CSV or Parquet upload into plain-Python row dicts (NaN -> None)."""
+    import pandas as pd
+
+    raw = file.file.read()
+    name = (file.filename or "").lower()
+    try:
+        if name.endswith(".parquet") or file.content_type == "application/vnd.apache.parquet":
+            df = pd.read_parquet(io.BytesIO(raw))
+        else:
+            df = pd.read_csv(io.BytesIO(raw))
+    except ImportError as e:
+        raise HTTPException(status_code=415, detail=f"Parquet support not installed: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse upload: {e}")
+    # A JSON round trip turns numpy scalars into Python types and NaN into None,
+    # so missing cells surface as per-row validation errors.
+    return json.loads(df.to_json(orient="records"))
+
+
 # ---------------------------------------------------------------------------
 # Endpoints
 # ---------------------------------------------------------------------------
 @app.get("/health")
-def health():
-    return {"status": "ok", "model_loaded": model_loaded}
+async def health():
+    from src.models.lora_infer import pool_health
+
+    return {
+        "status": "ok",
+        "model_loaded": model_loaded,
+        "model_source": _model_source,
+        "explainer": pool_health(),
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    from src.models.lora_infer import cache_stats
+    from src.rag.context import context_stats
+    from src.rag.generation import generation_stats
+    from src.rag.query_cache import query_cache_stats
+    from src.rag.semantic_cache import semantic_cache_stats
+
+    return {
+        "microbatch": _batcher.stats() if _batcher is not None else {"enabled": False},
+        "executors": {ex.name: ex.stats() for ex in (_scoring, _explain, _rag)},
+        "explanation_cache": cache_stats(),
+        "explanation_jobs": _jobs.stats(),
+        "rag_cache": query_cache_stats(),
+        "rag_semantic_cache": semantic_cache_stats(),
+        "rag_generation": generation_stats(),
+        "rag_context": context_stats(),
+    }
 
 
 @app.post("/predict")
-def predict(req: PredictionRequest):
-    pred, proba = _run_lgbm(req)
+async def predict(req: PredictionRequest):
+    pred, proba = await _run_lgbm(req)
     logger.info(f"predict | pred={pred} proba={proba}")
     return {"prediction": pred, "probabilities": proba}
 
 
+@app.post("/predict_batch")
+async def predict_batch(rows: list[dict] = Body(..., min_length=1)):
+    """
+    Score a list of applications (same fields as /predict) in one vectorized pass.
+    Rows that fail validation are reported individually and don't fail the batch.
+    """
+    result = await _scoring.run(_run_lgbm_batch, rows)
+    logger.info(f"predict_batch | n={result['n_rows']} failed={result['n_failed']}")
+    return result
+
+
+@app.post("/predict_batch/upload")
+async def predict_batch_upload(file: UploadFile = File(...)):
+    """Same as /predict_batch, reading rows from a CSV or Parquet upload. Extra columns are ignored."""
+    result = await _scoring.run(lambda: _run_lgbm_batch(_read_upload(file)))
+    logger.info(
+        f"predict_batch_upload | file={file.filename} n={result['n_rows']} "
+        f"failed={result['n_failed']}"
+    )
+    return result
+
+
+_DEADLINE_QUERY = Query(None, ge=100, description="Explanation latency budget in ms")
+
+
+def _deadline_at(deadline_ms: Optional[int]) -> Optional[float]:
+    """Unix time the explanation budget runs out, counted from now (the request's arrival)."""
+    ms = deadline_ms if deadline_ms is not None else EXPLAIN_DEADLINE_MS
+    return time.time() + ms / 1000.0 if ms > 0 else None
+
+
 @app.post("/explain")
-def explain(req: ExplainRequest):
+async def explain(req: ExplainRequest):
     """
     Generate a plain-English explanation for a credit decision.
     Pass the same feature dict you'd send to /predict, plus the prediction (0 or 1).
-    Note: First call downloads/loads the model (~30s). Subsequent calls are faster.
+    Note: First call downloads/loads the model (~30s) unless FINRISK_EXPLAINER_WARM=1.
+    Subsequent calls reuse the resident worker and skip the load.
     """
+    deadline_at = _deadline_at(req.deadline_ms)
     try:
         from src.models.lora_infer import generate_explanation
 
-        explanation = generate_explanation(req.features, req.prediction)
+        explanation = await _explain.run(
+            generate_explanation, req.features, req.prediction, deadline_at=deadline_at
+        )
         logger.info(f"explain | pred={req.prediction} | explanation={explanation[:80]}")
         return {"explanation": explanation, "prediction": req.prediction}
+    except Overloaded:
+        raise
     except Exception as e:
         logger.error(f"Explain error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/explain_batch")
+async def explain_batch(items: list[ExplainRequest] = Body(..., min_length=1)):
+    """
+    Explanations for a list of {features, prediction} items, in input order.
+    The explainer left-pads the prompts and generates several per forward pass
+    (batch size adapts to FINRISK_EXPLAINER_BATCH_MEMORY_MB), which is much
+    faster on CPU than calling /explain once per item.
+    """
+    if len(items) > MAX_EXPLAIN_BATCH:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch has {len(items)} items; limit is {MAX_EXPLAIN_BATCH}",
+        )
+    try:
+        from src.models.lora_infer import generate_explanations
+
+        pairs = [(item.features, item.prediction) for item in items]
+        explanations = await _explain.run(generate_explanations, pairs)
+    except Overloaded:
+        raise
+    except Exception as e:
+        logger.error(f"Explain batch error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    logger.info(f"explain_batch | items={len(items)}")
+    return {
+        "n_items": len(items),
+        "results": [
+            {"index": i, "prediction": item.prediction, "explanation": text}
+            for i, (item, text) in enumerate(zip(items, explanations))
+        ],
+    }
+
+
+def _tiered(features: dict, pred: int, proba: list, deadline_at: Optional[float]) -> dict:
+    """Cached LLM text if there is one; otherwise tier 0 now and the LLM in the background."""
+    from src.models.lora_infer import cached_explanation, generate_explanation
+    from src.training.make_explanations import template_explanation
+
+    cached = cached_explanation(features, pred)
+    if cached is not None:
+        return {"prediction": pred, "probabilities": proba, "explanation": cached, "tier": 1}
+    try:
+        job_id = _jobs.submit(generate_explanation, features, pred, deadline_at=deadline_at)
+    except Overloaded:
+        job_id = None  # no room even to queue the upgrade; tier 0 is the answer
+    return {
+        "prediction": pred,
+        "probabilities": proba,
+        "explanation": template_explanation(features, pred),
+        "tier": 0,
+        "explanation_id": job_id,
+    }
+
+
 @app.post("/predict_and_explain")
-def predict_and_explain(req: PredictionRequest):
+async def predict_and_explain(req: PredictionRequest, deadline_ms: Optional[int] = _DEADLINE_QUERY):
     """
     Convenience endpoint: run LightGBM prediction then generate explanation.
     Returns score + probabilities + plain-English reasoning in one call.
+
+    `tier` says which explanation came back: 1 = TinyLlama, 0 = the rule-based
+    template it was fine-tuned on. Tier 0 is returned instantly when the
+    explainer is saturated (FINRISK_EXPLAIN_MODE=auto) or always (=tiered);
+    the LLM text is then generated in the background and can be fetched from
+    GET /explanations/{explanation_id}. If the explanation fails, the score is
+    still returned with the tier-0 text.
     """
-    pred, proba = _run_lgbm(req)
+    deadline_at = _deadline_at(deadline_ms)
+    pred, proba = await _run_lgbm(req)
+    features = req.model_dump()
+    if EXPLAIN_MODE == "tiered" or (EXPLAIN_MODE == "auto" and _explain.busy()):
+        body = _tiered(features, pred, proba, deadline_at)
+        logger.info(f"predict_and_explain | pred={pred} | tier={body['tier']}")
+        return body
+
+    tier = 1
     try:
         from src.models.lora_infer import generate_explanation
 
-        explanation = generate_explanation(req.model_dump(), pred)
+        explanation = await _explain.run(
+            generate_explanation, features, pred, deadline_at=deadline_at
+        )
     except Exception as e:
-        logger.warning(f"Explanation failed, returning score only: {e}")
-        explanation = "Explanation unavailable."
+        from src.training.make_explanations import template_explanation
+
+        logger.warning(f"Explanation failed, returning score with tier-0 text: {e}")
+        explanation, tier = template_explanation(features, pred), 0
 
     logger.info(f"predict_and_explain | pred={pred} | explanation={explanation[:80]}")
     return {
         "prediction": pred,
         "probabilities": proba,
         "explanation": explanation,
+        "tier": tier,
     }
 
 
+@app.get("/explanations/{explanation_id}")
+async def get_explanation(explanation_id: str):
+    """
+    Status of a background explanation started by tiered /predict_and_explain:
+    "pending", "done" (with the tier-1 `explanation`) or "failed".
+    Results are kept for FINRISK_EXPLAIN_JOB_TTL_S seconds.
+    """
+    job = _jobs.get(explanation_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired explanation id")
+    return job
+
+
+@app.post("/predict_and_explain/stream")
+async def predict_and_explain_stream(
+    req: PredictionRequest, deadline_ms: Optional[int] = _DEADLINE_QUERY
+):
+    """
+    Streaming variant of /predict_and_explain, as newline-delimited JSON events:
+      {"event": "prediction", "prediction": ..., "probabilities": [...]}
+      {"event": "token", "text": "..."}              (zero or more)
+      {"event": "explanation", "explanation": "..."} (always last)
+    The score goes out as soon as LightGBM is done, so clients can render it
+    while the explainer is still generating. The final event carries the
+    cleaned-up text, which replaces whatever was assembled from tokens.
+    """
+    deadline_at = _deadline_at(deadline_ms)
+    pred, proba = await _run_lgbm(req)
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    closed = threading.Event()
+
+    def emit(event: Optional[dict]):
+        loop.call_soon_threadsafe(events.put_nowait, event)
+
+    def explain():
+        from src.models.lora_infer import ExplanationAbandoned, generate_explanation
+
+        def on_token(text: str):
+            if closed.is_set():  # client went away; stop waiting on the worker
+                raise ExplanationAbandoned("client disconnected")
+            emit({"event": "token", "text": text})
+
+        if closed.is_set():
+            return
+        try:
+            explanation = generate_explanation(
+                req.model_dump(), pred, on_token=on_token, deadline_at=deadline_at
+            )
+        except ExplanationAbandoned:
+            logger.info(f"predict_and_explain/stream | pred={pred} | client disconnected")
+            return
+        except Exception as e:
+            logger.warning(f"Streamed explanation failed, score already sent: {e}")
+            explanation = "Explanation unavailable."
+        emit({"event": "explanation", "explanation": explanation})
+        emit(None)
+
+    async def body():
+        try:
+            yield json.dumps(
+                {"event": "prediction", "prediction": pred, "probabilities": proba}
+            ) + "\n"
+            try:
+                _explain.submit(explain)
+            except Overloaded as e:
+                logger.warning(f"Explanation skipped, score already sent: {e}")
+                unavailable = {"event": "explanation", "explanation": "Explanation unavailable."}
+                yield json.dumps(unavailable) + "\n"
+                return
+            while (event := await events.get()) is not None:
+                yield json.dumps(event) + "\n"
+            logger.info(f"predict_and_explain/stream | pred={pred}")
+        finally:
+            closed.set()
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+
 @app.post("/ask_policy")
-def ask_policy(req: AskPolicyRequest):
+async def ask_policy(req: AskPolicyRequest):
     """
     Answer banking policy questions using retrieval-augmented generation
     over Basel + FATF source documents. Returns a grounded answer with
@@ -203,12 +696,126 @@ def ask_policy(req: AskPolicyRequest):
     try:
         from src.rag.qa import answer_question
 
-        result = answer_question(req.question, k=req.k)
+        result = await _rag.run(answer_question, req.question, k=req.k)
         logger.info(f"ask_policy | q={req.question[:60]!r} | n_sources={len(result['sources'])}")
         return result
     except FileNotFoundError as e:
         logger.error(f"RAG index missing: {e}")
         raise HTTPException(status_code=503, detail=str(e))
+    except Overloaded:
+        raise
     except Exception as e:
         logger.error(f"ask_policy error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/ask_policy/stream")
+async def ask_policy_stream(req: AskPolicyRequest):
+    """
+    Streaming variant of /ask_policy, as newline-delimited JSON events:
+      {"event": "sources", "sources": [...], "model": ...}
+      {"event": "token", "text": "..."}  (zero or more)
+      {"event": "done", "answer": ..., "usage": {...}, "latency_ms": {...}}  (always last)
+    Retrieval runs before the response starts, so a missing index is still a
+    503; a generation failure after that ends the stream with
+    {"event": "error", "detail": ...}.
+    """
+    from src.rag.qa import stream_answer
+
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    closed = threading.Event()
+
+    def emit(event):
+        loop.call_soon_threadsafe(events.put_nowait, event)
+
+    def produce():
+        answer = stream_answer(req.question, k=req.k)
+        try:
+            for event in answer:
+                if closed.is_set():  # client went away; stop paying for tokens
+                    break
+                emit(event)
+        except Exception as e:
+            emit(e)
+        finally:
+            answer.close()
+            emit(None)
+
+    _rag.submit(produce)
+    first = await events.get()
+    if isinstance(first, FileNotFoundError):
+        logger.error(f"RAG index missing: {first}")
+        raise HTTPException(status_code=503, detail=str(first))
+    if isinstance(first, Exception):
+        logger.error(f"ask_policy/stream error: {first}")
+        raise HTTPException(status_code=500, detail=str(first))
+
+    async def body():
+        event = first
+        try:
+            while event is not None:
+                if isinstance(event, Exception):
+                    logger.error(f"ask_policy/stream error: {event}")
+                    yield json.dumps({"event": "error", "detail": str(event)}) + "\n"
+                else:
+                    yield json.dumps(event) + "\n"
+                    if event["event"] == "done":
+                        logger.info(
+                            f"ask_policy/stream | q={req.question[:60]!r} "
+                            f"| cached={event.get('cached')} | latency_ms={event['latency_ms']}"
+                        )
+                event = await events.get()
+        finally:
+            closed.set()
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+
+@app.post("/ask_policy_batch")
+async def ask_policy_batch(req: AskPolicyBatchRequest):
+    """
+    Answers for a list of policy questions, in input order. Retrieval is one
+    embedding call and one index search for the whole list; generation runs up
+    to FINRISK_RAG_BATCH_CONCURRENCY requests at a time and backs off together
+    on rate limits. Questions that are too short or whose generation fails get
+    an error entry instead of failing the batch.
+    """
+    if len(req.questions) > MAX_POLICY_BATCH:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch has {len(req.questions)} questions; limit is {MAX_POLICY_BATCH}",
+        )
+    results: list[Optional[dict]] = [None] * len(req.questions)
+    valid_idx, valid = [], []
+    for i, question in enumerate(req.questions):
+        if len(question.strip()) < 3:
+            results[i] = {"index": i, "question": question, "error": "Question is too short"}
+        else:
+            valid_idx.append(i)
+            valid.append(question.strip())
+
+    if valid:
+        try:
+            from src.rag.qa import answer_questions
+
+            answers = await _rag.run(answer_questions, valid, k=req.k)
+        except FileNotFoundError as e:
+            logger.error(f"RAG index missing: {e}")
+            raise HTTPException(status_code=503, detail=str(e))
+        except Overloaded:
+            raise
+        except Exception as e:
+            logger.error(f"ask_policy_batch error: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+        for i, answer in zip(valid_idx, answers):
+            results[i] = {"index": i, "question": req.questions[i], **answer}
+
+    n_failed = sum("error" in r for r in results)
+    logger.info(f"ask_policy_batch | n={len(results)} failed={n_failed}")
+    return {
+        "n_questions": len(results),
+        "n_answered": len(results) - n_failed,
+        "n_failed": n_failed,
+        "results": results,
+    }
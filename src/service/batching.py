@@ -0,0 +1,140 @@
+"""
+src/service/batching.py
+
+Dynamic micro-batching for concurrent scoring traffic.
+
+Requests are queued and a single background thread drains them in batches:
+it waits for the first row, keeps collecting until the window closes or the
+batch is full, scores everything in one call, and fans the results back out
+to the waiting callers through futures. Batch size and queue wait are
+recorded so the window can be tuned against p99 latency (see /metrics).
+"""
+
+import collections
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable
+
+from src.service.executors import Overloaded
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+def _percentile(sorted_vals: list, pct: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    idx = min(len(sorted_vals) - 1, int(round(pct / 100 * (len(sorted_vals) - 1))))
+    return sorted_vals[idx]
+
+
+class MicroBatcher:
+    """
+    Collect rows arriving within `window_ms` (or until `max_rows`) and score
+    them together. `score_fn` takes a list of rows and returns one result per
+    row, in order. At most `max_queue` rows may wait; beyond that submit()
+    raises Overloaded rather than letting the queue grow without bound.
+    """
+
+    def __init__(
+        self,
+        score_fn: Callable[[list], list],
+        window_ms: float = 2.0,
+        max_rows: int = 64,
+        max_queue: int = 1024,
+    ):
+        self.score_fn = score_fn
+        self.window_s = window_ms / 1000.0
+        self.max_rows = max(1, max_rows)
+        self.max_queue = max(1, max_queue)
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._rows = 0
+        self._rejected = 0
+        self._size_hist = collections.Counter()
+        self._waits_ms: collections.deque = collections.deque(maxlen=2048)
+        self._thread = threading.Thread(target=self._loop, name="microbatcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, row) -> Future:
+        if self._queue.qsize() >= self.max_queue:
+            with self._lock:
+                self._rejected += 1
+            raise Overloaded("scoring", retry_after=1)
+        fut: Future = Future()
+        self._queue.put((row, fut, time.monotonic()))
+        return fut
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join(timeout=5)
+
+    def _loop(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.window_s
+            while len(batch) < self.max_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._run(batch)
+
+    def _run(self, batch: list):
+        started = time.monotonic()
+        rows = [row for row, _, _ in batch]
+        try:
+            results = self.score_fn(rows)
+        except Exception as e:
+            logger.error(f"Micro-batch of {len(rows)} failed: {e}")
+            for _, fut, _ in batch:
+                fut.set_exception(e)
+        else:
+            for (_, fut, _), result in zip(batch, results):
+                fut.set_result(result)
+
+        with self._lock:
+            self._batches += 1
+            self._rows += len(batch)
+            bucket = next((b for b in _SIZE_BUCKETS if len(batch) <= b), None)
+            self._size_hist[f"<={bucket}" if bucket else f">{_SIZE_BUCKETS[-1]}"] += 1
+            for _, _, enqueued in batch:
+                self._waits_ms.append((started - enqueued) * 1000.0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            waits = sorted(self._waits_ms)
+            return {
+                "enabled": True,
+                "window_ms": self.window_s * 1000.0,
+                "max_rows": self.max_rows,
+                "batches": self._batches,
+                "rows": self._rows,
+                "mean_batch_size": (self._rows / self._batches) if self._batches else 0.0,
+                "batch_size_histogram": dict(self._size_hist),
+                "queue_wait_ms": {
+                    "p50": _percentile(waits, 50),
+                    "p95": _percentile(waits, 95),
+                    "p99": _percentile(waits, 99),
+                    "max": waits[-1] if waits else 0.0,
+                },
+                "queue_depth": self._queue.qsize(),
+                "rejected": self._rejected,
+            }
@@ -0,0 +1,100 @@
+"""
+src/service/executors.py
+
+Bounded thread-pool executors, one per workload class (scoring, explanation,
+RAG). Endpoints are async and hand their blocking work to the executor for
+their class, so a burst of slow /explain calls can only exhaust the explain
+pool, never Starlette's shared threadpool that /predict also needs.
+
+Each executor admits at most `max_workers` running + `max_queue` waiting
+jobs. Anything beyond that is rejected immediately with `Overloaded`, which
+the app turns into a 503 with a Retry-After header.
+
+Config (environment), per class NAME in {SCORING, EXPLAIN, RAG}:
+    FINRISK_<NAME>_CONCURRENCY   worker threads
+    FINRISK_<NAME>_QUEUE         jobs allowed to wait for a thread
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Overloaded(Exception):
+    """A workload class is at its concurrency + queue limit."""
+
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(f"{name} capacity exhausted; retry in {retry_after}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class BoundedExecutor:
+    def __init__(self, name: str, max_workers: int, max_queue: int, retry_after: int = 1):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.retry_after = retry_after
+        self._pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix=f"finrisk-{name}")
+        self._lock = threading.Lock()
+        self._inflight = 0
+        self._completed = 0
+        self._rejected = 0
+
+    def _admit(self):
+        with self._lock:
+            if self._inflight >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise Overloaded(self.name, self.retry_after)
+            self._inflight += 1
+
+    def _release(self, future=None):
+        with self._lock:
+            self._inflight -= 1
+            if future is not None:
+                self._completed += 1
+
+    def submit(self, fn, *args, **kwargs):
+        """Admit and submit; returns a concurrent.futures.Future or raises Overloaded."""
+        self._admit()
+        try:
+            fut = self._pool.submit(fn, *args, **kwargs)
+        except Exception:
+            self._release()
+            raise
+        # Released when the job really finishes, not when the awaiting request
+        # goes away — an abandoned job still occupies its thread.
+        fut.add_done_callback(self._release)
+        return fut
+
+    def busy(self) -> bool:
+        """Every thread is taken, so a new job would have to wait in the queue."""
+        with self._lock:
+            return self._inflight >= self.max_workers
+
+    async def run(self, fn, *args, **kwargs):
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "inflight": self._inflight,
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def from_env(name: str, workers: int, queue: int, retry_after: int) -> BoundedExecutor:
+    key = name.upper()
+    return BoundedExecutor(
+        name,
+        max_workers=int(os.getenv(f"FINRISK_{key}_CONCURRENCY", str(workers))),
+        max_queue=int(os.getenv(f"FINRISK_{key}_QUEUE", str(queue))),
+        retry_after=retry_after,
+    )
@@ -0,0 +1,112 @@
+"""
+src/service/explanation_jobs.py
+
+Background explanation upgrades for tiered /predict_and_explain.
+
+The endpoint answers immediately with the rule-based (tier 0) explanation and
+hands the LLM (tier 1) generation to the explain executor as a job. Clients
+poll GET /explanations/{id} for the upgrade. Finished jobs are kept for
+`ttl_s` seconds after they finish, and at most `max_jobs` are remembered: past
+the cap the longest-finished go first. Pending jobs are never dropped; when
+the cap is all pending jobs, submit() raises Overloaded and the caller keeps
+the tier-0 text.
+"""
+
+import collections
+import logging
+import threading
+import time
+import uuid
+from typing import Optional
+
+from src.service.executors import BoundedExecutor, Overloaded
+
+logger = logging.getLogger(__name__)
+
+
+class ExplanationJobs:
+    def __init__(self, executor: BoundedExecutor, ttl_s: float = 600.0, max_jobs: int = 1000):
+        self.executor = executor
+        self.ttl_s = ttl_s
+        self.max_jobs = max(1, max_jobs)
+        self._jobs: collections.OrderedDict = collections.OrderedDict()
+        self._finished: collections.OrderedDict = collections.OrderedDict()  # id -> finish time
+        self._lock = threading.Lock()
+        self._submitted = 0
+        self._done = 0
+        self._failed = 0
+        self._rejected = 0
+
+    def submit(self, fn, *args, **kwargs) -> str:
+        """
+        Queue `fn(*args, **kwargs)` -> explanation text. Raises Overloaded if the
+        executor is full or `max_jobs` jobs are still pending.
+        """
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._evict(time.monotonic(), room=1)
+            if len(self._jobs) >= self.max_jobs:
+                self._rejected += 1
+                raise Overloaded("explanation jobs", self.executor.retry_after)
+            self._jobs[job_id] = {"status": "pending", "created": time.monotonic()}
+        try:
+            fut = self.executor.submit(fn, *args, **kwargs)
+        except Exception:
+            with self._lock:
+                self._jobs.pop(job_id, None)
+            raise
+        with self._lock:
+            self._submitted += 1
+        fut.add_done_callback(lambda f: self._finish(job_id, f))
+        return job_id
+
+    def _finish(self, job_id: str, fut):
+        try:
+            update = {"status": "done", "explanation": fut.result()}
+        except Exception as e:
+            logger.warning(f"Background explanation {job_id} failed: {e}")
+            update = {"status": "failed", "error": str(e)}
+        with self._lock:
+            if update["status"] == "done":
+                self._done += 1
+            else:
+                self._failed += 1
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(update, finished=time.monotonic())
+                self._finished[job_id] = job["finished"]
+
+    def _evict(self, now: float, room: int = 0):
+        """Drop expired finished jobs, then the oldest finished ones until `room` is left under the cap."""
+        limit = self.max_jobs - room
+        while self._finished:
+            oldest_id, finished = next(iter(self._finished.items()))
+            if now - finished <= self.ttl_s and len(self._jobs) <= limit:
+                break
+            self._finished.pop(oldest_id)
+            self._jobs.pop(oldest_id)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            self._evict(time.monotonic())
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            result = {"id": job_id, "status": job["status"]}
+            if job["status"] == "done":
+                result.update(tier=1, explanation=job["explanation"])
+            elif job["status"] == "failed":
+                result["error"] = job["error"]
+            return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = sum(1 for job in self._jobs.values() if job["status"] == "pending")
+            return {
+                "submitted": self._submitted,
+                "done": self._done,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "pending": pending,
+                "retained": len(self._jobs),
+            }
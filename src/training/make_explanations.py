@@ -1,17 +1,17 @@
 import json
 
-import pandas as pd
+# German Credit codes behind each rule. The API receives these codes; the
+# interim training CSV holds decoded labels, so there only the numeric rules fire.
+LOW_SAVINGS = ("A65", "A61")
+SHORT_EMPLOYMENT = ("A71", "A72")
 
-# Load the cleaned German dataset
-df = pd.read_csv("data/interim/german_credit.csv")
 
-
-# Function to generate a simple rule-based explanation
-def generate_explanation(row):
+def explanation_reasons(row) -> list:
+    """Rule-based reasons for one applicant (a dict or a DataFrame row)."""
     reasons = []
-    if row["savings"] in ["A65", "A61"]:  # low savings
+    if row["savings"] in LOW_SAVINGS:  # low savings
         reasons.append("low savings")
-    if row["employment_duration"] in ["A71", "A72"]:  # short employment
+    if row["employment_duration"] in SHORT_EMPLOYMENT:  # short employment
         reasons.append("short employment duration")
     if row["amount"] > 5000:
         reasons.append("high loan amount")
@@ -20,24 +20,40 @@ def generate_explanation(row):
 
     if not reasons:
         reasons.append("stable financial profile")
+    return reasons
+
+
+def template_explanation(row, prediction: int) -> str:
+    """The sentence the explainer was fine-tuned to imitate. 1 = good/approved."""
+    decision = "approved" if prediction == 1 else "denied"
+    return f"Application {decision} due to " + ", ".join(explanation_reasons(row)) + "."
+
 
+# Function to generate a simple rule-based explanation
+def generate_explanation(row):
     label = "good" if row["credit_risk"] == 1 else "bad"
-    explanation = (
-        f"Application {'denied' if label=='bad' else 'approved'} due to " + ", ".join(reasons) + "."
-    )
+    return label, template_explanation(row, row["credit_risk"])
+
+
+def main():
+    import pandas as pd
+
+    # Load the cleaned German dataset
+    df = pd.read_csv("data/interim/german_credit.csv")
 
-    return label, explanation
+    # Generate JSONL
+    with open("data/explanations/german_credit_explanations.jsonl", "w") as f:
+        for _, row in df.iterrows():
+            label, explanation = generate_explanation(row)
+            record = {
+                "input": f"status={row['status']}, duration={row['duration']}, savings={row['savings']}, employment={row['employment_duration']}, amount={row['amount']}, age={row['age']}",
+                "label": label,
+                "explanation": explanation,
+            }
+            f.write(json.dumps(record) + "\n")
 
+    print("Dataset saved to data/explanations/german_credit_explanations.jsonl")
 
-# Generate JSONL
-with open("data/explanations/german_credit_explanations.jsonl", "w") as f:
-    for _, row in df.iterrows():
-        label, explanation = generate_explanation(row)
-        record = {
-            "input": f"status={row['status']}, duration={row['duration']}, savings={row['savings']}, employment={row['employment_duration']}, amount={row['amount']}, age={row['age']}",
-            "label": label,
-            "explanation": explanation,
-        }
-        f.write(json.dumps(record) + "\n")
 
-print("Dataset saved to data/explanations/german_credit_explanations.jsonl")
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import json
 import os
 
 import requests
@@ -210,24 +211,40 @@ with tab_explain:
 with tab_combined:
     st.subheader("Score + explanation")
     st.caption(
-        "Calls `/predict_and_explain`. The LLM runs on CPU, so expect ~10–40s. "
+        "Calls `/predict_and_explain/stream`: the score shows up right away and the "
+        "explanation streams in as the LLM writes it (~10–40s on CPU). "
         "The first ever call also downloads the model weights and may take several minutes."
     )
     features = application_form("comb")
     if st.button("Score and explain", key="comb_btn", type="primary"):
         try:
-            with st.spinner("Scoring, then generating explanation..."):
-                r = requests.post(f"{API_URL}/predict_and_explain", json=features, timeout=600)
+            r = requests.post(
+                f"{API_URL}/predict_and_explain/stream",
+                json=features,
+                stream=True,
+                timeout=600,
+            )
             r.raise_for_status()
-            data = r.json()
-            pred, proba = data["prediction"], data["probabilities"]
-
-            c1, c2 = st.columns(2)
-            c1.metric("Decision", CLASS_LABELS.get(pred, pred))
-            c2.metric("Confidence", f"{max(proba):.1%}")
-
-            st.markdown("**Explanation**")
-            st.info(data.get("explanation", "(no explanation returned)"))
+            data, text, placeholder = {}, "", None
+            with st.spinner("Scoring, then generating explanation..."):
+                for line in r.iter_lines():
+                    if not line:
+                        continue
+                    event = json.loads(line)
+                    if event["event"] == "prediction":
+                        pred, proba = event["prediction"], event["probabilities"]
+                        data.update(prediction=pred, probabilities=proba)
+                        c1, c2 = st.columns(2)
+                        c1.metric("Decision", CLASS_LABELS.get(pred, pred))
+                        c2.metric("Confidence", f"{max(proba):.1%}")
+                        st.markdown("**Explanation**")
+                        placeholder = st.empty()
+                    elif event["event"] == "token":
+                        text += event["text"]
+                        placeholder.info(text + " ▌")
+                    elif event["event"] == "explanation":
+                        data["explanation"] = event["explanation"]
+                        placeholder.info(event["explanation"])
 
             with st.expander("Raw response"):
                 st.json(data)
@@ -241,7 +258,8 @@ with tab_policy:
     st.caption(
         "Retrieval-augmented answers grounded in Basel and FATF source documents. "
         "Answers cite passages inline as [1], [2]; out-of-scope questions are refused "
-        "rather than answered from the model's own knowledge."
+        "rather than answered from the model's own knowledge. Calls `/ask_policy/stream`: "
+        "the sources appear as soon as retrieval is done and the answer streams in."
     )
 
     EXAMPLES = [
@@ -268,37 +286,50 @@ with tab_policy:
             st.warning("Please enter a question of at least 3 characters.")
         else:
             try:
-                with st.spinner("Retrieving passages and generating a grounded answer..."):
-                    r = requests.post(
-                        f"{API_URL}/ask_policy",
-                        json={"question": question.strip(), "k": k},
-                        timeout=120,
-                    )
+                r = requests.post(
+                    f"{API_URL}/ask_policy/stream",
+                    json={"question": question.strip(), "k": k},
+                    stream=True,
+                    timeout=120,
+                )
                 r.raise_for_status()
-                data = r.json()
-
-                st.markdown("**Answer**")
-                st.info(data.get("answer", "(no answer returned)"))
-
-                sources = data.get("sources", [])
-                if sources:
-                    st.markdown("**Sources**")
-                    st.dataframe(
-                        [
-                            {
-                                "#": s["rank"],
-                                "Document": s["source"],
-                                "Chunk": s["chunk_id"],
-                                "Similarity": round(s["score"], 3),
-                            }
-                            for s in sources
-                        ],
-                        hide_index=True,
-                        use_container_width=True,
-                    )
-                    st.caption(f"Generated by `{data.get('model', 'unknown')}`")
-                else:
-                    st.caption("No passages retrieved.")
+                data, text, placeholder = {}, "", None
+                with st.spinner("Retrieving passages and generating a grounded answer..."):
+                    for line in r.iter_lines():
+                        if not line:
+                            continue
+                        event = json.loads(line)
+                        if event["event"] == "sources":
+                            data.update(sources=event["sources"], model=event["model"])
+                            st.markdown("**Answer**")
+                            placeholder = st.empty()
+                            sources = event["sources"]
+                            if sources:
+                                st.markdown("**Sources**")
+                                st.dataframe(
+                                    [
+                                        {
+                                            "#": s["rank"],
+                                            "Document": s["source"],
+                                            "Chunk": s["chunk_id"],
+                                            "Score": round(s["score"], 3),
+                                        }
+                                        for s in sources
+                                    ],
+                                    hide_index=True,
+                                    use_container_width=True,
+                                )
+                                st.caption(f"Generated by `{event['model']}`")
+                            else:
+                                st.caption("No passages retrieved.")
+                        elif event["event"] == "token":
+                            text += event["text"]
+                            placeholder.info(text + " ▌")
+                        elif event["event"] == "done":
+                            data.update({key: v for key, v in event.items() if key != "event"})
+                            placeholder.info(event["answer"] or "(no answer returned)")
+                        elif event["event"] == "error":
+                            st.error(f"Generation failed: {event['detail']}")
 
                 with st.expander("Raw response"):
                     st.json(data)
@@ -24,32 +24,33 @@ def test_health():
     assert "model_loaded" in data
 
 
+SAMPLE_REQUEST = {
+    "status": "A11",
+    "duration": 12,
+    "credit_history": "A34",
+    "purpose": "A43",
+    "amount": 1500,
+    "savings": "A65",
+    "employment_duration": "A75",
+    "installment_rate": 2,
+    "personal_status_sex": "A93",
+    "other_debtors": "A101",
+    "present_residence": 2,
+    "property": "A121",
+    "age": 35,
+    "other_installment_plans": "A143",
+    "housing": "A152",
+    "number_credits": 1,
+    "job": "A173",
+    "people_liable": 1,
+    "telephone": "A192",
+    "foreign_worker": "A201",
+}
+
+
 def test_predict():
     """Test the /predict endpoint with a sample payload"""
-    sample_request = {
-        "status": "A11",
-        "duration": 12,
-        "credit_history": "A34",
-        "purpose": "A43",
-        "amount": 1500,
-        "savings": "A65",
-        "employment_duration": "A75",
-        "installment_rate": 2,
-        "personal_status_sex": "A93",
-        "other_debtors": "A101",
-        "present_residence": 2,
-        "property": "A121",
-        "age": 35,
-        "other_installment_plans": "A143",
-        "housing": "A152",
-        "number_credits": 1,
-        "job": "A173",
-        "people_liable": 1,
-        "telephone": "A192",
-        "foreign_worker": "A201",
-    }
-
-    response = client.post("/predict", json=sample_request)
+    response = client.post("/predict", json=SAMPLE_REQUEST)
     assert response.status_code == 200
     data = response.json()
 
@@ -58,3 +59,213 @@ def test_predict():
     assert isinstance(data["prediction"], int)
     assert isinstance(data["probabilities"], list)
     assert len(data["probabilities"]) == 2
+
+
+def test_predict_batch():
+    """Batch scoring keeps input order, isolates bad rows, and matches /predict"""
+    bad_row = {**SAMPLE_REQUEST, "age": 12}
+    other_row = {**SAMPLE_REQUEST, "amount": 9000, "duration": 48}
+    response = client.post("/predict_batch", json=[SAMPLE_REQUEST, bad_row, other_row])
+    assert response.status_code == 200
+    data = response.json()
+
+    assert data["n_rows"] == 3
+    assert data["n_scored"] == 2
+    assert data["n_failed"] == 1
+    assert [r["index"] for r in data["results"]] == [0, 1, 2]
+    assert "error" in data["results"][1]
+    assert data["results"][1]["error"][0]["loc"] == ["age"]
+
+    single = client.post("/predict", json=SAMPLE_REQUEST).json()
+    assert data["results"][0]["prediction"] == single["prediction"]
+    assert data["results"][0]["probabilities"] == pytest.approx(single["probabilities"])
+
+
+def test_predict_batch_upload_csv():
+    """CSV uploads are scored row by row; missing cells become row errors"""
+    header = ",".join(SAMPLE_REQUEST)
+    good = ",".join(str(v) for v in SAMPLE_REQUEST.values())
+    missing_age = ",".join("" if k == "age" else str(v) for k, v in SAMPLE_REQUEST.items())
+    csv = f"{header}\n{good}\n{missing_age}\n"
+
+    response = client.post("/predict_batch/upload", files={"file": ("apps.csv", csv, "text/csv")})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["n_scored"] == 1
+    assert data["n_failed"] == 1
+    assert "prediction" in data["results"][0]
+    assert "error" in data["results"][1]
+
+
+def test_predict_and_explain_stream(monkeypatch):
+    """The score is the first event, tokens follow, and the full explanation comes last"""
+    import json
+
+    import src.models.lora_infer as lora_infer
+
+    def fake_explanation(features, prediction, max_new_tokens=120, on_token=None, **kwargs):
+        for piece in ("Stable ", "income."):
+            on_token(piece)
+        return "Stable income."
+
+    monkeypatch.setattr(lora_infer, "generate_explanation", fake_explanation)
+    response = client.post("/predict_and_explain/stream", json=SAMPLE_REQUEST)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    events = [json.loads(line) for line in response.text.splitlines() if line]
+    assert [e["event"] for e in events] == ["prediction", "token", "token", "explanation"]
+    assert (
+        events[0]["prediction"] == client.post("/predict", json=SAMPLE_REQUEST).json()["prediction"]
+    )
+    assert "".join(e["text"] for e in events[1:3]) == events[-1]["explanation"]
+
+
+def test_predict_and_explain_stream_abandons_explanation_on_disconnect(monkeypatch):
+    """Once the client goes away, the next token makes the explanation request give up"""
+    import asyncio
+    import threading
+
+    import src.models.lora_infer as lora_infer
+    import src.service.app as service
+
+    client_gone, outcome = threading.Event(), []
+
+    def fake_explanation(features, prediction, on_token=None, **kwargs):
+        client_gone.wait(5)
+        try:
+            on_token("Stable ")
+        except lora_infer.ExplanationAbandoned as e:
+            outcome.append(e)
+            raise
+        return "Stable income."
+
+    monkeypatch.setattr(lora_infer, "generate_explanation", fake_explanation)
+
+    async def disconnect_after_score():
+        request = service.PredictionRequest(**SAMPLE_REQUEST)
+        response = await service.predict_and_explain_stream(request, deadline_ms=None)
+        stream = response.body_iterator
+        assert '"prediction"' in await stream.__anext__()
+        waiting = asyncio.ensure_future(stream.__anext__())  # submits the explanation
+        await asyncio.sleep(0.05)
+        waiting.cancel()  # what the server does when the client disconnects
+        await asyncio.gather(waiting, return_exceptions=True)
+        client_gone.set()
+        for _ in range(100):
+            if outcome:
+                break
+            await asyncio.sleep(0.02)
+
+    asyncio.run(disconnect_after_score())
+    assert len(outcome) == 1
+
+
+def test_ask_policy_stream(monkeypatch):
+    """Sources are the first event, tokens follow, and usage/latency come last"""
+    import json
+    import sys
+    import types
+
+    def fake_stream_answer(question, k=4):
+        yield {"event": "sources", "sources": [{"rank": 1, "source": "a.pdf"}], "model": "m"}
+        for piece in ("CDD ", "applies [1]."):
+            yield {"event": "token", "text": piece}
+        yield {"event": "done", "answer": "CDD applies [1].", "usage": {}, "latency_ms": {}}
+
+    # src.rag.qa needs sentence-transformers at import time; only its generator is used here.
+    qa = types.ModuleType("src.rag.qa")
+    qa.stream_answer = fake_stream_answer
+    monkeypatch.setitem(sys.modules, "src.rag.qa", qa)
+    response = client.post("/ask_policy/stream", json={"question": "What is CDD?", "k": 1})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    events = [json.loads(line) for line in response.text.splitlines() if line]
+    assert [e["event"] for e in events] == ["sources", "token", "token", "done"]
+    assert "".join(e["text"] for e in events[1:3]) == events[-1]["answer"]
+
+    def missing_index(question, k=4):
+        raise FileNotFoundError("FAISS index not found")
+        yield
+
+    qa.stream_answer = missing_index
+    response = client.post("/ask_policy/stream", json={"question": "What is CDD?"})
+    assert response.status_code == 503
+
+
+def test_ask_policy_batch_keeps_order_and_reports_errors(monkeypatch):
+    """Answers come back in input order; bad questions fail alone"""
+    import sys
+    import types
+
+    seen = []
+
+    def fake_answer_questions(questions, k=4):
+        seen.append(list(questions))
+        return [
+            {"error": "rate limited"} if "fail" in q else {"answer": q.upper(), "sources": []}
+            for q in questions
+        ]
+
+    qa = types.ModuleType("src.rag.qa")
+    qa.answer_questions = fake_answer_questions
+    monkeypatch.setitem(sys.modules, "src.rag.qa", qa)
+    questions = ["what is cdd", "no", "please fail", "who is a pep"]
+    response = client.post("/ask_policy_batch", json={"questions": questions, "k": 2})
+    assert response.status_code == 200
+    data = response.json()
+    assert seen == [["what is cdd", "please fail", "who is a pep"]]
+    assert (data["n_questions"], data["n_answered"], data["n_failed"]) == (4, 2, 2)
+    assert [r["index"] for r in data["results"]] == [0, 1, 2, 3]
+    assert data["results"][0]["answer"] == "WHAT IS CDD"
+    assert "error" in data["results"][1] and "error" in data["results"][2]
+    assert data["results"][3]["answer"] == "WHO IS A PEP"
+
+
+def test_explain_batch_keeps_order(monkeypatch):
+    """/explain_batch passes every item through once and returns results in input order"""
+    import src.models.lora_infer as lora_infer
+
+    def fake_explanations(items, max_new_tokens=120):
+        return [f"{features['age']}:{prediction}" for features, prediction in items]
+
+    monkeypatch.setattr(lora_infer, "generate_explanations", fake_explanations)
+    items = [{"features": {"age": age}, "prediction": age % 2} for age in (30, 41, 52)]
+    response = client.post("/explain_batch", json=items)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["n_items"] == 3
+    assert [r["explanation"] for r in data["results"]] == ["30:0", "41:1", "52:0"]
+
+    assert client.post("/explain_batch", json=[]).status_code == 422
+
+
+def test_predict_and_explain_tiered_upgrade(monkeypatch):
+    """Tiered mode answers with the rule-based text and serves the LLM text by id later"""
+    import time
+
+    import src.models.lora_infer as lora_infer
+    import src.service.app as service
+
+    monkeypatch.setattr(service, "EXPLAIN_MODE", "tiered")
+    monkeypatch.setattr(lora_infer, "cached_explanation", lambda *args, **kwargs: None)
+    monkeypatch.setattr(lora_infer, "generate_explanation", lambda *args, **kwargs: "LLM text.")
+
+    data = client.post("/predict_and_explain", json=SAMPLE_REQUEST).json()
+    assert data["tier"] == 0
+    assert data["explanation"].startswith("Application ")
+    assert "low savings" in data["explanation"]  # savings=A65
+
+    for _ in range(50):
+        job = client.get(f"/explanations/{data['explanation_id']}").json()
+        if job["status"] != "pending":
+            break
+        time.sleep(0.02)
+    assert job == {
+        "id": data["explanation_id"],
+        "status": "done",
+        "tier": 1,
+        "explanation": "LLM text.",
+    }
+    assert client.get("/explanations/unknown").status_code == 404
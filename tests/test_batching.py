@@ -0,0 +1,48 @@
+# tests/test_batching.py
+import threading
+
+import pytest
+
+from src.service.batching import MicroBatcher
+
+
+def test_microbatcher_fans_results_back_in_order():
+    """Concurrent submissions are grouped into batches and each caller gets its own result"""
+    seen_batches = []
+
+    def score(rows):
+        seen_batches.append(len(rows))
+        return [r * 10 for r in rows]
+
+    batcher = MicroBatcher(score, window_ms=50, max_rows=8)
+    futures = []
+    threads = [
+        threading.Thread(target=lambda i=i: futures.append((i, batcher.submit(i))))
+        for i in range(20)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    for i, fut in futures:
+        assert fut.result(timeout=5) == i * 10
+    batcher.close()
+
+    stats = batcher.stats()
+    assert stats["rows"] == 20
+    assert max(seen_batches) <= 8
+    assert stats["batches"] < 20  # at least some requests were actually batched
+
+
+def test_microbatcher_propagates_errors():
+    """A failing batch surfaces the exception to every waiting caller"""
+
+    def score(rows):
+        raise ValueError("boom")
+
+    batcher = MicroBatcher(score, window_ms=1, max_rows=4)
+    fut = batcher.submit({"x": 1})
+    with pytest.raises(ValueError, match="boom"):
+        fut.result(timeout=5)
+    batcher.close()
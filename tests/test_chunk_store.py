@@ -0,0 +1,31 @@
+# tests/test_chunk_store.py
+import pytest
+
+from src.rag.chunk_store import ChunkStore, write_store
+
+CHUNKS = [
+    {"id": "doc__chunk0000", "source": "doc.pdf", "text": "Customer due diligence"},
+    {"id": "doc__chunk0001", "source": "doc.pdf", "text": ""},
+    {"id": "doc2__chunk0000", "source": "doc2.pdf", "text": "Bénéficiaire effectif — 受益所有人"},
+]
+
+
+def test_round_trip_matches_json_rows(tmp_path):
+    """Rows come back exactly as written, including empty and non-ASCII text"""
+    store = ChunkStore(write_store(CHUNKS, tmp_path / "chunks"))
+    assert len(store) == 3
+    assert [store[i] for i in range(3)] == CHUNKS
+    assert store[-1] == CHUNKS[-1]
+    assert store.column("id") == [c["id"] for c in CHUNKS]
+    with pytest.raises(IndexError):
+        store[3]
+    store.close()
+
+
+def test_rewrite_replaces_store(tmp_path):
+    path = tmp_path / "chunks"
+    write_store(CHUNKS, path)
+    write_store(CHUNKS[:1], path)
+    store = ChunkStore(path)
+    assert list(store) == CHUNKS[:1]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["chunks"]
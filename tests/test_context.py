@@ -0,0 +1,56 @@
+# tests/test_context.py
+from src.rag.context import ELLIPSIS, ContextAssembler, merge_chunks
+from src.rag.ingest import chunk_text
+
+# Distinct words, so every 800-character window is different text.
+TEXT = " ".join(f"clause{i}" for i in range(800))
+WINDOWS = chunk_text(TEXT)
+
+
+class Words:
+    """Whitespace tokens, standing in for the Hugging Face tokenizer."""
+
+    name = "words"
+
+    def count(self, text: str) -> int:
+        return len(text.split())
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        return " ".join(text.split()[:max_tokens])
+
+
+def _chunk(rank: int, n: int, doc: str = "aml") -> dict:
+    text = WINDOWS[n] if doc == "aml" else f"{doc} passage {n}"
+    return {"rank": rank, "source": f"{doc}.pdf", "chunk_id": f"{doc}__chunk{n:04d}", "text": text}
+
+
+def test_consecutive_chunks_are_stitched_without_the_overlap():
+    chunks = [_chunk(1, 3), _chunk(2, 7), _chunk(3, 2), _chunk(4, 0, doc="kyc")]
+    passages = merge_chunks(chunks)
+    assert [p.ranks for p in passages] == [(1, 3), (2,), (4,)]
+    assert passages[0].text == TEXT[TEXT.index(WINDOWS[2]) : TEXT.index(WINDOWS[3]) + 800]
+    assert passages[1].text == WINDOWS[7]
+
+
+def test_separate_chunks_are_formatted_as_before():
+    context = ContextAssembler(budget=0, tokenizer=Words()).assemble(
+        [_chunk(1, 0, doc="kyc"), _chunk(2, 5)]
+    )
+    assert context.text == (
+        "[1] (source: kyc.pdf)\nkyc passage 0\n\n[2] (source: aml.pdf)\n" + WINDOWS[5] + "\n"
+    )
+    assert context.tokens_saved == 0 and context.merged == 0
+
+
+def test_budget_trims_the_crossing_passage_and_drops_the_rest():
+    assembler = ContextAssembler(budget=200, tokenizer=Words())
+    context = assembler.assemble([_chunk(1, 4), _chunk(2, 5), _chunk(3, 9), _chunk(4, 11)])
+    assert context.merged == 1
+    assert [p.ranks for p in context.passages] == [(1, 2), (3,)]
+    assert context.passages[-1].text.endswith(ELLIPSIS)
+    assert (context.trimmed, context.dropped) == (1, 1)
+    assert context.tokens <= 200 < context.tokens_full
+
+    stats = assembler.stats()
+    assert stats["requests"] == 1 and stats["tokens_saved"] == context.tokens_saved
+    assert stats["chunks_merged"] == 1 and stats["passages_dropped"] == 1
@@ -0,0 +1,41 @@
+# tests/test_embedding_cache.py
+import numpy as np
+
+from src.rag.embedding_cache import EmbeddingCache
+
+
+def _encoder(calls):
+    def encode(texts):
+        calls.append(list(texts))
+        return np.array([[len(t), t.count("a"), 1.0] for t in texts], dtype="float32")
+
+    return encode
+
+
+def test_only_unseen_texts_are_encoded_and_survive_reopen(tmp_path):
+    calls = []
+    cache = EmbeddingCache(tmp_path, "model-a")
+    first = cache.embed(["aa", "b", "aa"], _encoder(calls))
+    assert calls == [["aa", "b"]]
+    assert first.tolist() == [[2, 2, 1], [1, 0, 1], [2, 2, 1]]
+
+    reopened = EmbeddingCache(tmp_path, "model-a")
+    again = reopened.embed(["b", "ccc", "aa"], _encoder(calls))
+    assert calls[-1] == ["ccc"]
+    assert again.tolist() == [[1, 0, 1], [3, 0, 1], [2, 2, 1]]
+    assert (reopened.hits, reopened.misses, reopened.count) == (2, 1, 3)
+
+
+def test_model_change_and_dead_rows_are_compacted(tmp_path):
+    calls = []
+    cache = EmbeddingCache(tmp_path, "model-a")
+    cache.embed(["a", "bb", "ccc", "dddd"], _encoder(calls))
+
+    assert cache.compact(["a", "bb", "ccc"]) == 0  # 1 of 4 dead: below the threshold
+    assert cache.compact(["dddd"]) == 3
+    assert EmbeddingCache(tmp_path, "model-a").get("dddd").tolist() == [4, 0, 1]
+    assert EmbeddingCache(tmp_path, "model-a").get("a") is None
+
+    other = EmbeddingCache(tmp_path, "model-b")
+    assert other.count == 0 and other.get("dddd") is None
+    assert (tmp_path / "vectors.f32").stat().st_size == 0
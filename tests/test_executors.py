@@ -0,0 +1,98 @@
+# tests/test_executors.py
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import src.service.app as service
+from src.service.executors import BoundedExecutor, Overloaded
+from src.service.explanation_jobs import ExplanationJobs
+
+
+def test_bounded_executor_rejects_beyond_queue_cap():
+    """Running + queued jobs are capped; the next submit fails fast and capacity comes back"""
+    gate = threading.Event()
+    ex = BoundedExecutor("test", max_workers=1, max_queue=1, retry_after=7)
+    running = ex.submit(gate.wait)
+    queued = ex.submit(lambda: "queued")
+
+    with pytest.raises(Overloaded) as info:
+        ex.submit(lambda: "rejected")
+    assert info.value.retry_after == 7
+    assert ex.stats()["rejected"] == 1
+
+    gate.set()
+    running.result(timeout=5)
+    assert queued.result(timeout=5) == "queued"
+    assert ex.submit(lambda: "ok").result(timeout=5) == "ok"
+    ex.shutdown()
+
+
+def test_overloaded_class_returns_503_with_retry_after(monkeypatch):
+    """A saturated workload class answers 503 + Retry-After instead of queuing"""
+    gate = threading.Event()
+    saturated = BoundedExecutor("scoring", max_workers=1, max_queue=0, retry_after=5)
+    saturated.submit(gate.wait)
+    monkeypatch.setattr(service, "_scoring", saturated)
+
+    client = TestClient(service.app)
+    response = client.post("/predict_batch", json=[{"age": 30}])
+    gate.set()
+    saturated.shutdown()
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+
+
+def _wait_until_finished(jobs, job_id):
+    while jobs.get(job_id)["status"] == "pending":
+        time.sleep(0.001)
+
+
+def test_explanation_jobs_evict_finished_jobs_before_pending_ones():
+    """At the cap the finished job goes, not the upgrade that is still running"""
+    gate = threading.Event()
+    ex = BoundedExecutor("test", max_workers=2, max_queue=2)
+    jobs = ExplanationJobs(ex, ttl_s=600, max_jobs=2)
+    slow = jobs.submit(gate.wait)
+    fast = jobs.submit(lambda: "done")
+    _wait_until_finished(jobs, fast)
+
+    third = jobs.submit(lambda: "third")
+    assert jobs.get(fast) is None
+    assert jobs.get(slow)["status"] == "pending" and jobs.get(third) is not None
+    gate.set()
+    ex.shutdown()
+
+
+def test_explanation_jobs_refuse_new_jobs_when_all_are_pending():
+    """A full table of running upgrades turns the next one away instead of forgetting one"""
+    gate = threading.Event()
+    ex = BoundedExecutor("test", max_workers=2, max_queue=2)
+    jobs = ExplanationJobs(ex, ttl_s=600, max_jobs=1)
+    slow = jobs.submit(gate.wait)
+    with pytest.raises(Overloaded):
+        jobs.submit(lambda: "second")
+    assert jobs.get(slow)["status"] == "pending"
+    assert jobs.stats()["rejected"] == 1
+    gate.set()
+    _wait_until_finished(jobs, slow)
+    assert jobs.get(jobs.submit(lambda: "third")) is not None
+    ex.shutdown()
+
+
+def test_explanation_jobs_ttl_only_counts_from_finishing():
+    gate = threading.Event()
+    ex = BoundedExecutor("test", max_workers=1, max_queue=1)
+    jobs = ExplanationJobs(ex, ttl_s=0.05, max_jobs=10)
+    slow = jobs.submit(gate.wait)
+    time.sleep(0.1)  # older than the TTL, but still running
+    assert jobs.get(slow)["status"] == "pending"
+
+    gate.set()
+    _wait_until_finished(jobs, slow)
+    assert jobs.get(slow)["status"] == "done"
+    time.sleep(0.1)
+    assert jobs.get(slow) is None
+    ex.shutdown()
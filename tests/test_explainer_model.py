@@ -0,0 +1,34 @@
+# tests/test_explainer_model.py
+from src.models.explainer_model import build_prompt, model_tag, plan_batches, trim_to_sentence
+
+
+def test_prompt_and_model_tag():
+    prompt = build_prompt({"age": 30, "amount": 1500}, 0)
+    assert prompt.endswith("Input: age=30, amount=1500\nDecision: denied.\nExplanation:")
+    assert model_tag("m", "main", "fp32") == "m@main"
+    assert model_tag("m", "main", "int8") == "m@main+int8"
+
+
+def test_plan_batches_respects_count_and_memory():
+    """Every prompt is planned exactly once; batches stay within both limits"""
+    lengths = [50, 200, 60, 210, 55, 400]
+
+    def cost(n):
+        return n * 10
+
+    plan = plan_batches(lengths, max_batch=2, budget_bytes=5000, seq_cost=cost)
+
+    assert sorted(i for batch in plan for i in batch) == list(range(len(lengths)))
+    for batch in plan:
+        assert len(batch) <= 2
+        if len(batch) > 1:
+            assert len(batch) * cost(max(lengths[i] for i in batch)) <= 5000
+    # Similar lengths are grouped, and the over-budget prompt still runs alone.
+    assert [0, 4] in plan and [5] in plan
+
+
+def test_trim_to_sentence():
+    """A deadline cut keeps whole sentences, but never trims everything away"""
+    assert trim_to_sentence("Savings are low. Employment is sho") == "Savings are low."
+    assert trim_to_sentence("Is the amount high? Yes! The dura") == "Is the amount high? Yes!"
+    assert trim_to_sentence("No sentence end yet") == "No sentence end yet"
@@ -0,0 +1,98 @@
+# tests/test_explanation_cache.py
+import time
+
+from src.models.explanation_cache import ExplanationCache, cache_key
+
+FEATURES = {"age": 35, "amount": 1500, "purpose": "A43"}
+
+
+def test_key_follows_the_rendered_prompt():
+    """Inputs that render the same prompt share a key; any difference in the prompt doesn't"""
+    base = cache_key(FEATURES, 1, 120, "m@main")
+    assert cache_key(dict(FEATURES), 1, 120, "m@main") == base
+    # Both change the prompt text, so the model may well answer differently.
+    assert cache_key({"purpose": "A43", "amount": 1500, "age": 35}, 1, 120, "m@main") != base
+    assert cache_key({**FEATURES, "amount": 1500.0}, 1, 120, "m@main") != base
+    assert cache_key(FEATURES, 0, 120, "m@main") != base
+    assert cache_key(FEATURES, 1, 60, "m@main") != base
+    assert cache_key(FEATURES, 1, 120, "m@v2") != base
+    assert cache_key(FEATURES, 1, 120, "m@main", batched=True) != base
+
+
+def test_lru_evicts_least_recently_used():
+    cache = ExplanationCache("m@main", capacity=2)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a") == "A"  # "b" is now the oldest
+    cache.put("c", "C")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "A" and cache.get("c") == "C"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (3, 1, 2)
+
+
+def test_sqlite_persists_and_model_change_invalidates(tmp_path):
+    """Entries survive a restart on the same model and are dropped for a new one"""
+    db = str(tmp_path / "explanations.sqlite")
+    first = ExplanationCache("m@main", db_path=db)
+    key = first.key(FEATURES, 1, 120)
+    first.put(key, "Stable income.")
+    first.close()
+
+    reopened = ExplanationCache("m@main", db_path=db)
+    assert reopened.get(key) == "Stable income."
+    assert reopened.stats()["disk_hits"] == 1
+    reopened.close()
+
+    retrained = ExplanationCache("m@v2", db_path=db)
+    assert retrained.stats()["disk_entries"] == 0
+    assert retrained.get(retrained.key(FEATURES, 1, 120)) is None
+    retrained.close()
+
+
+def test_truncated_explanation_is_not_cached(monkeypatch):
+    """A reply cut short by a deadline is not served to a later call without one"""
+    from src.models import lora_infer
+
+    replies = iter(
+        [
+            {"explanation": "Savings are low.", "model": "m@main", "truncated": True},
+            {"explanation": "Savings are low and the loan is long.", "model": "m@main"},
+        ]
+    )
+
+    class FakePool:
+        def request(self, message, on_token=None):
+            return next(replies)
+
+    monkeypatch.setattr(lora_infer, "_cache", ExplanationCache("m@main"))
+    monkeypatch.setattr(lora_infer, "get_pool", FakePool)
+    assert (
+        lora_infer.generate_explanation(FEATURES, 1, deadline_at=time.time() + 0.5)
+        == "Savings are low."
+    )
+    full = "Savings are low and the loan is long."
+    assert lora_infer.generate_explanation(FEATURES, 1) == full
+    assert lora_infer.generate_explanation(FEATURES, 1) == full  # now from the cache
+
+
+def test_batched_and_single_explanations_are_cached_apart(monkeypatch):
+    """Left-padded batch output is never served to a single request, or the other way round"""
+    from src.models import lora_infer
+
+    class FakePool:
+        size = 1
+
+        def request(self, message, on_token=None):
+            if "batch" in message:
+                return {"explanations": ["Batched text."], "model": "m@main"}
+            return {"explanation": "Single text.", "model": "m@main"}
+
+    monkeypatch.setattr(lora_infer, "_cache", ExplanationCache("m@main"))
+    monkeypatch.setattr(lora_infer, "get_pool", FakePool)
+    assert lora_infer.generate_explanations([(FEATURES, 1)]) == ["Batched text."]
+    assert lora_infer.cached_explanation(FEATURES, 1) is None
+    assert lora_infer.generate_explanation(FEATURES, 1) == "Single text."
+    assert lora_infer.generate_explanations([(FEATURES, 1)]) == ["Batched text."]
+    assert lora_infer._cache.stats()["entries"] == 2
@@ -0,0 +1,89 @@
+# tests/test_fast_scorer.py
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.models.fast_scorer import FastScorer
+
+MODEL_PATH = Path("models/credit_risk_model.pkl")
+DATA_PATH = Path("data/interim/german_credit.csv")
+
+pytestmark = pytest.mark.skipif(
+    not (MODEL_PATH.exists() and DATA_PATH.exists()),
+    reason="needs a trained model and the German Credit CSV",
+)
+
+
+@pytest.fixture(scope="module")
+def pipeline_and_data():
+    pipeline = joblib.load(MODEL_PATH)
+    X = pd.read_csv(DATA_PATH).drop(columns=["credit_risk"])
+    return pipeline, X
+
+
+def test_fast_scorer_matches_pipeline_batch(pipeline_and_data):
+    """Vectorized fast path gives bit-identical probabilities over the whole dataset"""
+    pipeline, X = pipeline_and_data
+    scorer = FastScorer.from_pipeline(pipeline)
+    expected = pipeline.predict_proba(X)
+    actual = scorer.predict_proba(X.to_dict(orient="records"))
+    np.testing.assert_array_equal(actual, expected)
+
+
+def test_fast_scorer_matches_pipeline_single_row(pipeline_and_data):
+    """Single-row path (preallocated buffer) matches the pipeline row by row"""
+    pipeline, X = pipeline_and_data
+    scorer = FastScorer.from_pipeline(pipeline)
+    expected = pipeline.predict_proba(X)
+    for i, row in enumerate(X.head(200).to_dict(orient="records")):
+        np.testing.assert_array_equal(scorer.predict_proba([row])[0], expected[i])
+
+
+def test_fast_scorer_unknown_category_matches_pipeline(pipeline_and_data):
+    """Unseen category codes encode to all-zero one-hot blocks, as handle_unknown='ignore' does"""
+    pipeline, X = pipeline_and_data
+    scorer = FastScorer.from_pipeline(pipeline)
+    row = {**X.iloc[0].to_dict(), "status": "A11", "purpose": "not-a-purpose"}
+    expected = pipeline.predict_proba(pd.DataFrame([row]))
+    np.testing.assert_array_equal(scorer.predict_proba([row]), expected)
+
+
+def test_compiled_artifact_matches_pickle(pipeline_and_data, tmp_path):
+    """Exported booster text + encoding table reproduce the pickled pipeline exactly"""
+    from src.models.fast_scorer import export_compiled
+
+    pipeline, X = pipeline_and_data
+    stem = tmp_path / "credit_risk_model"
+    export_compiled(pipeline, stem)
+
+    scorer = FastScorer.load(stem)
+    expected = pipeline.predict_proba(X)
+    np.testing.assert_array_equal(scorer.predict_proba(X.to_dict(orient="records")), expected)
+    assert scorer.classes_.tolist() == pipeline.classes_.tolist()
+
+
+def test_service_skips_compiled_artifact_of_another_pickle(
+    pipeline_and_data, tmp_path, monkeypatch
+):
+    """The export records the pickle's SHA-256; a retrained pickle makes the artifact stale"""
+    import src.service.app as service
+    from src.models.fast_scorer import export_compiled, file_sha256
+
+    pipeline, _ = pipeline_and_data
+    pickle_path = tmp_path / "credit_risk_model.pkl"
+    joblib.dump(pipeline, pickle_path)
+    stem = tmp_path / "credit_risk_model"
+    export_compiled(pipeline, stem, {"pickle_sha256": file_sha256(pickle_path)})
+
+    monkeypatch.chdir(tmp_path)  # no mlflow.db here
+    monkeypatch.setattr(service, "USE_COMPILED", True)
+    monkeypatch.setattr(service, "COMPILED_STEM_CANDIDATES", [str(stem)])
+    monkeypatch.setattr(service, "LOCAL_PKL_CANDIDATES", [str(pickle_path)])
+    scorer, _ = service._load_compiled()
+    assert scorer is not None and scorer.source == {"pickle_sha256": file_sha256(pickle_path)}
+
+    pickle_path.write_bytes(pickle_path.read_bytes() + b"retrained")
+    assert service._load_compiled() == (None, None)
@@ -0,0 +1,129 @@
+import datetime
+import email.utils
+import json
+import threading
+import time
+
+import httpx
+import pytest
+
+from src.rag.generation import (
+    GenerationError,
+    LocalBackend,
+    RetryPolicy,
+    StubBackend,
+    Usage,
+    make_backend,
+    parse_retry_after,
+)
+
+MESSAGES = [
+    {"role": "system", "content": "Answer from the passages."},
+    {
+        "role": "user",
+        "content": "Context passages:\n\n[1] (source: fatf.pdf)\nCDD text\n\n"
+        "[2] (source: basel.pdf)\nKYC text\n\nQuestion: What is CDD?\n\nAnswer:",
+    },
+]
+NO_WAIT = RetryPolicy(timeout_s=1, max_retries=2, backoff_s=0)
+
+
+def test_stub_backend_is_deterministic_and_cites_passages():
+    backend = make_backend("stub")
+    completion = backend.complete(MESSAGES, 0.1, 64)
+    assert completion == backend.complete(MESSAGES, 0.1, 64)
+    assert "[1]" in completion.text and "[2]" in completion.text
+    *pieces, usage = backend.stream(MESSAGES, 0.1, 64)
+    assert "".join(pieces) == completion.text
+    assert usage == completion.usage
+
+
+def test_stub_backend_cites_every_label_of_a_merged_passage():
+    merged = [
+        MESSAGES[0],
+        {
+            "role": "user",
+            "content": "Context passages:\n\n[1][2] (source: basel.pdf)\nKYC and CDD text\n\n"
+            "[3] (source: fatf.pdf)\nRBA text\n\nQuestion: What is CDD?\n\nAnswer:",
+        },
+    ]
+    answer = make_backend("stub").complete(merged, 0.1, 64).text
+    assert answer == (
+        "According to basel.pdf, fatf.pdf, the policy passages address this question [1] [2] [3]."
+    )
+
+
+def test_local_backend_retries_then_streams_sse():
+    calls = []
+
+    def handler(request):
+        calls.append(json.loads(request.content))
+        if len(calls) == 1:
+            return httpx.Response(503, headers={"retry-after": "0"})
+        events = [
+            {"choices": [{"delta": {"content": "CDD "}}]},
+            {"choices": [{"delta": {"content": "applies [1]."}}]},
+            {
+                "choices": [],
+                "usage": {"prompt_tokens": 9, "completion_tokens": 3, "total_tokens": 12},
+            },
+        ]
+        body = "".join(f"data: {json.dumps(e)}\n\n" for e in events) + "data: [DONE]\n\n"
+        return httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})
+
+    backend = LocalBackend("tinyllama", NO_WAIT, transport=httpx.MockTransport(handler))
+    items = list(backend.stream(MESSAGES, 0.1, 64))
+    assert items == ["CDD ", "applies [1].", Usage(9, 3, 12)]
+    assert calls[-1]["stream"] and calls[-1]["model"] == "tinyllama"
+    assert backend.stats()["retries"] == 1
+
+
+def test_local_backend_gives_up_on_client_errors():
+    handler = httpx.MockTransport(lambda request: httpx.Response(400))
+    backend = LocalBackend("tinyllama", NO_WAIT, transport=handler)
+    with pytest.raises(GenerationError):
+        backend.complete(MESSAGES, 0.1, 64)
+    assert backend.stats()["retries"] == 0 and backend.stats()["failures"] == 1
+
+
+def test_stream_is_not_retried_after_the_first_token():
+    class Flaky(StubBackend):
+        def _stream(self, messages, temperature, max_tokens):
+            yield "partial "
+            raise GenerationError("connection reset", retryable=True)
+
+    backend = Flaky("stub", NO_WAIT)
+    stream = backend.stream(MESSAGES, 0.1, 64)
+    assert next(stream) == "partial "
+    with pytest.raises(GenerationError):
+        next(stream)
+    assert backend.stats()["retries"] == 0
+
+
+def test_rate_limit_pauses_every_request_on_the_backend():
+    sent = []
+
+    def handler(request):
+        sent.append(time.monotonic())
+        if len(sent) == 1:
+            return httpx.Response(429, headers={"retry-after": "0.3"})
+        return httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})
+
+    backend = LocalBackend("tinyllama", NO_WAIT, transport=httpx.MockTransport(handler))
+    first = threading.Thread(target=backend.complete, args=(MESSAGES, 0.1, 64))
+    first.start()
+    time.sleep(0.05)  # the second caller arrives while the first is backing off
+    assert backend.complete(MESSAGES, 0.1, 64).text == "ok"
+    first.join()
+    assert len(sent) == 3 and min(sent[1:]) - sent[0] >= 0.25
+    assert backend.stats()["rate_limited"] == 1
+
+
+def test_retry_after_accepts_seconds_and_http_dates():
+    assert parse_retry_after("2.5") == 2.5
+    assert parse_retry_after(None) is None and parse_retry_after("soon") is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0  # in the past
+    later = email.utils.format_datetime(
+        datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=30), usegmt=True
+    )
+    assert 25 < parse_retry_after(later) <= 30
@@ -0,0 +1,103 @@
+# tests/test_ingest.py
+import hashlib
+import json
+
+import numpy as np
+import pytest
+
+from src.rag import ingest
+from src.rag.chunk_store import ChunkStore
+from src.rag.lexical_index import BM25Index
+from src.rag.vector_index import load_index
+
+
+def _fake_embed(calls):
+    def embed(texts):
+        calls.append(len(texts))
+        rows = [
+            np.random.default_rng(int(hashlib.sha256(t.encode()).hexdigest()[:8], 16)).normal(
+                size=16
+            )
+            for t in texts
+        ]
+        vectors = np.array(rows, dtype="float32")
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    return embed
+
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    """Text files standing in for PDFs, and an index directory under tmp_path"""
+    pdf_dir, index_dir = tmp_path / "pdfs", tmp_path / "index"
+    pdf_dir.mkdir()
+    monkeypatch.setattr(ingest, "PDF_DIR", pdf_dir)
+    monkeypatch.setattr(ingest, "INDEX_DIR", index_dir)
+    for name in ("INDEX_PATH", "INDEX_META_PATH", "CHUNKS_PATH", "CHUNK_STORE_PATH", "BM25_PATH"):
+        monkeypatch.setattr(ingest, name, index_dir / getattr(ingest, name).name)
+    monkeypatch.setattr(ingest, "MANIFEST_PATH", index_dir / "manifest.json")
+    monkeypatch.setattr(ingest, "STAT_CACHE_PATH", index_dir / ".stat_cache.json")
+    monkeypatch.setattr(ingest, "EMBED_CACHE_DIR", "")
+    monkeypatch.setattr(
+        ingest, "extract_pages", lambda path, start=0, stop=None: [path.read_text()]
+    )
+    calls = []
+    monkeypatch.setattr(ingest, "embed", _fake_embed(calls))
+    return pdf_dir, calls
+
+
+def _write(pdf_dir, name, n_chunks):
+    (pdf_dir / name).write_text(f"{name} " * (n_chunks * ingest.CHUNK_SIZE // 12))
+
+
+def _sources_by_search():
+    """Each stored chunk must be its own nearest neighbour, resolved through its FAISS id"""
+    index, meta = load_index(ingest.INDEX_PATH, ingest.INDEX_META_PATH)
+    store = ChunkStore(ingest.CHUNK_STORE_PATH)
+    assert index.ntotal == len(store) and store.version == meta["version"]
+    embed = _fake_embed([])
+    for row in range(len(store)):
+        hit = index.search(embed([store[row]["text"]]), 1)[1][0][0]
+        assert store.by_id(hit) == store[row]
+    return sorted({chunk["source"] for chunk in store})
+
+
+@pytest.mark.parametrize("index_type", ["flat", "hnsw"])
+def test_only_new_and_changed_files_are_embedded(corpus, index_type):
+    pdf_dir, calls = corpus
+    _write(pdf_dir, "a.pdf", 3)
+    _write(pdf_dir, "b.pdf", 2)
+    ingest.build_index(index_type, workers=1)
+    assert _sources_by_search() == ["a.pdf", "b.pdf"]
+    first_run = sum(calls)
+
+    ingest.build_index(workers=1)  # nothing changed
+    assert sum(calls) == first_run
+
+    _write(pdf_dir, "c.pdf", 2)
+    (pdf_dir / "b.pdf").write_text("rewritten policy text")
+    (pdf_dir / "a.pdf").unlink()
+    ingest.build_index(workers=1)
+    assert calls[-1] == len(ingest.chunk_text((pdf_dir / "c.pdf").read_text())) + 1
+    assert _sources_by_search() == ["b.pdf", "c.pdf"]
+
+    manifest = json.loads(ingest.MANIFEST_PATH.read_text())
+    assert manifest["version"] == 2 and sorted(manifest["files"]) == ["b.pdf", "c.pdf"]
+    assert json.loads(ingest.INDEX_META_PATH.read_text())["index_type"] == index_type
+
+    # The BM25 index follows the store: same version, same FAISS ids, new text searchable.
+    bm25, store = BM25Index(ingest.BM25_PATH), ChunkStore(ingest.CHUNK_STORE_PATH)
+    assert bm25.version == 2 and np.array_equal(bm25.ids, store.ids)
+    _, hits = bm25.search("rewritten policy text", 1)
+    assert store.by_id(hits[0])["source"] == "b.pdf"
+
+
+def test_parallel_page_ranges_match_serial(monkeypatch):
+    """Splitting a real PDF into page ranges across processes changes nothing"""
+    pdf = ingest.PDF_DIR / "basel_kyc_cdd.pdf"
+    monkeypatch.setattr(ingest, "SPLIT_MIN_BYTES", 0)
+    monkeypatch.setattr(ingest, "PAGES_PER_TASK", 7)
+    assert len(ingest.plan_extraction([pdf])) == 4
+    serial = ingest.chunk_pdfs([pdf], workers=1)
+    assert ingest.chunk_pdfs([pdf], workers=2) == serial
+    assert [c["text"] for c in serial[0]] == ingest.chunk_text(ingest.extract_text(pdf))
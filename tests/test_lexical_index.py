@@ -0,0 +1,81 @@
+# tests/test_lexical_index.py
+import math
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from src.rag.lexical_index import BM25Index, reciprocal_rank_fusion, tokenize, write_bm25
+
+TEXTS = [
+    "Banks should identify the beneficial owner of every customer.",
+    "Beneficial owners of legal entities and beneficial ownership registers.",
+    "Politically exposed persons (PEPs) require enhanced due diligence.",
+    "Records should be kept for at least five years, see section 5.2.1.",
+    "",
+]
+IDS = np.array([10, 11, 12, 13, 14])
+
+
+def brute_force_bm25(query: str, k1: float = 1.5, b: float = 0.75) -> np.ndarray:
+    docs = [Counter(tokenize(t)) for t in TEXTS]
+    avg_len = sum(sum(d.values()) for d in docs) / len(docs)
+    scores = np.zeros(len(docs))
+    for term in set(tokenize(query)):
+        df = sum(term in d for d in docs)
+        if not df:
+            continue
+        idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+        for row, d in enumerate(docs):
+            tf, length = d[term], sum(d.values())
+            scores[row] += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_len))
+    return scores
+
+
+def test_tokenize_keeps_section_numbers_and_folds_plurals():
+    assert tokenize("Beneficial Owners, entities and R.10 in section 5.2.1") == [
+        "beneficial",
+        "owner",
+        "entity",
+        "r.10",
+        "section",
+        "5.2.1",
+    ]
+    assert tokenize("business process analysis") == ["business", "process", "analysis"]
+
+
+def test_search_matches_brute_force_scores(tmp_path):
+    index = BM25Index(write_bm25(TEXTS, IDS, tmp_path / "bm25", version=3))
+    assert index.version == 3 and index.count == len(TEXTS)
+    for query in ("beneficial owner", "PEPs due diligence", "section 5.2.1 records"):
+        expected = brute_force_bm25(query)
+        scores, ids = index.search(query, k=10)
+        rows = ids - 10
+        assert list(rows) == sorted(np.flatnonzero(expected), key=lambda r: (-expected[r], r))
+        np.testing.assert_allclose(scores, expected[rows], rtol=1e-5)
+    scores, ids = index.search("beneficial owner", k=1)
+    assert list(ids) == [11]
+    assert len(index.search("unknown words only", k=5)[1]) == 0
+    index.close()
+
+
+def test_rewrite_replaces_index(tmp_path):
+    path = tmp_path / "bm25"
+    write_bm25(TEXTS, IDS, path, version=1)
+    write_bm25(TEXTS[:1], IDS[:1], path, version=2)
+    index = BM25Index(path)
+    assert index.version == 2 and list(index.search("customer", k=5)[1]) == [10]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["bm25"]
+    index.close()
+
+
+def test_missing_index_raises(tmp_path):
+    with pytest.raises(ValueError):
+        BM25Index(tmp_path / "bm25")
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 4, 1]], k=3, rrf_k=60)
+    assert [doc_id for doc_id, _ in fused] == [1, 3, 2]
+    assert fused[0][1] == pytest.approx(1 / 61 + 1 / 63)
+    assert reciprocal_rank_fusion([[], []], k=3) == []
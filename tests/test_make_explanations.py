@@ -0,0 +1,17 @@
+# tests/test_make_explanations.py
+from src.training.make_explanations import generate_explanation, template_explanation
+
+
+def test_template_matches_training_generator():
+    """Tier-0 text is exactly what the training generator writes for the same row"""
+    row = {"savings": "A61", "employment_duration": "A72", "amount": 6000, "age": 22}
+    assert template_explanation(row, 0) == (
+        "Application denied due to low savings, short employment duration, "
+        "high loan amount, young applicant."
+    )
+    assert generate_explanation({**row, "credit_risk": 0}) == ("bad", template_explanation(row, 0))
+
+    stable = {"savings": "A64", "employment_duration": "A75", "amount": 1000, "age": 40}
+    assert (
+        template_explanation(stable, 1) == "Application approved due to stable financial profile."
+    )
@@ -0,0 +1,44 @@
+# tests/test_query_cache.py
+import numpy as np
+
+from src.rag import query_cache
+from src.rag.query_cache import QueryCache, TTLCache, normalize_question, vector_key
+
+
+def test_normalize_question():
+    assert normalize_question("  What is   CDD? ") == "what is cdd"
+    assert normalize_question("what is CDD") == normalize_question("What is CDD?!")
+    assert normalize_question("What is CDD") != normalize_question("What is EDD")
+    assert vector_key(np.ones((1, 4))) == vector_key(np.ones((1, 4), dtype=np.float32))
+
+
+def test_ttl_and_lru(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(query_cache.time, "monotonic", lambda: now[0])
+    cache = TTLCache(capacity=2, ttl_s=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.put("c", 3)
+    assert cache.get("b") is None and cache.get("c") == 3
+
+    now[0] += 61
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expired"], stats["entries"]) == (2, 2, 1, 1)
+
+
+def test_new_index_version_clears_every_tier():
+    cache = QueryCache(capacity=8, ttl_s=60)
+    cache.sync((1, 111))
+    cache.embeddings.put("q", np.zeros(3))
+    cache.retrievals.put(("v", 4, 1), [{"chunk_id": "x"}])
+    cache.answers.put(("q", ("x",), "m", 0.1), "answer")
+
+    cache.sync((1, 111))
+    assert cache.answers.get(("q", ("x",), "m", 0.1)) == "answer"
+    cache.sync((2, 222))
+    assert cache.embeddings.get("q") is None
+    assert cache.retrievals.get(("v", 4, 1)) is None
+    assert cache.answers.get(("q", ("x",), "m", 0.1)) is None
+    assert cache.stats()["invalidations"] == 1
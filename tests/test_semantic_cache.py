@@ -0,0 +1,75 @@
+# tests/test_semantic_cache.py
+import numpy as np
+
+from src.rag.semantic_cache import SemanticAnswerCache
+
+
+def _unit(*values):
+    v = np.array(values, dtype="float32")
+    return v / np.linalg.norm(v)
+
+
+CDD = _unit(1.0, 0.0, 0.0)
+CDD_PARAPHRASE = _unit(1.0, 0.2, 0.0)  # cosine ~0.98
+SANCTIONS = _unit(0.0, 1.0, 0.0)
+SOURCES = [{"rank": 1, "source": "kyc.pdf", "chunk_id": "a", "score": 0.8}]
+
+
+def _cache(tmp_path, **kwargs):
+    return SemanticAnswerCache(3, threshold=0.9, min_overlap=0.5, directory=tmp_path, **kwargs)
+
+
+def test_paraphrase_with_overlapping_chunks_hits(tmp_path):
+    cache = _cache(tmp_path)
+    cache.sync((1, 1))
+    cache.add(CDD, "what is CDD", ["a", "b"], "CDD is ... [1]", SOURCES, "m", 0.1)
+
+    match = cache.lookup(CDD_PARAPHRASE, ["a", "b", "c"], "m", 0.1)
+    assert match["answer"] == "CDD is ... [1]" and match["sources"] == SOURCES
+    assert match["similarity"] > 0.9
+
+    assert cache.lookup(SANCTIONS, ["a", "b"], "m", 0.1) is None  # not similar
+    assert cache.lookup(CDD_PARAPHRASE, ["x", "y"], "m", 0.1) is None  # different chunks
+    assert cache.lookup(CDD_PARAPHRASE, ["a", "b"], "other-model", 0.1) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 3)
+    assert (stats["misses_below_threshold"], stats["misses_near_rejected"]) == (1, 2)
+
+
+def test_persists_evicts_and_clears_on_new_index(tmp_path):
+    cache = _cache(tmp_path, capacity=1)
+    cache.sync((1, 1))
+    cache.add(CDD, "what is CDD", ["a"], "old", SOURCES, "m", 0.1)
+    cache.add(SANCTIONS, "sanctions screening", ["s"], "new", SOURCES, "m", 0.1)
+    assert cache.lookup(CDD, ["a"], "m", 0.1) is None  # evicted
+    cache.flush()
+
+    reopened = _cache(tmp_path, capacity=1)
+    reopened.sync((1, 1))
+    assert reopened.lookup(SANCTIONS, ["s"], "m", 0.1)["answer"] == "new"
+    reopened.sync((2, 2))
+    assert reopened.lookup(SANCTIONS, ["s"], "m", 0.1) is None
+    reopened.flush()
+    assert _cache(tmp_path).stats()["entries"] == 0
+
+
+def test_saves_every_n_adds_without_leaving_temp_files(tmp_path):
+    cache = _cache(tmp_path, save_every=2)
+    cache.sync((1, 1))
+    cache.add(CDD, "what is CDD", ["a"], "CDD", SOURCES, "m", 0.1)
+    assert not any(tmp_path.iterdir())  # not written on the request path yet
+    cache.add(SANCTIONS, "sanctions screening", ["s"], "screening", SOURCES, "m", 0.1)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["entries.json", "questions.faiss"]
+    assert _cache(tmp_path).stats()["entries"] == 2
+
+
+def test_failed_save_is_logged_and_retried(tmp_path):
+    blocker = tmp_path / "cache"
+    blocker.write_text("not a directory")
+    cache = _cache(blocker, save_every=1)
+    cache.sync((1, 1))
+    cache.add(CDD, "what is CDD", ["a"], "CDD", SOURCES, "m", 0.1)  # logs, doesn't raise
+
+    blocker.unlink()
+    cache.flush()
+    assert _cache(blocker).stats()["entries"] == 1
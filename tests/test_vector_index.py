@@ -0,0 +1,61 @@
+# tests/test_vector_index.py
+import faiss
+import numpy as np
+import pytest
+
+from src.rag.vector_index import (
+    INDEX_TYPES,
+    choose_index_type,
+    ivf_nlist,
+    load_index,
+    make_index,
+    recall_at_k,
+    save_index,
+)
+
+
+def _vectors(n, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(20, dim))
+    x = (centres[rng.integers(0, 20, n)] + 0.3 * rng.normal(size=(n, dim))).astype("float32")
+    faiss.normalize_L2(x)
+    return x
+
+
+def test_heuristics():
+    assert choose_index_type(561) == "flat"
+    assert choose_index_type(100_000) == "hnsw"
+    assert choose_index_type(5_000_000) == "ivf_pq"
+    assert ivf_nlist(561) == 14  # capped by training points per centroid
+    assert ivf_nlist(1_000_000) == 4000
+    with pytest.raises(ValueError):
+        make_index(_vectors(300), "ivf_pq")
+
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_round_trip_keeps_type_params_and_recall(tmp_path, index_type):
+    """Persisted search params are re-applied on load, and results track exact search"""
+    x, queries = _vectors(3000), _vectors(50, seed=1)
+    index, meta = make_index(x, index_type)
+    save_index(index, meta, tmp_path / "index.faiss", tmp_path / "index_meta.json")
+
+    loaded, loaded_meta = load_index(
+        tmp_path / "index.faiss", tmp_path / "index_meta.json", faiss.IO_FLAG_MMAP_IFC
+    )
+    assert loaded_meta["index_type"] == index_type and loaded_meta["ntotal"] == 3000
+    assert loaded_meta["search"] == meta["search"]
+    if index_type == "hnsw":
+        assert faiss.downcast_index(loaded).hnsw.efSearch == meta["search"]["efSearch"]
+    if index_type.startswith("ivf"):
+        assert faiss.extract_index_ivf(loaded).nprobe == meta["search"]["nprobe"]
+
+    exact, _ = make_index(x, "flat")
+    truth = exact.search(queries, 5)[1]
+    assert recall_at_k(truth, loaded.search(queries, 5)[1], 5) >= 0.9
+
+
+def test_index_without_metadata_loads_as_flat(tmp_path):
+    index, _ = make_index(_vectors(100), "flat")
+    faiss.write_index(index, str(tmp_path / "index.faiss"))
+    _, meta = load_index(tmp_path / "index.faiss", tmp_path / "missing.json")
+    assert meta["index_type"] == "flat" and meta["ntotal"] == 100